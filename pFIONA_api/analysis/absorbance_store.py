@@ -0,0 +1,107 @@
+import numpy as np
+
+from pFIONA_api.analysis.spectrum_block import SpectrumBlock
+from pFIONA_sensors.models import Absorbance, AbsorbanceCycle
+
+"""
+READ
+"""
+
+
+def read_absorbance(sensor_id, deployment_id, cycles=None):
+    """
+    Read the stored absorbance spectrums of a deployment.
+
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param deployment_id: The ID of the deployment.
+    :param cycles: Optional list of cycles to restrict the absorbance spectrums read.
+    :return: A SpectrumBlock with one row per stored absorbance spectrum, in display order.
+    """
+    absorbances = Absorbance.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id)
+    if cycles is not None:
+        absorbances = absorbances.filter(cycle__in=cycles)
+
+    rows = list(absorbances.order_by('pfiona_spectrum_id').values_list(
+        'pfiona_spectrum_id', 'pfiona_spectrum__pfiona_time__timestamp', 'pfiona_spectrum__pfiona_spectrumtype__type',
+        'cycle', 'wavelengths', 'values', 'subcycle'
+    ))
+
+    block = SpectrumBlock.from_rows([row[:6] for row in rows], deployment=deployment_id,
+                                    subcycles=[row[6] for row in rows])
+
+    return block.select(block.display_order(np.arange(len(block))))
+
+
+def read_absorbance_cycles(sensor_id, deployment_id, cycles=None):
+    """
+    Read the cycles of a deployment whose absorbance is stored, with or without absorbance spectrums.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :param cycles: Optional list of cycles to restrict the cycles read.
+    :return: The set of stored cycles.
+    """
+    stored = AbsorbanceCycle.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id)
+    if cycles is not None:
+        stored = stored.filter(cycle__in=cycles)
+
+    return set(stored.values_list('cycle', flat=True))
+
+
+"""
+WRITE
+"""
+
+
+def write_absorbance(sensor_id, block, cycles=()):
+    """
+    Store absorbance spectrums, keyed by the spectrum of their sample scan.
+
+    Spectrums which already have a stored absorbance are left untouched.
+
+    :param sensor_id: The ID of the sensor the spectrums belong to.
+    :param block: Absorbance SpectrumBlock, as returned by SpectrumBlock.absorbance.
+    :param cycles: Cycles of the block's deployment whose absorbance spectrums are all in the block, recorded as
+                   stored so they are not computed again, even when they have no absorbance spectrum.
+    :return: The number of absorbance spectrums given to store.
+    """
+    AbsorbanceCycle.objects.bulk_create([
+        AbsorbanceCycle(pfiona_sensor_id=sensor_id, deployment=block.deployment, cycle=int(cycle)) for cycle in cycles
+    ], ignore_conflicts=True)
+
+    wavelengths = block.wavelengths.tolist()
+
+    Absorbance.objects.bulk_create([
+        Absorbance(
+            pfiona_spectrum_id=int(block.ids[row]),
+            pfiona_sensor_id=sensor_id,
+            deployment=block.deployment,
+            cycle=int(block.cycles[row]),
+            subcycle=int(block.subcycles[row]),
+            wavelengths=wavelengths[:block.sizes[row]],
+            values=block.values[row, :block.sizes[row]].tolist()
+        )
+        for row in range(len(block))
+    ], batch_size=500, ignore_conflicts=True)
+
+    return len(block)
+
+
+def delete_absorbance(sensor_id, deployment_id=None):
+    """
+    Delete the stored absorbance spectrums of a sensor, or of one of its deployments.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: Optional ID of the deployment.
+    :return: The number of absorbance spectrums deleted.
+    """
+    absorbances = Absorbance.objects.filter(pfiona_sensor_id=sensor_id)
+    stored = AbsorbanceCycle.objects.filter(pfiona_sensor_id=sensor_id)
+    if deployment_id is not None:
+        absorbances = absorbances.filter(deployment=deployment_id)
+        stored = stored.filter(deployment=deployment_id)
+
+    stored.delete()
+    deleted, _ = absorbances.delete()
+
+    return deleted
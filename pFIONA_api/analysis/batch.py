@@ -0,0 +1,176 @@
+from pFIONA_api.analysis.block_scope import shared_blocks, spectrum_block_key, absorbance_block_key
+from pFIONA_api.analysis.spectrum_finder import get_deployment_id, get_cycle_times, get_deployment_list, \
+    get_cycle_count, get_spectrums_in_cycle_full_info, get_spectrums_in_deployment_full_info, \
+    get_absorbance_spectrums_in_cycle, get_mean_absorbance_spectrums_in_cycle, \
+    get_absorbance_spectrums_in_deployment_full_info, get_monitored_wavelength_values_in_deployment, \
+    get_concentration_in_deployment
+from pFIONA_sensors.models import Sensor
+
+# Most sub-queries a batch may hold
+MAX_BATCH_QUERIES = 100
+
+# Parameters of each query a batch may hold, and the block its data is loaded from
+BATCH_QUERIES = {
+    'get_deployment_list': (['sensor_id'], None),
+    'get_cycle_count': (['sensor_id', 'timestamp'], None),
+    'get_spectrums_in_cycle_full_info': (['sensor_id', 'timestamp', 'cycle'], 'spectrums'),
+    'get_spectrums_in_deployment_full_info': (['sensor_id', 'timestamp'], 'spectrums'),
+    'get_absorbance_spectrums_in_cycle': (['sensor_id', 'timestamp', 'cycle'], 'absorbance'),
+    'get_mean_absorbance_spectrums_in_cycle': (['sensor_id', 'timestamp', 'cycle'], 'absorbance'),
+    'get_absorbance_spectrums_in_deployment_full_info': (['sensor_id', 'timestamp'], 'absorbance'),
+    'get_monitored_wavelength_values_in_deployment': (['sensor_id', 'timestamp'], 'absorbance'),
+    'get_concentration_for_deployment': (['sensor_id', 'timestamp'], None),
+}
+
+"""
+QUERIES
+"""
+
+
+def parse_query(query):
+    """
+    Validate a sub-query of a batch.
+
+    :param query: Dictionary holding the name of the query (`query`), its parameters and an optional `id`.
+    :return: A tuple containing the name of the query and a dictionary of its integer parameters.
+    """
+    if not isinstance(query, dict):
+        raise ValueError("Invalid query, expected an object")
+
+    name = query.get('query')
+    if name not in BATCH_QUERIES:
+        raise ValueError(f"Unknown query: {name}")
+
+    params = {}
+    for param in BATCH_QUERIES[name][0]:
+        if query.get(param) in (None, ''):
+            raise ValueError(f"Missing {param} parameter")
+        try:
+            params[param] = int(query[param])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {param} parameter")
+
+    return name, params
+
+
+def plan_query(scope, name, params):
+    """
+    Plan the cycles a sub-query is going to load, so that they are loaded with the ones of the other sub-queries.
+
+    :param scope: BlockScope of the batch.
+    :param name: Name of the query.
+    :param params: Dictionary of the parameters of the query.
+    """
+    block = BATCH_QUERIES[name][1]
+    if block is None:
+        return
+
+    deployment_id = get_deployment_id(params['timestamp'], params['sensor_id'])
+    if deployment_id is None:
+        return
+
+    cycles = [params['cycle']] if 'cycle' in params else list(get_cycle_times(deployment_id, params['sensor_id']))
+    if block == 'spectrums':
+        scope.plan(spectrum_block_key(params['sensor_id'], deployment_id), cycles)
+    else:
+        scope.plan(absorbance_block_key(params['sensor_id'], deployment_id), cycles)
+
+
+def run_query(name, params):
+    """
+    Run a sub-query of a batch.
+
+    :param name: Name of the query.
+    :param params: Dictionary of the parameters of the query.
+    :return: The data of the query, as returned by its own endpoint.
+    """
+    sensor_id = params['sensor_id']
+    timestamp = params.get('timestamp')
+    cycle = params.get('cycle')
+
+    if name == 'get_deployment_list':
+        return get_deployment_list(sensor_id)
+
+    if name == 'get_cycle_count':
+        return {"cycle_count": get_cycle_count(timestamp, sensor_id)}
+
+    if name == 'get_concentration_for_deployment':
+        data, deployment_info = get_concentration_in_deployment(timestamp, sensor_id)
+        return {"spectrums_data": data, "deployment_info": deployment_info}
+
+    if name == 'get_monitored_wavelength_values_in_deployment':
+        data, deployment_info = get_monitored_wavelength_values_in_deployment(timestamp, sensor_id)
+        return {"data": data, "deployment_info": deployment_info}
+
+    if name == 'get_absorbance_spectrums_in_cycle':
+        data, wavelengths, deployment_info = get_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle)
+        return {"absorbance_data": data, "wavelengths": wavelengths, "deployment_info": deployment_info}
+
+    if name == 'get_mean_absorbance_spectrums_in_cycle':
+        data, wavelengths, deployment_info = get_mean_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle)
+        return {"absorbance_data": data, "wavelengths": wavelengths, "deployment_info": deployment_info}
+
+    if name == 'get_spectrums_in_cycle_full_info':
+        data, wavelengths, deployment_info = get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle)
+    elif name == 'get_spectrums_in_deployment_full_info':
+        data, wavelengths, deployment_info = get_spectrums_in_deployment_full_info(timestamp, sensor_id)
+    else:
+        data, wavelengths, deployment_info = get_absorbance_spectrums_in_deployment_full_info(timestamp, sensor_id)
+
+    return {"data": data, "wavelengths": wavelengths, "deployment_info": deployment_info}
+
+
+"""
+BATCH
+"""
+
+
+def run_batch(queries):
+    """
+    Run the sub-queries of a batch together.
+
+    The deployments are resolved once per sensor, and the spectrums and absorbance spectrums the sub-queries need
+    are loaded once per deployment and shared between them. A failing sub-query does not fail the others.
+
+    :param queries: List of sub-queries, each a dictionary holding the name of the query (`query`), its parameters
+                    and an optional `id` echoed in its result.
+    :return: A list containing the result of each sub-query, in order.
+    """
+    if not isinstance(queries, list):
+        raise ValueError("Invalid queries parameter, expected a list")
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"Too many queries, a batch holds at most {MAX_BATCH_QUERIES} queries")
+
+    # Validate every sub-query first
+    parsed = []
+    for query in queries:
+        try:
+            parsed.append(parse_query(query))
+        except ValueError as e:
+            parsed.append(e)
+
+    # Check the sensors of every sub-query in a single query
+    sensor_ids = set(Sensor.objects.filter(
+        id__in={query[1]['sensor_id'] for query in parsed if isinstance(query, tuple)}
+    ).values_list('id', flat=True))
+    for index, query in enumerate(parsed):
+        if isinstance(query, tuple) and query[1]['sensor_id'] not in sensor_ids:
+            parsed[index] = ValueError("Sensor not found")
+
+    results = []
+    with shared_blocks() as scope:
+        for query in parsed:
+            if isinstance(query, tuple):
+                plan_query(scope, *query)
+
+        for query, parsed_query in zip(queries, parsed):
+            result = {'id': query.get('id')} if isinstance(query, dict) else {'id': None}
+            try:
+                if isinstance(parsed_query, Exception):
+                    raise parsed_query
+                result.update({'status': 'success', 'data': run_query(*parsed_query)})
+            except Exception as e:
+                result.update({'status': 'error', 'message': str(e)})
+            results.append(result)
+
+    return results
@@ -0,0 +1,119 @@
+import json
+import struct
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+from pFIONA_api.analysis.negotiation import BINARY_CONTENT_TYPE, negotiated
+
+# Value types a client can ask for with the `dtype` parameter
+VALUE_DTYPES = {'float32': '<f4', 'float64': '<f8'}
+
+
+def encode_block(block, deployment_info, dtype='float64'):
+    """
+    Encode the spectrums of a block as a compact columnar binary payload.
+
+    The payload is made of:
+        - the length of the header, as a little-endian unsigned 32-bit integer;
+        - the header, as UTF-8 JSON padded with spaces to an 8-byte boundary. It holds the deployment information,
+          one list per spectrum metadata column (id, time, spectrumtype, cycle, reaction, type, subcycle, size),
+          and the dtype, shape and byte offset (from the end of the header) of each array;
+        - the shared wavelength axis, as little-endian float64;
+        - the (spectrums x wavelengths) value matrix, as little-endian float32 or float64. Values after the size
+          of a spectrum are NaN.
+
+    Spectrums are listed in the order of the JSON payloads.
+
+    :param block: SpectrumBlock to encode, or None if no spectrum is found.
+    :param deployment_info: Deployment information dictionary.
+    :param dtype: Type of the values, 'float32' or 'float64'.
+    :return: The payload bytes.
+    """
+    if dtype not in VALUE_DTYPES:
+        raise ValueError("Invalid dtype parameter, expected 'float32' or 'float64'")
+
+    if block is None:
+        wavelengths = np.zeros(0, dtype='<f8')
+        values = np.zeros((0, 0), dtype=VALUE_DTYPES[dtype])
+        columns = {}
+    else:
+        rows = block.display_order(np.arange(len(block)))
+        wavelengths = block.wavelengths.astype('<f8')
+        values = block.values[rows].astype(VALUE_DTYPES[dtype])
+        columns = {
+            'id': block.ids[rows].tolist(),
+            'time': block.times[rows].tolist(),
+            'spectrumtype': [block.type_names[code] for code in block.types[rows].tolist()],
+            'cycle': block.cycles[rows].tolist(),
+            'reaction': [block.reaction_names[code] for code in block.reactions[rows].tolist()],
+            'type': [block.key_names[code] for code in block.keys[rows].tolist()],
+            'subcycle': block.subcycles[rows].tolist(),
+            'size': block.sizes[rows].tolist(),
+        }
+
+    header = {
+        'deployment_info': deployment_info,
+        'columns': columns,
+        'arrays': {},
+    }
+
+    # Lay the arrays out one after the other, their offsets are counted from the end of the header
+    arrays = [('wavelengths', wavelengths), ('values', values)]
+    offset = 0
+    for name, array in arrays:
+        header['arrays'][name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset += array.nbytes
+
+    # Pad the header so that the arrays start on an 8-byte boundary
+    header_bytes = json.dumps(header, cls=DjangoJSONEncoder).encode('utf-8')
+    header_bytes += b' ' * (-(4 + len(header_bytes)) % 8)
+
+    return b''.join([struct.pack('<I', len(header_bytes)), header_bytes] + [array.tobytes() for _, array in arrays])
+
+
+def binary_response(block, deployment_info, dtype='float64'):
+    """
+    Build the HTTP response of a binary spectrum payload.
+
+    :param block: SpectrumBlock to encode, or None if no spectrum is found.
+    :param deployment_info: Deployment information dictionary.
+    :param dtype: Type of the values, 'float32' or 'float64'.
+    :return: An HTTP response containing the payload.
+    """
+    return negotiated(HttpResponse(encode_block(block, deployment_info, dtype=dtype),
+                                   content_type=BINARY_CONTENT_TYPE))
+
+
+def decode_payload(data):
+    """
+    Decode a payload laid out as the binary spectrum payloads: header length, JSON header, then arrays.
+
+    :param data: The payload bytes.
+    :return: A tuple containing the header dictionary, without its array descriptions, and a dictionary of the
+             arrays by name.
+    """
+    try:
+        header_size, = struct.unpack_from('<I', data)
+        header = json.loads(bytes(data[4:4 + header_size]).decode('utf-8'))
+        descriptions = header.pop('arrays', {})
+    except (struct.error, UnicodeDecodeError, ValueError, AttributeError):
+        raise ValueError("Invalid binary payload header")
+
+    # Read the arrays in place, their offsets are counted from the end of the header
+    body = memoryview(data)[4 + header_size:]
+    arrays = {}
+    for name, description in descriptions.items():
+        try:
+            dtype = np.dtype(description['dtype'])
+            shape = tuple(int(length) for length in description['shape'])
+            offset = int(description['offset'])
+            count = int(np.prod(shape, dtype=np.int64))
+            if dtype.kind not in 'iuf' or offset < 0 or offset + count * dtype.itemsize > len(body):
+                raise ValueError
+            arrays[name] = np.frombuffer(body, dtype=dtype, count=count, offset=offset).reshape(shape)
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f"Invalid binary payload array {name}")
+
+    return header, arrays
@@ -0,0 +1,98 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+import numpy as np
+
+# Blocks shared between the queries of a batch, None outside of a batch
+_block_scope = ContextVar('block_scope', default=None)
+
+
+class BlockScope:
+    """
+    Spectrum blocks loaded for a batch of analysis queries, shared between them.
+
+    Blocks are identified by a key (kind of block, sensor, deployment, ...) and hold the spectrums of a set of
+    cycles. The cycles the batch is going to need are planned beforehand, so that they are loaded together by the
+    first query which needs any of them.
+    """
+
+    def __init__(self):
+        self.planned = {}
+        self.blocks = {}
+
+    def plan(self, key, cycles):
+        """
+        Plan the loading of some cycles of a block.
+
+        :param key: Key of the block.
+        :param cycles: Iterable of cycles.
+        """
+        self.planned.setdefault(key, set()).update(cycles)
+
+    def load(self, key, cycles, loader):
+        """
+        Retrieve some cycles of a block, loading them with the planned cycles if they are not loaded yet.
+
+        :param key: Key of the block.
+        :param cycles: List of cycles.
+        :param loader: Function loading the block of a sorted list of cycles.
+        :return: The SpectrumBlock of the cycles, in the order of the loaded block.
+        """
+        cycles = set(cycles)
+        loaded, block = self.blocks.get(key, (set(), None))
+
+        if block is None or not cycles <= loaded:
+            loaded = loaded | cycles | self.planned.get(key, set())
+            block = loader(sorted(loaded))
+            self.blocks[key] = (loaded, block)
+
+        if cycles == loaded:
+            return block
+
+        return block.select(np.isin(block.cycles, sorted(cycles)))
+
+
+def spectrum_block_key(sensor_id, deployment_id, wavelength_monitored=False):
+    """
+    Build the key of the raw spectrum block of a deployment.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
+    :return: The block key.
+    """
+    return 'spectrums', int(sensor_id), deployment_id, bool(wavelength_monitored)
+
+
+def absorbance_block_key(sensor_id, deployment_id):
+    """
+    Build the key of the absorbance spectrum block of a deployment.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :return: The block key.
+    """
+    return 'absorbance', int(sensor_id), deployment_id
+
+
+def get_block_scope():
+    """
+    Retrieve the block scope of the current batch.
+
+    :return: The BlockScope, or None outside of a batch.
+    """
+    return _block_scope.get()
+
+
+@contextmanager
+def shared_blocks():
+    """
+    Share the spectrum blocks loaded inside the context between the analysis functions called in it.
+
+    :return: A context manager yielding the BlockScope.
+    """
+    token = _block_scope.set(BlockScope())
+    try:
+        yield _block_scope.get()
+    finally:
+        _block_scope.reset(token)
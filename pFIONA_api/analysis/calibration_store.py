@@ -0,0 +1,126 @@
+from bisect import bisect_right
+
+import numpy as np
+
+from pFIONA_sensors.models import Calibration
+
+"""
+READ
+"""
+
+
+def read_calibrations(sensor_id, deployment_id):
+    """
+    Read the stored calibration curves of a deployment in a single query.
+
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param deployment_id: The ID of the deployment.
+    :return: A dictionary mapping each (reaction, source cycle) to its curves
+             (wavelength -> (slope, intercept, r_squared, points)).
+    """
+    curves = {}
+
+    for reaction, cycle, wavelength, slope, intercept, r_squared, points in Calibration.objects.filter(
+            pfiona_sensor_id=sensor_id,
+            deployment=deployment_id
+    ).values_list('reaction', 'cycle', 'wavelength', 'slope', 'intercept', 'r_squared', 'points'):
+        curves.setdefault((reaction, cycle), {})[wavelength] = (slope, intercept, r_squared, points)
+
+    return curves
+
+
+class CalibrationIndex:
+    """
+    Calibration curves of a deployment sorted by source cycle, to find the curve active at a cycle
+    with a binary search.
+    """
+
+    def __init__(self, curves):
+        self.cycles = {}
+        self.curves = {}
+        for (reaction, cycle), wavelengths in sorted(curves.items()):
+            for wavelength, curve in wavelengths.items():
+                self.cycles.setdefault((reaction, wavelength), []).append(cycle)
+                self.curves.setdefault((reaction, wavelength), []).append(curve)
+
+    def latest(self, reaction, wavelength, cycle):
+        """
+        Find the latest calibration curve of a reaction wavelength fitted at or before a cycle.
+
+        :param reaction: The name of the reaction.
+        :param wavelength: The monitored wavelength.
+        :param cycle: The cycle to find the active curve of.
+        :return: The (slope, intercept, r_squared, points) curve, or None if no curve was fitted before the cycle.
+        """
+        cycles = self.cycles.get((reaction, wavelength), [])
+        index = bisect_right(cycles, cycle)
+
+        return self.curves[(reaction, wavelength)][index - 1] if index else None
+
+    def latest_batch(self, reaction, wavelengths, cycles):
+        """
+        Find the latest calibration curves of some reaction wavelengths fitted at or before many cycles at once.
+
+        :param reaction: The name of the reaction.
+        :param wavelengths: List of monitored wavelengths.
+        :param cycles: Sorted array of the cycles to find the active curves of.
+        :return: A tuple containing the slopes and intercepts of the active curves (cycles x wavelengths),
+                 NaN where no curve was fitted before the cycle.
+        """
+        slopes = np.full((len(cycles), len(wavelengths)), np.nan)
+        intercepts = np.full((len(cycles), len(wavelengths)), np.nan)
+
+        for column, wavelength in enumerate(wavelengths):
+            if (reaction, wavelength) not in self.cycles:
+                continue
+            curves = np.array([curve[:2] for curve in self.curves[(reaction, wavelength)]], dtype=np.float64)
+            index = np.searchsorted(self.cycles[(reaction, wavelength)], cycles, side='right')
+            active = index > 0
+            slopes[active, column] = curves[index[active] - 1, 0]
+            intercepts[active, column] = curves[index[active] - 1, 1]
+
+        return slopes, intercepts
+
+
+"""
+WRITE
+"""
+
+
+def write_calibrations(sensor_id, deployment_id, curves):
+    """
+    Store calibration curves of a deployment.
+
+    Curves which are already stored are left untouched.
+
+    :param sensor_id: The ID of the sensor the curves belong to.
+    :param deployment_id: The ID of the deployment.
+    :param curves: Dictionary mapping each (reaction, source cycle) to its curves
+                   (wavelength -> (slope, intercept, r_squared, points)).
+    """
+    Calibration.objects.bulk_create([
+        Calibration(pfiona_sensor_id=sensor_id, deployment=deployment_id, reaction=reaction, cycle=cycle,
+                    wavelength=wavelength, slope=slope, intercept=intercept, r_squared=r_squared, points=points)
+        for (reaction, cycle), wavelengths in curves.items()
+        for wavelength, (slope, intercept, r_squared, points) in wavelengths.items()
+    ], batch_size=500, ignore_conflicts=True)
+
+
+def delete_calibrations(sensor_id, reaction=None, deployment_id=None):
+    """
+    Delete the stored calibration curves of a sensor, so that they are fitted again on the next read.
+
+    :param sensor_id: The ID of the sensor.
+    :param reaction: Optional name of the reaction whose curves are deleted.
+    :param deployment_id: Optional ID of the deployment whose curves are deleted.
+    :return: The number of curves deleted.
+    """
+    calibrations = Calibration.objects.filter(pfiona_sensor_id=sensor_id)
+    if reaction is not None:
+        calibrations = calibrations.filter(reaction=reaction)
+    if deployment_id is not None:
+        calibrations = calibrations.filter(deployment=deployment_id)
+
+    deleted, _ = calibrations.delete()
+
+    return deleted
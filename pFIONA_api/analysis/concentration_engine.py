@@ -0,0 +1,169 @@
+import numpy as np
+
+from pFIONA_api.analysis.formula import linear_regression_batch
+from pFIONA_api.analysis.spectrum_block import closest_wavelength_indices
+
+"""
+MONITORED TENSOR
+"""
+
+
+class MonitoredTensor:
+    """
+    Mean absorbance of a reaction at its monitored wavelengths, as a (cycles x keys x wavelengths) array.
+
+    Keys missing from a cycle are left as NaN, and flagged in a (cycles x keys) presence mask.
+    """
+
+    def __init__(self, cycles, key_names, wavelengths, values, present):
+        self.cycles = cycles
+        self.key_names = key_names
+        self.wavelengths = wavelengths
+        self.values = values
+        self.present = present
+
+    @classmethod
+    def from_block(cls, block, reaction, wavelengths):
+        """
+        Build the tensor of a reaction from a mean absorbance block.
+
+        :param block: Mean absorbance SpectrumBlock, with one row per (cycle, reaction, key).
+        :param reaction: The name of the reaction.
+        :param wavelengths: Sorted monitored wavelengths of the reaction.
+        :return: A MonitoredTensor.
+        """
+        rows = np.flatnonzero(block.reactions == block.reaction_names.index(reaction))
+        cycles, cycle_rows = np.unique(block.cycles[rows], return_inverse=True)
+        keys, key_rows = np.unique(block.keys[rows], return_inverse=True)
+
+        values = np.full((len(cycles), len(keys), len(wavelengths)), np.nan)
+        present = np.zeros((len(cycles), len(keys)), dtype=bool)
+        values[cycle_rows, key_rows] = block.values[np.ix_(rows, closest_wavelength_indices(block.wavelengths,
+                                                                                             wavelengths))]
+        present[cycle_rows, key_rows] = True
+
+        return cls(cycles, [block.key_names[key] for key in keys], list(wavelengths), values, present)
+
+    def key(self, name):
+        """
+        Retrieve the absorbance of a key in every cycle.
+
+        :param name: The key (Blank, Sample, Standard...).
+        :return: A tuple containing the absorbance (cycles x wavelengths) and the presence of the key in each cycle.
+        """
+        if name not in self.key_names:
+            return np.full((len(self.cycles), len(self.wavelengths)), np.nan), np.zeros(len(self.cycles), dtype=bool)
+
+        index = self.key_names.index(name)
+
+        return self.values[:, index], self.present[:, index]
+
+    def dilution_keys(self):
+        """
+        List the standard dilution keys of the tensor.
+
+        :return: A tuple containing the indices of the standard dilution keys and their dilution numbers.
+        """
+        keys = [index for index, name in enumerate(self.key_names) if name.startswith('Standard_Dillution')]
+
+        return keys, [int(self.key_names[index].split('_')[-1]) for index in keys]
+
+    def has_dilutions(self):
+        """
+        :return: A boolean array flagging the cycles with standard dilutions.
+        """
+        keys, _ = self.dilution_keys()
+
+        return self.present[:, keys].any(axis=1)
+
+
+def monitored_tensors(block, monitored_wavelengths):
+    """
+    Build the monitored tensor of every reaction of a mean absorbance block.
+
+    :param block: Mean absorbance SpectrumBlock, with one row per (cycle, reaction, key).
+    :param monitored_wavelengths: Dictionary mapping each reaction name to its sorted monitored wavelengths.
+    :return: A dictionary mapping each reaction name to its MonitoredTensor.
+    """
+    return {
+        reaction: MonitoredTensor.from_block(block, reaction, sorted(set(monitored_wavelengths[reaction])))
+        for reaction in block.reaction_names if monitored_wavelengths.get(reaction)
+    }
+
+
+"""
+CALIBRATION
+"""
+
+
+def fit_dilution_curves(tensor, std_conc, cycles):
+    """
+    Fit the calibration curves of every monitored wavelength of some standard dilution cycles at once.
+
+    The concentration of each dilution is its dilution number times a quarter of the standard concentration.
+
+    :param tensor: MonitoredTensor of the reaction.
+    :param std_conc: The standard concentration of the reaction.
+    :param cycles: List of the standard dilution cycles to fit.
+    :return: A dictionary mapping each cycle to its curves (wavelength -> (slope, intercept, r_squared, points)),
+             leaving out the wavelengths whose dilutions do not give a line.
+    """
+    keys, dilutions = tensor.dilution_keys()
+    rows = np.searchsorted(tensor.cycles, cycles)
+
+    # Fit one line per (cycle, wavelength), through the dilutions present in the cycle
+    levels = np.array(dilutions, dtype=np.float64) * 0.25 * std_conc
+    absorbances = np.moveaxis(tensor.values[np.ix_(rows, keys)], 1, 2)
+    slopes, intercepts, r_squared, points = linear_regression_batch(
+        levels, absorbances, tensor.present[np.ix_(rows, keys)][:, np.newaxis, :])
+
+    curves = {}
+    for row, cycle in enumerate(cycles):
+        curves[cycle] = {
+            wavelength: (float(slopes[row, column]), float(intercepts[row, column]),
+                         None if np.isnan(r_squared[row, column]) else float(r_squared[row, column]),
+                         int(points[row, column]))
+            for column, wavelength in enumerate(tensor.wavelengths) if np.isfinite(slopes[row, column])
+        }
+
+    return curves
+
+
+"""
+CONCENTRATION
+"""
+
+
+def compute_tensor_concentrations(tensor, std_conc, slopes, intercepts):
+    """
+    Calculate the concentrations of every cycle of a reaction at once.
+
+    Cycles with a blank and a standard, and without standard dilutions, use the blank/sample/standard absorbance
+    corrected by the reference wavelength (the last monitored wavelength). Other cycles use their active
+    calibration curve.
+
+    :param tensor: MonitoredTensor of the reaction.
+    :param std_conc: The standard concentration of the reaction.
+    :param slopes: Slopes of the active calibration curves (cycles x wavelengths), NaN where there is none.
+    :param intercepts: Intercepts of the active calibration curves (cycles x wavelengths).
+    :return: A tuple containing the concentrations (cycles x wavelengths but the reference wavelength)
+             and the mask of the concentrations calculated.
+    """
+    sample, has_sample = tensor.key('Sample')
+    blank, has_blank = tensor.key('Blank')
+    standard, has_standard = tensor.key('Standard')
+    regular = has_blank & has_standard & ~tensor.has_dilutions()
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Correct the absorbance with the reference wavelength
+        abs_sample = sample[:, :-1] - sample[:, -1:]
+        abs_blank = blank[:, :-1] - blank[:, -1:]
+        abs_standard = standard[:, :-1] - standard[:, -1:]
+
+        regular_concentrations = ((abs_sample - abs_blank) * std_conc) / (abs_standard - abs_blank)
+        calibrated_concentrations = (sample[:, :-1] - intercepts[:, :-1]) / slopes[:, :-1]
+
+    concentrations = np.where(regular[:, np.newaxis], regular_concentrations, calibrated_concentrations)
+    computed = has_sample[:, np.newaxis] & (regular[:, np.newaxis] | ~np.isnan(slopes[:, :-1]))
+
+    return concentrations, computed
@@ -0,0 +1,118 @@
+from django.db import transaction
+
+from pFIONA_sensors.models import Concentration
+
+"""
+READ
+"""
+
+
+def read_concentrations(sensor_id, deployment_id, cycles=None):
+    """
+    Read the stored concentrations of a deployment in a single query.
+
+    Rows without wavelength mark a (reaction, cycle) computed without any concentration, and rows without
+    reaction mark a cycle computed without any reaction.
+
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param deployment_id: The ID of the deployment.
+    :param cycles: Optional list of cycles to restrict the concentrations read.
+    :return: A tuple containing the concentrations (reaction -> cycle -> wavelength -> concentration),
+             the set of stored cycles and the set of reactions whose concentrations are stale.
+    """
+    rows = Concentration.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id)
+    if cycles is not None:
+        rows = rows.filter(cycle__in=cycles)
+
+    concentrations = {}
+    stored_cycles = set()
+    stale_reactions = set()
+
+    for reaction, cycle, wavelength, concentration, stale in rows.order_by(
+            'reaction', 'cycle', 'wavelength'
+    ).values_list('reaction', 'cycle', 'wavelength', 'concentration', 'stale'):
+        if stale:
+            stale_reactions.add(reaction)
+            continue
+
+        stored_cycles.add(cycle)
+        if reaction is None:
+            continue
+
+        wavelengths = concentrations.setdefault(reaction, {}).setdefault(cycle, {})
+        if wavelength is not None:
+            wavelengths[wavelength] = concentration
+
+    return concentrations, stored_cycles, stale_reactions
+
+
+"""
+WRITE
+"""
+
+
+def write_concentrations(sensor_id, deployment_id, concentrations, cycles, reactions=None):
+    """
+    Store the concentrations of some cycles of a deployment.
+
+    The stored rows of these cycles (or only of the given reactions in these cycles, stale rows included)
+    are replaced.
+
+    :param sensor_id: The ID of the sensor the concentrations belong to.
+    :param deployment_id: The ID of the deployment.
+    :param concentrations: Dictionary of concentrations (reaction -> cycle -> wavelength -> concentration).
+    :param cycles: List of cycles to store.
+    :param reactions: Optional set of reactions to restrict the rows replaced.
+    """
+    cycles = set(cycles)
+    rows = []
+
+    for cycle in sorted(cycles):
+        cycle_reactions = [reaction for reaction, reaction_cycles in concentrations.items()
+                           if cycle in reaction_cycles and (reactions is None or reaction in reactions)]
+
+        # Mark cycles computed without any reaction
+        if not cycle_reactions and reactions is None:
+            rows.append(Concentration(pfiona_sensor_id=sensor_id, deployment=deployment_id, cycle=cycle))
+
+        for reaction in cycle_reactions:
+            wavelengths = concentrations[reaction][cycle]
+
+            # Mark reactions computed without any concentration
+            if not wavelengths:
+                rows.append(Concentration(pfiona_sensor_id=sensor_id, deployment=deployment_id, reaction=reaction,
+                                          cycle=cycle))
+
+            for wavelength, concentration in wavelengths.items():
+                rows.append(Concentration(pfiona_sensor_id=sensor_id, deployment=deployment_id, reaction=reaction,
+                                          cycle=cycle, wavelength=wavelength, concentration=concentration))
+
+    with transaction.atomic():
+        stored = Concentration.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id)
+        if reactions is None:
+            stored.filter(cycle__in=cycles).delete()
+        else:
+            stored.filter(reaction__in=reactions, cycle__in=cycles).delete()
+        # A concurrent read may have stored the same cycles in the meantime, its rows are overwritten
+        Concentration.objects.bulk_create(rows, batch_size=500, update_conflicts=True,
+                                          unique_fields=['pfiona_sensor', 'deployment', 'reaction', 'wavelength',
+                                                         'cycle'],
+                                          update_fields=['concentration', 'stale'])
+
+
+def invalidate_concentrations(sensor_id, reaction=None, deployment_id=None):
+    """
+    Mark the stored concentrations of a sensor as stale, so that they are computed again on the next read.
+
+    :param sensor_id: The ID of the sensor.
+    :param reaction: Optional name of the reaction whose concentrations are invalidated.
+    :param deployment_id: Optional ID of the deployment whose concentrations are invalidated.
+    :return: The number of rows invalidated.
+    """
+    concentrations = Concentration.objects.filter(pfiona_sensor_id=sensor_id)
+    if reaction is not None:
+        concentrations = concentrations.filter(reaction=reaction)
+    if deployment_id is not None:
+        concentrations = concentrations.filter(deployment=deployment_id)
+
+    return concentrations.update(stale=True)
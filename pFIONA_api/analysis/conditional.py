@@ -0,0 +1,122 @@
+import hashlib
+from functools import wraps
+
+from django.utils.cache import patch_cache_control, set_response_etag, get_conditional_response
+from django.views.decorators.http import condition
+
+from pFIONA_api.analysis.deployment_catalog import resolve_deployment, get_data_version
+from pFIONA_sensors.models import Sensor
+
+"""
+CONTENT
+"""
+
+
+def content_conditional_response(request, response):
+    """
+    Answer a conditional GET request from the ETag of the content of a response.
+
+    The response is still built, but a client holding the same content gets a 304 response without any body.
+
+    :param request: HTTP request object
+    :param response: Complete HTTP response, with its cache headers
+    :return: The response, or a 304 response if the client holds the same content.
+    """
+    set_response_etag(response)
+
+    return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+"""
+DATA VERSION
+"""
+
+
+def get_deployment_version(request):
+    """
+    Retrieve the data version of the deployment a request targets, computed once per request.
+
+    The deployment is resolved from the `sensor_id` and `timestamp` GET parameters (or the whole sensor without
+    timestamp) through the deployment catalog, then versioned without reading any spectrum.
+
+    :param request: HTTP request object
+    :return: A tuple containing the version key and the last modification time of the deployment catalog entry,
+             or None if the parameters do not identify a sensor.
+    """
+    if not hasattr(request, '_deployment_version'):
+        request._deployment_version = None
+
+        sensor_id = request.GET.get('sensor_id')
+        timestamp = request.GET.get('timestamp')
+        try:
+            sensor_id = int(sensor_id)
+            timestamp = int(timestamp) if timestamp is not None else None
+        except (TypeError, ValueError):
+            return None
+
+        if not Sensor.objects.filter(id=sensor_id).exists():
+            return None
+
+        # A timestamp inside a deployment only depends on this deployment, anything else on the whole sensor
+        deployment_id = resolve_deployment(sensor_id, timestamp) if timestamp is not None else None
+        request._deployment_version = get_data_version(sensor_id, deployment_id)
+
+    return request._deployment_version
+
+
+def deployment_etag(request, *args, **kwargs):
+    """
+    Compute the ETag of an analysis response from the data version of its deployment.
+
+    The path, query string and Accept header are part of the ETag, since they select the representation.
+
+    :param request: HTTP request object
+    :return: The ETag, or None if the parameters do not identify a sensor.
+    """
+    deployment_version = get_deployment_version(request)
+    if deployment_version is None:
+        return None
+
+    key = repr((request.get_full_path(), request.headers.get('Accept', ''), deployment_version[0]))
+
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()[:32]
+
+
+def deployment_last_modified(request, *args, **kwargs):
+    """
+    Retrieve the last modification time of the deployment an analysis response is computed from.
+
+    :param request: HTTP request object
+    :return: The last modification datetime, or None if unknown.
+    """
+    deployment_version = get_deployment_version(request)
+
+    return deployment_version[1] if deployment_version is not None else None
+
+
+def deployment_condition(view):
+    """
+    Decorator answering conditional GET requests of an analysis view from the data version of its deployment.
+
+    Requests whose `If-None-Match` or `If-Modified-Since` headers match the current version get a 304 response
+    without the view being called. Successful responses carry the validators and must be revalidated before being
+    reused from a cache, error responses carry none.
+
+    :param view: View function reading the `sensor_id` and `timestamp` GET parameters.
+    :return: The decorated view.
+    """
+    conditional_view = condition(etag_func=deployment_etag, last_modified_func=deployment_last_modified)(view)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        response = conditional_view(request, *args, **kwargs)
+
+        if response.status_code == 200 and response.has_header('ETag'):
+            patch_cache_control(response, no_cache=True)
+        elif response.status_code != 304:
+            del response['ETag']
+            del response['Last-Modified']
+
+        return response
+
+    return wrapper
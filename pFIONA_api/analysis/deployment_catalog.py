@@ -0,0 +1,317 @@
+import hashlib
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Min, Max, Count
+from django.utils import timezone
+
+from pFIONA_sensors.models import Spectrum, SpectrumType, Deployment, Reaction
+
+# Deployment indexes of the sensors, refreshed once per catalog scope (e.g. a request)
+_deployment_indexes = ContextVar('deployment_indexes', default=None)
+
+# Reaction config versions of the sensors, read once per catalog scope
+_config_versions = ContextVar('config_versions', default=None)
+
+"""
+REFRESH
+"""
+
+
+def aggregate_deployments(sensor_id, deployment_ids=None):
+    """
+    Aggregate the catalog entries of some deployments of a sensor from their spectrums in a single query.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_ids: Optional list of deployments to aggregate (all deployments by default).
+    :return: A list of unsaved Deployment objects.
+    """
+    spectrums = Spectrum.objects.filter(pfiona_sensor_id=sensor_id, cycle__gte=1, deployment__isnull=False)
+    if deployment_ids is not None:
+        spectrums = spectrums.filter(deployment__in=deployment_ids)
+
+    # Aggregate every cycle of the deployments
+    deployments = {}
+    for row in spectrums.values('deployment', 'cycle').annotate(
+            cycle_start_time=Min('pfiona_time__timestamp'),
+            cycle_end_time=Max('pfiona_time__timestamp'),
+            spectrum_count=Count('id'),
+            last_spectrum_id=Max('id'),
+            reactions=ArrayAgg('pfiona_spectrumtype__reaction', distinct=True)
+    ).order_by('deployment', 'cycle'):
+        deployment = deployments.setdefault(row['deployment'], Deployment(
+            pfiona_sensor_id=sensor_id,
+            deployment=row['deployment'],
+            start_time=row['cycle_start_time'],
+            end_time=row['cycle_end_time'],
+            cycles={},
+            reactions=[]
+        ))
+
+        # Merge the cycle into its deployment
+        deployment.start_time = min(deployment.start_time, row['cycle_start_time'])
+        deployment.end_time = max(deployment.end_time, row['cycle_end_time'])
+        deployment.cycle_count += 1
+        deployment.spectrum_count += row['spectrum_count']
+        deployment.cycles[str(row['cycle'])] = [row['cycle_start_time'], row['cycle_end_time']]
+        deployment.reactions = sorted(set(deployment.reactions) | set(row['reactions']))
+        deployment.last_spectrum_id = max(deployment.last_spectrum_id, row['last_spectrum_id'])
+
+    return list(deployments.values())
+
+
+def refresh_deployment_catalog(sensor_id):
+    """
+    Bring the deployment catalog of a sensor up to date with the spectrums recorded since its last refresh.
+
+    The highest spectrum ID of the catalog is used as a high-water mark: only the deployments which received
+    spectrums above it are aggregated again.
+
+    :param sensor_id: The ID of the sensor.
+    :return: A dictionary mapping each deployment ID of the sensor to its Deployment entry.
+    """
+    catalog = {
+        deployment.deployment: deployment for deployment in Deployment.objects.filter(pfiona_sensor_id=sensor_id)
+    }
+    last_spectrum_id = max((deployment.last_spectrum_id for deployment in catalog.values()), default=0)
+
+    # Find the deployments which received new spectrums
+    updated = list(Spectrum.objects.filter(
+        pfiona_sensor_id=sensor_id,
+        id__gt=last_spectrum_id,
+        cycle__gte=1,
+        deployment__isnull=False
+    ).values_list('deployment', flat=True).distinct())
+    if not updated:
+        return catalog
+
+    # Parse the spectrum types the sensors may have inserted with the new spectrums, before they are aggregated
+    SpectrumType.parse_pending()
+
+    catalog.update({deployment.deployment: deployment for deployment in update_deployments(sensor_id, updated)})
+
+    return catalog
+
+
+def update_deployments(sensor_id, deployment_ids):
+    """
+    Aggregate some deployments of a sensor again and store their catalog entries.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_ids: List of deployments to aggregate.
+    :return: The list of updated Deployment entries.
+    """
+    # Refresh the deployment index of the sensor on its next use in the current catalog scope
+    indexes = _deployment_indexes.get()
+    if indexes is not None:
+        indexes.pop(int(sensor_id), None)
+
+    return Deployment.objects.bulk_create(
+        aggregate_deployments(sensor_id, deployment_ids),
+        update_conflicts=True,
+        unique_fields=['pfiona_sensor', 'deployment'],
+        update_fields=['start_time', 'end_time', 'cycle_count', 'spectrum_count', 'cycles', 'reactions',
+                       'last_spectrum_id', 'updated_at']
+    )
+
+
+def rebuild_deployment_catalog(sensor_id):
+    """
+    Rebuild the whole deployment catalog of a sensor from its spectrums.
+
+    :param sensor_id: The ID of the sensor.
+    :return: The number of deployments in the catalog.
+    """
+    # Parse the spectrum types inserted without their structured columns since the last rebuild
+    SpectrumType.parse_pending()
+    deployments = aggregate_deployments(sensor_id)
+
+    Deployment.objects.filter(pfiona_sensor_id=sensor_id).exclude(
+        deployment__in=[deployment.deployment for deployment in deployments]).delete()
+    Deployment.objects.bulk_create(
+        deployments,
+        update_conflicts=True,
+        unique_fields=['pfiona_sensor', 'deployment'],
+        update_fields=['start_time', 'end_time', 'cycle_count', 'spectrum_count', 'cycles', 'reactions',
+                       'last_spectrum_id', 'updated_at']
+    )
+
+    return len(deployments)
+
+
+def touch_deployment_catalog(sensor_id):
+    """
+    Mark every deployment of a sensor as modified, when the data their analysis depends on changes
+    without any spectrum being recorded (reaction parameters, deleted deployments).
+
+    :param sensor_id: The ID of the sensor.
+    :return: The number of deployments marked.
+    """
+    return Deployment.objects.filter(pfiona_sensor_id=sensor_id).update(updated_at=timezone.now())
+
+
+"""
+RESOLVER
+"""
+
+
+class DeploymentIndex:
+    """
+    Deployments of a sensor sorted by start time, to map a timestamp to its deployment with a binary search.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        deployments = sorted(catalog.values(), key=lambda deployment: (deployment.start_time, deployment.deployment))
+        self.start_times = [deployment.start_time for deployment in deployments]
+        self.deployment_ids = [deployment.deployment for deployment in deployments]
+
+    def resolve(self, timestamp):
+        """
+        Find the deployment of the latest spectrum recorded before a given timestamp.
+
+        :param timestamp: The timestamp to compare against.
+        :return: The deployment ID, or None if no deployment started before the timestamp.
+        """
+        index = bisect_left(self.start_times, timestamp)
+
+        return self.deployment_ids[index - 1] if index else None
+
+
+@contextmanager
+def deployment_catalog_scope():
+    """
+    Read the deployment catalog and the reaction config version of each sensor at most once inside the block.
+
+    Outside of any scope they are read again on every use, so that commands and background threads never work on a
+    stale catalog. Scopes are nested in the enclosing one.
+    """
+    if _deployment_indexes.get() is not None:
+        yield
+        return
+
+    indexes_token = _deployment_indexes.set({})
+    versions_token = _config_versions.set({})
+    try:
+        yield
+    finally:
+        _deployment_indexes.reset(indexes_token)
+        _config_versions.reset(versions_token)
+
+
+def get_deployment_index(sensor_id):
+    """
+    Retrieve the deployment index of a sensor, refreshing its catalog at most once per catalog scope.
+
+    :param sensor_id: The ID of the sensor.
+    :return: The DeploymentIndex of the sensor.
+    """
+    indexes = _deployment_indexes.get()
+    sensor_id = int(sensor_id)
+    if indexes is None:
+        return DeploymentIndex(refresh_deployment_catalog(sensor_id))
+
+    if sensor_id not in indexes:
+        indexes[sensor_id] = DeploymentIndex(refresh_deployment_catalog(sensor_id))
+
+    return indexes[sensor_id]
+
+
+def resolve_deployment(sensor_id, timestamp):
+    """
+    Find the deployment of a sensor in progress at a given timestamp.
+
+    :param sensor_id: The ID of the sensor.
+    :param timestamp: The timestamp to compare against, as a number.
+    :return: The deployment ID, or None if no deployment started before the timestamp.
+    """
+    return get_deployment_index(sensor_id).resolve(timestamp)
+
+
+"""
+READ
+"""
+
+
+def get_catalog_deployment(sensor_id, deployment_id):
+    """
+    Retrieve the up to date catalog entry of a deployment.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :return: The Deployment entry, or None if the deployment has no cycle.
+    """
+    return get_deployment_index(sensor_id).catalog.get(deployment_id)
+
+
+def get_catalog_cycle_times(sensor_id, deployment_id):
+    """
+    Retrieve the start and end times of every cycle of a deployment from the catalog.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :return: A dictionary mapping each cycle to its (start time, end time), ordered by cycle.
+    """
+    deployment = get_catalog_deployment(sensor_id, deployment_id)
+    if deployment is None:
+        return {}
+
+    return {int(cycle): tuple(times) for cycle, times in sorted(deployment.cycles.items(), key=lambda x: int(x[0]))}
+
+
+"""
+DATA VERSION
+"""
+
+
+def get_reaction_config_version(sensor_id):
+    """
+    Fingerprint the reaction parameters the analysis of a sensor depends on, read at most once per catalog scope.
+
+    :param sensor_id: The ID of the sensor.
+    :return: A hexadecimal digest of the names, standard concentrations and monitored wavelengths of the reactions.
+    """
+    versions = _config_versions.get()
+    if versions is None:
+        versions = {}
+
+    sensor_id = int(sensor_id)
+    if sensor_id not in versions:
+        rows = Reaction.objects.filter(standard__pfiona_sensor_id=sensor_id).order_by(
+            'id', 'wavelengthmonitored__wavelength'
+        ).values_list('id', 'name', 'standard_concentration', 'wavelengthmonitored__wavelength')
+        versions[sensor_id] = hashlib.sha256(repr(list(rows)).encode('utf-8')).hexdigest()
+
+    return versions[sensor_id]
+
+
+def get_data_version(sensor_id, deployment_id=None):
+    """
+    Retrieve the version of the data the analysis of a deployment is computed from, without reading any spectrum.
+
+    The version is made of the highest spectrum ID and number of spectrums of the deployment (or of every
+    deployment of the sensor), and of the reaction config version of the sensor.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: Optional ID of the deployment (the whole sensor by default).
+    :return: A tuple containing the version key and the last modification time of the catalog entries
+             (None if there is none).
+    """
+    catalog = get_deployment_index(sensor_id).catalog
+    if deployment_id is not None:
+        entries = [catalog[deployment_id]] if deployment_id in catalog else []
+    else:
+        entries = list(catalog.values())
+
+    version = (
+        int(sensor_id),
+        deployment_id,
+        max((entry.last_spectrum_id for entry in entries), default=0),
+        sum(entry.spectrum_count for entry in entries),
+        len(entries),
+        get_reaction_config_version(sensor_id),
+    )
+
+    return version, max((entry.updated_at for entry in entries), default=None)
@@ -0,0 +1,171 @@
+import json
+
+import numpy as np
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+
+from pFIONA_api.analysis.calibration_store import read_calibrations
+from pFIONA_api.analysis.deployment_catalog import deployment_catalog_scope
+from pFIONA_api.analysis.negotiation import NDJSON_CONTENT_TYPE, negotiated
+from pFIONA_api.analysis.spectrum_finder import get_deployment_id, get_cycle_times, build_deployment_info, \
+    load_spectrum_block, spectrums_to_dict, load_absorbance_block, get_completed_cycles, get_monitored_wavelengths, \
+    monitored_wavelength_values_to_dict, load_last_cycle_deployment_info, get_concentrations_in_cycles, \
+    concentrations_to_dict
+
+# Number of cycles loaded at once while streaming a deployment
+STREAM_BATCH_CYCLES = 10
+
+"""
+RECORDS
+"""
+
+
+def cycle_batches(cycle_times, batch_size=STREAM_BATCH_CYCLES):
+    """
+    Split the cycles of a deployment into batches of consecutive cycles.
+
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :param batch_size: Number of cycles per batch.
+    :return: A generator of lists of cycles.
+    """
+    cycles = sorted(cycle_times)
+    for start in range(0, len(cycles), batch_size):
+        yield cycles[start:start + batch_size]
+
+
+def stream_spectrums_in_deployment(timestamp, sensor_id, wavelength_monitored=False):
+    """
+    Generate the spectrums of an entire deployment one cycle at a time.
+
+    The first record holds the deployment information of the first cycle, then each record holds the spectrums
+    data of one cycle (reaction -> type -> subcycle -> spectrums) with its wavelengths.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param wavelength_monitored: Boolean flag to include 'wavelength_monitored' spectrums or not.
+    :return: A generator of records.
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+    if deployment_id is None:
+        yield {'deployment_info': None}
+        return
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    yield {'deployment_info': build_deployment_info(deployment_id, cycle_times, min(cycle_times, default=1))}
+
+    for cycles in cycle_batches(cycle_times):
+        block = load_spectrum_block(deployment_id, sensor_id, cycles=cycles,
+                                    wavelength_monitored=wavelength_monitored)
+        for cycle in np.unique(block.cycles).tolist():
+            cycle_block = block.select(block.cycles == cycle)
+            yield {
+                'cycle': cycle,
+                'data': spectrums_to_dict(cycle_block),
+                'wavelengths': cycle_block.wavelengths.tolist()
+            }
+
+
+def stream_monitored_wavelength_values_in_deployment(timestamp, sensor_id):
+    """
+    Generate the monitored absorbance wavelength values of an entire deployment one cycle at a time.
+
+    The first record holds the deployment information of the last cycle, then each record holds the monitored
+    wavelength values of one cycle (reaction -> type -> wavelength -> value, with the cycle start and end times).
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A generator of records.
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+    if deployment_id is None:
+        yield {'deployment_info': None}
+        return
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    yield {'deployment_info': load_last_cycle_deployment_info(deployment_id, sensor_id, cycle_times)}
+
+    monitored_wavelengths = get_monitored_wavelengths(sensor_id)
+    for cycles in cycle_batches(cycle_times):
+        absorbance_block = load_absorbance_block(deployment_id, sensor_id, cycle_times, cycles=cycles)
+        monitored_wavelength_values = monitored_wavelength_values_to_dict(absorbance_block.mean_over_subcycles(),
+                                                                          monitored_wavelengths)
+        for cycle in sorted(monitored_wavelength_values):
+            cycle_start_time, cycle_end_time = cycle_times.get(cycle, (None, None))
+            yield {
+                'cycle': cycle,
+                'data': {
+                    reaction: {'cycle_start_time': cycle_start_time, 'cycle_end_time': cycle_end_time, **types}
+                    for reaction, types in monitored_wavelength_values[cycle].items()
+                }
+            }
+
+
+def stream_concentration_in_deployment(timestamp, sensor_id):
+    """
+    Generate the concentrations of an entire deployment one cycle at a time.
+
+    The first record holds the deployment information of the last cycle, then each record holds the
+    concentrations of one cycle (reaction -> 'concentration' -> wavelength -> value, with the cycle start and end
+    times). Calibration curves are carried from one batch of cycles to the next.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A generator of records.
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+    if deployment_id is None:
+        yield {'deployment_info': None}
+        return
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    deployment_info = load_last_cycle_deployment_info(deployment_id, sensor_id, cycle_times)
+    yield {'deployment_info': deployment_info}
+    if deployment_info is None:
+        return
+
+    completed = set(get_completed_cycles(deployment_id, sensor_id, cycle_times))
+    curves = read_calibrations(sensor_id, deployment_id)
+    std_concs = {}
+    for cycles in cycle_batches(cycle_times):
+        concentrations, _ = get_concentrations_in_cycles(deployment_id, sensor_id, cycle_times, cycles, completed,
+                                                         curves=curves, std_concs=std_concs)
+        concentrations = concentrations_to_dict(concentrations, cycle_times)
+        for cycle in cycles:
+            data = {reaction: reaction_cycles[cycle] for reaction, reaction_cycles in concentrations.items()
+                    if cycle in reaction_cycles}
+            if data:
+                yield {'cycle': cycle, 'data': data}
+
+
+"""
+RESPONSE
+"""
+
+
+def ndjson_lines(records):
+    """
+    Serialize records as newline-delimited JSON.
+
+    An error raised while generating the records ends the stream with an error record, as the status
+    of the response is already sent. The records are generated after the view has returned, outside of the
+    catalog scope of the request, so they open their own.
+
+    :param records: Generator of records.
+    :return: A generator of JSON lines.
+    """
+    with deployment_catalog_scope():
+        try:
+            for record in records:
+                yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+        except Exception as e:
+            yield json.dumps({'status': 'error', 'message': str(e)}) + '\n'
+
+
+def ndjson_response(records):
+    """
+    Build the streaming HTTP response of newline-delimited JSON records.
+
+    :param records: Generator of records.
+    :return: A StreamingHttpResponse sending one line per record as soon as it is generated.
+    """
+    return negotiated(StreamingHttpResponse(ndjson_lines(records), content_type=NDJSON_CONTENT_TYPE))
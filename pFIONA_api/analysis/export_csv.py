@@ -4,6 +4,7 @@ from django.http import HttpResponse
 from datetime import datetime
 
 from pFIONA_api.analysis.spectrum_finder import *
+from pFIONA_api.analysis.spectrum_values import load_spectrum_rows
 from pFIONA_sensors.models import Spectrum
 
 
@@ -17,50 +18,36 @@ def export_raw_data(timestamp, sensor_id):
     :param sensor_id: The ID of the sensor to retrieve data for.
     :return: An HTTP response containing the CSV file with the spectrum data.
     """
-    # Retrieve the latest spectrum before the given timestamp for the specified sensor
-    last_spectrum = Spectrum.objects.filter(
-        pfiona_sensor_id=sensor_id,
-        pfiona_time__timestamp__lt=timestamp,
-        cycle__gte=1
-    ).order_by('-pfiona_time__timestamp').first()
+    # Resolve the deployment of the timestamp
+    deployment_id = get_deployment_id(timestamp, sensor_id)
 
     # If no spectrum is found, return a 404 response
-    if not last_spectrum:
+    if deployment_id is None:
         return HttpResponse("No spectra found before the given timestamp.", status=404)
 
-    # Get the deployment ID from the last spectrum found
-    deployment_id = last_spectrum.deployment
-
     # Retrieve all spectrums associated with the same deployment
     spectrums = Spectrum.objects.filter(
         deployment=deployment_id,
         pfiona_sensor_id=sensor_id,
         cycle__gte=1
-    ).select_related(
-        'pfiona_spectrumtype',
-        'pfiona_time'
-    ).prefetch_related('value_set').order_by('id')
+    )
 
     # Initialize a list to store the data
     data = []
-    for spectrum in spectrums:
+    for id, timestamp, spectrum_type, cycle, wavelengths, values in load_spectrum_rows(spectrums):
         # Extract spectrum details
-        spectrum_type = spectrum.pfiona_spectrumtype.type
-        local_datetime = datetime.fromtimestamp(spectrum.pfiona_time.timestamp).strftime('%m/%d/%Y %H:%M:%S')
-        deployment = spectrum.deployment
-        cycle = spectrum.cycle
-        id = spectrum.id
-
-        # Iterate over the value set associated with the spectrum
-        for value in spectrum.value_set.all():
+        local_datetime = datetime.fromtimestamp(timestamp).strftime('%m/%d/%Y %H:%M:%S')
+
+        # Iterate over the values of the spectrum
+        for wavelength, value in zip(wavelengths, values):
             data.append({
                 'SpectrumType': spectrum_type,
                 'Timestamp': local_datetime,
-                'Deployment': deployment,
+                'Deployment': deployment_id,
                 'Cycle': cycle,
                 'Id': id,
-                'Wavelength': value.wavelength,
-                'Value': value.value
+                'Wavelength': wavelength,
+                'Value': value
             })
 
     # Convert the data list to a pandas DataFrame
@@ -33,6 +33,51 @@ def absorbance(ref_scan, dark_scan, sample_scan):
     return absorbance_values.tolist()
 
 
+def absorbance_batch(ref_scans, dark_scans, sample_scans, sizes=None):
+    """
+    Compute the absorbance of many scans at once.
+
+    Each row of the matrices is one (reference, dark, sample) triple, and gives the same result as `absorbance`
+    on that row: NaNs are replaced with 0 and infinite values with the minimum finite value of their row,
+    or 0 if the row has no finite value.
+
+    :param ref_scans: matrix of reference scans (one scan per row)
+    :param dark_scans: matrix of dark scans (one scan per row)
+    :param sample_scans: matrix of sample scans (one scan per row)
+    :param sizes: optional number of values of each row, the values after it are ignored and left as NaN
+
+    :return: matrix of absorbance
+    """
+    # Convert the input matrices to 2-D numpy arrays
+    ref_scans = np.atleast_2d(np.asarray(ref_scans, dtype=np.float64))
+    dark_scans = np.atleast_2d(np.asarray(dark_scans, dtype=np.float64))
+    sample_scans = np.atleast_2d(np.asarray(sample_scans, dtype=np.float64))
+
+    # Mask of the values belonging to each row
+    if sizes is None:
+        valid = np.ones(ref_scans.shape, dtype=bool)
+    else:
+        valid = np.arange(ref_scans.shape[1])[np.newaxis, :] < np.asarray(sizes)[:, np.newaxis]
+
+    # Calculate absorbance values, ignoring divide and invalid warnings
+    with np.errstate(divide='ignore', invalid='ignore'):
+        absorbance_values = np.log10((ref_scans - dark_scans) / (sample_scans - dark_scans))
+    # Replace NaNs with 0
+    absorbance_values[np.isnan(absorbance_values) & valid] = 0
+
+    # Replace infinite values with the minimum absorbance value of their row or 0 if no finite values exist
+    finite = np.isfinite(absorbance_values) & valid
+    row_min = np.where(finite, absorbance_values, np.inf).min(axis=1, initial=np.inf)
+    row_min[~finite.any(axis=1)] = 0
+    infinite = np.isinf(absorbance_values) & valid
+    absorbance_values[infinite] = np.broadcast_to(row_min[:, np.newaxis], absorbance_values.shape)[infinite]
+
+    # Values after the size of each row are left as NaN
+    absorbance_values[~valid] = np.nan
+
+    return absorbance_values
+
+
 def concentration(abs_sample, abs_blank, abs_standard, std_conc):
     """
     Compute the concentration of a sample.
@@ -45,3 +90,40 @@ def concentration(abs_sample, abs_blank, abs_standard, std_conc):
     :return: concentration of the sample
     """
     return ((abs_sample - abs_blank) * std_conc) / (abs_standard - abs_blank)
+
+
+def linear_regression_batch(x, y, mask=None):
+    """
+    Fit many calibration lines at once with the closed-form least squares solution.
+
+    Each line is fitted through the points of the last axis, and gives the same line as `np.polyfit(x, y, 1)`
+    on its points.
+
+    :param x: concentrations of the points (broadcastable with y)
+    :param y: absorbances of the points
+    :param mask: optional boolean array of the points to use (all points by default)
+
+    :return: slope, intercept, coefficient of determination (NaN if y is constant) and number of points of
+             each line, NaN slopes and intercepts are given to lines whose concentrations do not vary
+    """
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+    mask = np.ones(x.shape, dtype=bool) if mask is None else np.broadcast_to(mask, x.shape)
+    points = mask.sum(axis=-1)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Center the points of each line on their means
+        x_mean = np.where(mask, x, 0).sum(axis=-1) / points
+        y_mean = np.where(mask, y, 0).sum(axis=-1) / points
+        dx = np.where(mask, x - x_mean[..., np.newaxis], 0)
+        dy = np.where(mask, y - y_mean[..., np.newaxis], 0)
+
+        sxx = (dx * dx).sum(axis=-1)
+        slope = np.where(sxx > 0, (dx * dy).sum(axis=-1) / sxx, np.nan)
+        intercept = y_mean - slope * x_mean
+
+        # Coefficient of determination from the residuals of each line
+        residuals = np.where(mask, y - (slope[..., np.newaxis] * x + intercept[..., np.newaxis]), 0)
+        ss_total = (dy * dy).sum(axis=-1)
+        r_squared = np.where(ss_total > 0, 1 - (residuals * residuals).sum(axis=-1) / ss_total, np.nan)
+
+    return slope, intercept, r_squared, points
@@ -0,0 +1,49 @@
+from django.utils.cache import patch_vary_headers
+
+# Media type of the binary spectrum payloads
+BINARY_CONTENT_TYPE = 'application/vnd.pfiona.spectrums'
+
+# Media type of the newline-delimited JSON streams
+NDJSON_CONTENT_TYPE = 'application/x-ndjson'
+
+# Media types announcing each payload format in an Accept header
+FORMAT_MEDIA_TYPES = {
+    'binary': (BINARY_CONTENT_TYPE, 'application/octet-stream'),
+    'ndjson': (NDJSON_CONTENT_TYPE,),
+}
+
+
+def requested_format(request, formats):
+    """
+    Find the payload format a request asks for, with the `format` parameter or the Accept header.
+
+    JSON stays the default when neither asks for another format.
+
+    :param request: HTTP request object
+    :param formats: List of the formats the endpoint serves besides 'json' ('binary', 'ndjson').
+    :return: The requested format.
+    """
+    format_parameter = request.GET.get('format')
+    if format_parameter:
+        if format_parameter != 'json' and format_parameter not in formats:
+            raise ValueError(f"Invalid format parameter, expected one of: {', '.join(['json', *formats])}")
+        return format_parameter
+
+    accept = request.headers.get('Accept', '')
+    for payload_format in formats:
+        if any(media_type in accept for media_type in FORMAT_MEDIA_TYPES[payload_format]):
+            return payload_format
+
+    return 'json'
+
+
+def negotiated(response):
+    """
+    Mark a response as depending on the Accept header, so that caches keep the payload formats apart.
+
+    :param response: HTTP response object
+    :return: The same response.
+    """
+    patch_vary_headers(response, ['Accept'])
+
+    return response
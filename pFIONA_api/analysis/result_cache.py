@@ -0,0 +1,112 @@
+import hashlib
+import threading
+from functools import wraps
+
+from django.core.cache import caches
+
+from pFIONA_api.analysis.deployment_catalog import resolve_deployment, get_data_version
+
+# Alias of the cache the analysis results are stored in (see CACHES in the settings)
+ANALYSIS_CACHE = 'analysis'
+
+# Hit and miss counters of each cached function, since the start of the process
+_stats = {}
+_stats_lock = threading.Lock()
+
+# Marker of a result missing from the cache, results themselves may be None
+_MISSING = object()
+
+"""
+STATISTICS
+"""
+
+
+def count_lookup(function_name, hit):
+    """
+    Count a lookup of a cached function result.
+
+    :param function_name: Name of the cached function.
+    :param hit: Boolean, True if the result was found in the cache.
+    """
+    with _stats_lock:
+        stats = _stats.setdefault(function_name, {'hits': 0, 'misses': 0})
+        stats['hits' if hit else 'misses'] += 1
+
+
+def get_cache_stats():
+    """
+    Retrieve the hit and miss counters of the analysis cache of this process.
+
+    :return: A dictionary containing the total hits and misses, and the hits and misses of each cached function.
+    """
+    with _stats_lock:
+        functions = {name: dict(stats) for name, stats in sorted(_stats.items())}
+
+    return {
+        'hits': sum(stats['hits'] for stats in functions.values()),
+        'misses': sum(stats['misses'] for stats in functions.values()),
+        'functions': functions,
+    }
+
+
+def reset_cache_stats():
+    """
+    Reset the hit and miss counters of the analysis cache of this process.
+    """
+    with _stats_lock:
+        _stats.clear()
+
+
+"""
+CACHE
+"""
+
+
+def result_key(function_name, sensor_id, deployment_id, args, version):
+    """
+    Build the cache key of a function result.
+
+    :param function_name: Name of the cached function.
+    :param sensor_id: The ID of the sensor.
+    :param deployment_id: The ID of the deployment.
+    :param args: Other arguments of the function (the cycle).
+    :param version: Data version of the deployment.
+    :return: The cache key.
+    """
+    key = repr((int(sensor_id), deployment_id, tuple(str(arg) for arg in args), version))
+
+    return f'pfiona:{function_name}:{hashlib.sha256(key.encode("utf-8")).hexdigest()}'
+
+
+def cached_result(function):
+    """
+    Decorator caching the results of an analysis function of a deployment in the analysis cache.
+
+    Results are keyed by sensor, deployment, other arguments, function and data version of the deployment, so that
+    new spectrums or reaction edits make the cached results unreachable. They are then evicted from the bounded
+    cache by more recent ones.
+
+    :param function: Function taking a timestamp, a sensor ID and optionally other arguments (the cycle).
+    :return: The decorated function.
+    """
+    @wraps(function)
+    def wrapper(timestamp, sensor_id, *args):
+        deployment_id = resolve_deployment(sensor_id, timestamp)
+
+        # Nothing worth caching without deployment
+        if deployment_id is None:
+            return function(timestamp, sensor_id, *args)
+
+        version, _ = get_data_version(sensor_id, deployment_id)
+        key = result_key(function.__name__, sensor_id, deployment_id, args, version)
+        cache = caches[ANALYSIS_CACHE]
+
+        result = cache.get(key, _MISSING)
+        count_lookup(function.__name__, result is not _MISSING)
+        if result is _MISSING:
+            result = function(timestamp, sensor_id, *args)
+            cache.set(key, result)
+
+        return result
+
+    return wrapper
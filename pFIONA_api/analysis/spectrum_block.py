@@ -0,0 +1,375 @@
+from functools import lru_cache
+
+import numpy as np
+
+from pFIONA_api.analysis.formula import absorbance_batch
+from pFIONA_sensors.models import SpectrumType, parse_spectrum_type
+
+"""
+SCAN KINDS
+"""
+
+DARK = SpectrumType.DARK
+REFERENCE = SpectrumType.REFERENCE
+MEASURE = SpectrumType.MEASURE
+MONITORED = 3
+
+
+@lru_cache(maxsize=None)
+def classify_spectrum_type(spectrum_type):
+    """
+    Split a spectrum type into its reaction name, organizing key and scan kind.
+
+    Types are parsed once per process, with the same rules as the structured columns of SpectrumType.
+
+    :param spectrum_type: The spectrum type (e.g. 'NO2_Standard_Dillution_2_Dark').
+    :return: A tuple containing the reaction name, the key (Blank, Sample, CRM, Standard, Standard_Dillution_X)
+             and the scan kind (DARK, REFERENCE, MEASURE or MONITORED).
+    """
+    parsed = parse_spectrum_type(spectrum_type)
+
+    # Determine the key for organizing spectrums based on their role
+    if parsed['role'] is None:
+        key = spectrum_type
+    elif parsed['dilution'] is not None:
+        key = f"{parsed['role']}_Dillution_{parsed['dilution']}"
+    else:
+        key = parsed['role']
+
+    # Wavelength monitored scans are neither Dark nor Reference scans
+    if parsed['scan_kind'] == MEASURE and parsed['is_wavelength_monitored']:
+        scan = MONITORED
+    else:
+        scan = parsed['scan_kind']
+
+    return parsed['reaction'], key, scan
+
+
+def group_codes(*columns):
+    """
+    Number the distinct combinations of several integer columns.
+
+    :param columns: Integer arrays of the same length.
+    :return: A tuple containing the group code of each row and the index of the first row of each group.
+    """
+    if len(columns[0]) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    _, first_rows, codes = np.unique(np.stack(columns, axis=1), axis=0, return_index=True, return_inverse=True)
+
+    return codes.reshape(-1), first_rows
+
+
+@lru_cache(maxsize=1024)
+def _closest_wavelength_indices(axis, wavelengths):
+    axis = np.frombuffer(axis, dtype=np.float64)
+    wavelengths = np.array(wavelengths, dtype=np.float64)
+
+    # Compare each wavelength with the axis wavelengths just below and above it, preferring the lower one on ties
+    upper = np.clip(np.searchsorted(axis, wavelengths, side='left'), 1, len(axis) - 1)
+    lower = upper - 1
+    indices = np.where(wavelengths - axis[lower] <= axis[upper] - wavelengths, lower, upper)
+
+    # Point repeated axis wavelengths to their first occurrence
+    indices = np.searchsorted(axis, axis[indices], side='left')
+    indices.setflags(write=False)
+
+    return indices
+
+
+def closest_wavelength_indices(axis, wavelengths):
+    """
+    Find the index of the closest axis wavelength of each wavelength with a sorted search.
+
+    Indices are cached per (wavelength axis, wavelengths), so that they are computed once for every cycle
+    sharing the same axis. Ties are resolved towards the lower wavelength, as `argmin` does.
+
+    :param axis: Sorted wavelength axis.
+    :param wavelengths: Wavelengths to look up.
+    :return: A read-only integer array of axis indices.
+    """
+    axis = np.ascontiguousarray(axis, dtype=np.float64)
+    if len(axis) < 2:
+        return np.zeros(len(wavelengths), dtype=np.int64)
+
+    return _closest_wavelength_indices(axis.tobytes(), tuple(wavelengths))
+
+
+class SpectrumBlock:
+    """
+    Array-backed set of spectrums sharing one wavelength axis.
+
+    Values are stored in a (spectrums x wavelengths) float64 matrix, and the metadata of each spectrum
+    (id, time, type, cycle, subcycle) in parallel arrays. Types are stored as codes into `type_names`,
+    and are classified once per distinct type into reaction, key and scan kind codes.
+    """
+
+    def __init__(self, wavelengths, values, ids, times, types, type_names, cycles, subcycles=None, sizes=None,
+                 deployment=None):
+        self.wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        self.values = np.asarray(values, dtype=np.float64).reshape(len(ids), len(self.wavelengths))
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.times = np.asarray(times, dtype=np.int64)
+        self.types = np.asarray(types, dtype=np.int64)
+        self.type_names = list(type_names)
+        self.cycles = np.asarray(cycles, dtype=np.int64)
+        self.sizes = np.full(len(self.ids), len(self.wavelengths), dtype=np.int64) if sizes is None else \
+            np.asarray(sizes, dtype=np.int64)
+        self.deployment = deployment
+
+        # Classify each distinct type once, then spread the codes over the rows
+        classified = [classify_spectrum_type(type_name) for type_name in self.type_names]
+        self.reaction_names = sorted({reaction for reaction, _, _ in classified})
+        self.key_names = sorted({key for _, key, _ in classified})
+        type_reactions = np.array([self.reaction_names.index(reaction) for reaction, _, _ in classified],
+                                  dtype=np.int64)
+        type_keys = np.array([self.key_names.index(key) for _, key, _ in classified], dtype=np.int64)
+        type_scans = np.array([scan for _, _, scan in classified], dtype=np.int64)
+        self.reactions = type_reactions[self.types] if len(classified) else np.zeros(0, dtype=np.int64)
+        self.keys = type_keys[self.types] if len(classified) else np.zeros(0, dtype=np.int64)
+        self.scans = type_scans[self.types] if len(classified) else np.zeros(0, dtype=np.int64)
+
+        self.subcycles = self.compute_subcycles() if subcycles is None else np.asarray(subcycles, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def from_rows(cls, rows, deployment=None, subcycles=None):
+        """
+        Build a block from (id, timestamp, type, cycle, wavelengths, values) rows ordered by ID.
+
+        Rows with fewer values than the longest one (e.g. wavelength monitored spectrums) keep their values
+        at the start of the row and are padded with NaN.
+
+        :param rows: Iterable of (id, timestamp, type, cycle, wavelengths, values) tuples.
+        :param deployment: The deployment the spectrums belong to.
+        :param subcycles: Optional subcycle of each row, computed from the scans when not given.
+        :return: A SpectrumBlock.
+        """
+        rows = list(rows)
+        type_names = []
+        type_codes = {}
+        types = []
+        wavelengths = []
+
+        for _, _, spectrum_type, _, row_wavelengths, _ in rows:
+            if spectrum_type not in type_codes:
+                type_codes[spectrum_type] = len(type_names)
+                type_names.append(spectrum_type)
+            types.append(type_codes[spectrum_type])
+
+            # Keep the longest wavelength axis as the shared one
+            if len(row_wavelengths) > len(wavelengths):
+                wavelengths = row_wavelengths
+
+        sizes = np.fromiter((len(row[5]) for row in rows), dtype=np.int64, count=len(rows))
+        if len(rows) and (sizes == len(wavelengths)).all():
+            values = np.array([row[5] for row in rows], dtype=np.float64)
+        else:
+            values = np.full((len(rows), len(wavelengths)), np.nan)
+            for index, row in enumerate(rows):
+                values[index, :sizes[index]] = row[5]
+
+        return cls(
+            wavelengths=wavelengths,
+            values=values,
+            ids=[row[0] for row in rows],
+            times=[row[1] for row in rows],
+            types=types,
+            type_names=type_names,
+            cycles=[row[3] for row in rows],
+            subcycles=subcycles,
+            sizes=sizes,
+            deployment=deployment,
+        )
+
+    @classmethod
+    def concatenate(cls, blocks):
+        """
+        Stack several blocks into one.
+
+        The longest wavelength axis is kept, and the values of the other blocks are padded with NaN.
+
+        :param blocks: List of SpectrumBlocks of the same deployment.
+        :return: A SpectrumBlock containing the rows of every block, in order.
+        """
+        wavelengths = max((block.wavelengths for block in blocks), key=len)
+
+        # Merge type names and translate the type codes of each block
+        type_names = []
+        types = []
+        for block in blocks:
+            for type_name in block.type_names:
+                if type_name not in type_names:
+                    type_names.append(type_name)
+            translation = np.array([type_names.index(type_name) for type_name in block.type_names], dtype=np.int64)
+            types.append(translation[block.types] if len(translation) else block.types)
+
+        values = np.full((sum(len(block) for block in blocks), len(wavelengths)), np.nan)
+        start = 0
+        for block in blocks:
+            values[start:start + len(block), :len(block.wavelengths)] = block.values
+            start += len(block)
+
+        return cls(
+            wavelengths=wavelengths,
+            values=values,
+            ids=np.concatenate([block.ids for block in blocks]),
+            times=np.concatenate([block.times for block in blocks]),
+            types=np.concatenate(types),
+            type_names=type_names,
+            cycles=np.concatenate([block.cycles for block in blocks]),
+            subcycles=np.concatenate([block.subcycles for block in blocks]),
+            sizes=np.concatenate([block.sizes for block in blocks]),
+            deployment=blocks[0].deployment,
+        )
+
+    def select(self, rows):
+        """
+        Extract a subset of the spectrums.
+
+        :param rows: Boolean mask or index array of the rows to keep.
+        :return: A new SpectrumBlock sharing the wavelength axis and type names.
+        """
+        return SpectrumBlock(
+            wavelengths=self.wavelengths,
+            values=self.values[rows],
+            ids=self.ids[rows],
+            times=self.times[rows],
+            types=self.types[rows],
+            type_names=self.type_names,
+            cycles=self.cycles[rows],
+            subcycles=self.subcycles[rows],
+            sizes=self.sizes[rows],
+            deployment=self.deployment,
+        )
+
+    def compute_subcycles(self):
+        """
+        Number the subcycles of each (cycle, reaction, key) group.
+
+        Spectrums are taken in ID order, and a new subcycle starts on every Dark scan of a group
+        except when it is the very first spectrum of the group.
+
+        :return: Array containing the subcycle of each spectrum.
+        """
+        if not len(self):
+            return np.zeros(0, dtype=np.int64)
+
+        groups, _ = group_codes(self.cycles, self.reactions, self.keys)
+        order = np.argsort(groups, kind='stable')
+        sorted_groups = groups[order]
+        darks = (self.scans[order] == DARK).astype(np.int64)
+
+        # Running count of Dark scans inside each group
+        starts = np.flatnonzero(np.r_[True, sorted_groups[1:] != sorted_groups[:-1]])
+        counts = np.cumsum(darks)
+        offsets = np.repeat(counts[starts] - darks[starts], np.diff(np.r_[starts, len(order)]))
+        first_is_dark = np.repeat(darks[starts], np.diff(np.r_[starts, len(order)]))
+
+        subcycles = np.empty(len(self), dtype=np.int64)
+        subcycles[order] = counts - offsets - first_is_dark
+
+        return subcycles
+
+    def display_order(self, rows):
+        """
+        Sort rows by cycle, then by first appearance of their reaction and key, then by subcycle.
+
+        This is the order in which the organized dictionaries have always listed reactions and types.
+
+        :param rows: Index array of the rows to sort.
+        :return: The permutation of `rows` that sorts them.
+        """
+        reaction_codes, reaction_first = group_codes(self.cycles, self.reactions)
+        key_codes, key_first = group_codes(self.cycles, self.reactions, self.keys)
+
+        reaction_rank = reaction_first[reaction_codes[rows]]
+        key_rank = key_first[key_codes[rows]]
+
+        return np.lexsort((self.subcycles[rows], key_rank, reaction_rank, self.cycles[rows]))
+
+    def absorbance(self):
+        """
+        Compute the absorbance of every (cycle, reaction, key, subcycle) group.
+
+        Each group uses its first Reference, first Dark and first measured scan. Groups missing one of them
+        are skipped, and so are groups whose scans do not have the same number of values.
+
+        :return: A SpectrumBlock of absorbance values, one row per group, carrying the ID, time and type
+                 of the measured scan.
+        """
+        groups, _ = group_codes(self.cycles, self.reactions, self.keys, self.subcycles)
+
+        # First scan of each kind in every group (rows are ordered by ID)
+        first_scans = {}
+        for scan in (REFERENCE, DARK, MEASURE):
+            rows = np.flatnonzero(self.scans == scan)
+            scan_groups, first = np.unique(groups[rows], return_index=True)
+            first_scans[scan] = dict(zip(scan_groups.tolist(), rows[first].tolist()))
+
+        complete = sorted(set(first_scans[REFERENCE]) & set(first_scans[DARK]) & set(first_scans[MEASURE]))
+        ref_rows = np.array([first_scans[REFERENCE][group] for group in complete], dtype=np.int64)
+        dark_rows = np.array([first_scans[DARK][group] for group in complete], dtype=np.int64)
+        sample_rows = np.array([first_scans[MEASURE][group] for group in complete], dtype=np.int64)
+
+        # Skip groups whose scans do not have the same number of values
+        matching = (self.sizes[ref_rows] == self.sizes[dark_rows]) & (self.sizes[dark_rows] == self.sizes[sample_rows])
+        for ref_row, dark_row, sample_row in zip(ref_rows[~matching], dark_rows[~matching], sample_rows[~matching]):
+            print(f"Skipping due to shape mismatch: ref={self.sizes[ref_row]}, dark={self.sizes[dark_row]}, "
+                  f"sample={self.sizes[sample_row]}")
+        ref_rows, dark_rows, sample_rows = ref_rows[matching], dark_rows[matching], sample_rows[matching]
+
+        # Keep the groups in display order
+        order = self.display_order(sample_rows)
+        ref_rows, dark_rows, sample_rows = ref_rows[order], dark_rows[order], sample_rows[order]
+
+        # Compute the absorbance of every group at once
+        values = absorbance_batch(self.values[ref_rows], self.values[dark_rows], self.values[sample_rows],
+                                  sizes=self.sizes[sample_rows])
+
+        return SpectrumBlock(
+            wavelengths=self.wavelengths,
+            values=values,
+            ids=self.ids[sample_rows],
+            times=self.times[sample_rows],
+            types=self.types[sample_rows],
+            type_names=self.type_names,
+            cycles=self.cycles[sample_rows],
+            subcycles=self.subcycles[sample_rows],
+            sizes=self.sizes[sample_rows],
+            deployment=self.deployment,
+        )
+
+    def mean_over_subcycles(self):
+        """
+        Average the rows of every (cycle, reaction, key) group across its subcycles.
+
+        :return: A SpectrumBlock with one row per group, carrying the metadata of the group's first row.
+        """
+        groups, first_rows = group_codes(self.cycles, self.reactions, self.keys)
+
+        # Sum the rows of each group in one pass over the rows sorted by group
+        order = np.argsort(groups, kind='stable')
+        starts = np.flatnonzero(np.r_[True, groups[order][1:] != groups[order][:-1]])
+        sums = np.add.reduceat(self.values[order], starts, axis=0) if len(order) else \
+            np.zeros((0, len(self.wavelengths)))
+        means = sums / np.diff(np.r_[starts, len(order)])[:, np.newaxis]
+
+        # Keep the groups in the order of their first row
+        order = np.argsort(first_rows, kind='stable')
+        first_rows = first_rows[order]
+
+        return SpectrumBlock(
+            wavelengths=self.wavelengths,
+            values=means[order],
+            ids=self.ids[first_rows],
+            times=self.times[first_rows],
+            types=self.types[first_rows],
+            type_names=self.type_names,
+            cycles=self.cycles[first_rows],
+            subcycles=np.zeros(len(first_rows), dtype=np.int64),
+            sizes=self.sizes[first_rows],
+            deployment=self.deployment,
+        )
@@ -1,12 +1,25 @@
 import numpy as np
 
-from pFIONA_api.analysis.formula import absorbance, concentration
+from pFIONA_api.analysis.absorbance_store import read_absorbance, read_absorbance_cycles, write_absorbance, \
+    delete_absorbance
+from pFIONA_api.analysis.block_scope import get_block_scope, spectrum_block_key, absorbance_block_key
+from pFIONA_api.analysis.calibration_store import read_calibrations, write_calibrations, delete_calibrations, \
+    CalibrationIndex
+from pFIONA_api.analysis.concentration_engine import monitored_tensors, fit_dilution_curves, \
+    compute_tensor_concentrations
+from pFIONA_api.analysis.concentration_store import read_concentrations, write_concentrations, invalidate_concentrations
+from pFIONA_api.analysis.deployment_catalog import get_deployment_index, get_catalog_deployment, \
+    get_catalog_cycle_times, resolve_deployment
+from pFIONA_api.analysis.formula import absorbance
+from pFIONA_api.analysis.result_cache import cached_result
+from pFIONA_api.analysis.spectrum_block import SpectrumBlock, classify_spectrum_type, closest_wavelength_indices, \
+    MONITORED
+from pFIONA_api.analysis.spectrum_values import load_spectrum_rows
 from pFIONA_api.queries import get_standard_concentration
-from pFIONA_sensors.models import Spectrum, Reaction, WavelengthMonitored
+from pFIONA_sensors.models import Spectrum, SpectrumType, WavelengthMonitored, Absorbance
 
 from collections import defaultdict
-from django.db.models import Q, Min, Max
-from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Max
 
 """
 CYCLE COUNT
@@ -21,168 +34,407 @@ def get_cycle_count(timestamp, sensor_id):
     :param sensor_id: The ID of the sensor to retrieve data for.
     :return: The count of cycles associated with the same deployment.
     """
-    # Retrieve the latest spectrum before the given timestamp for the specified sensor
-    last_spectrum = Spectrum.objects.filter(
-        pfiona_sensor_id=sensor_id,
-        pfiona_time__timestamp__lt=timestamp
-    ).exclude(
-        pfiona_spectrumtype__type__endswith='wavelength_monitored',
-        cycle=0
-    ).order_by('-pfiona_time__timestamp').first()
-
-    if last_spectrum:
-        deployment_id = last_spectrum.deployment
-
-        # Count the number of cycles associated with the same deployment
-        cycles = Spectrum.objects.filter(
-            deployment=deployment_id,
-            cycle__gte=1
-        ).values_list('cycle', flat=True).distinct()
-
-        return cycles.count()
+    # Resolve the deployment of the timestamp and read its number of cycles from the deployment catalog
+    deployment_id = resolve_deployment(sensor_id, timestamp)
+
+    if deployment_id is not None:
+        deployment = get_catalog_deployment(sensor_id, deployment_id)
+
+        return deployment.cycle_count if deployment else 0
     else:
         return 0
 
 
 """
-GET RAW SPECTRUMS
+DEPLOYMENT LOADER
 """
 
 
-def get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle, wavelength_monitored=False):
+def get_deployment_id(timestamp, sensor_id):
     """
-    Retrieve full information about spectrums in a specific cycle for a given sensor.
+    Retrieve the deployment of the latest spectrum recorded before a given timestamp.
+
+    The deployment is resolved with a binary search over the deployment catalog of the sensor,
+    which is refreshed at most once per request.
 
     :param timestamp: The timestamp to compare against.
     :param sensor_id: The ID of the sensor to retrieve data for.
-    :param cycle: The cycle number to retrieve spectrums for.
+    :return: The deployment ID, or None if no spectrum is found.
+    """
+    return resolve_deployment(sensor_id, timestamp)
+
+
+def build_deployment_info(deployment_id, cycle_times, cycle):
+    """
+    Build the deployment information dictionary for a given cycle.
+
+    :param deployment_id: The ID of the deployment.
+    :param cycle_times: Dictionary mapping each cycle to its (start time, end time).
+    :param cycle: The cycle number the information is built for.
+    :return: A dictionary containing the deployment and cycle start and end times.
+    """
+    cycle_start_time, cycle_end_time = cycle_times.get(cycle, (None, None))
+
+    return {
+        'deployment_id': deployment_id,
+        'deployment_start_time': min((start for start, _ in cycle_times.values()), default=None),
+        'deployment_end_time': max((end for _, end in cycle_times.values()), default=None),
+        'cycle_start_time': cycle_start_time,
+        'cycle_end_time': cycle_end_time,
+    }
+
+
+def get_cycle_times(deployment_id, sensor_id):
+    """
+    Retrieve the start and end times of every cycle of a deployment from the deployment catalog.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A dictionary mapping each cycle to its (start time, end time), ordered by cycle.
+    """
+    return get_catalog_cycle_times(sensor_id, deployment_id)
+
+
+def load_spectrum_block(deployment_id, sensor_id, cycles=None, wavelength_monitored=False):
+    """
+    Load the spectrums of a deployment with their value arrays in a single query.
+
+    Inside a batch, the block is shared with the other queries of the batch.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycles: Optional list of cycles to restrict the spectrums loaded.
     :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
-    :return: A tuple containing spectrums data, wavelengths, and deployment information.
+    :return: The SpectrumBlock of the spectrums.
     """
+    scope = get_block_scope()
+    if scope is not None:
+        if cycles is None:
+            cycles = list(get_cycle_times(deployment_id, sensor_id))
+        return scope.load(spectrum_block_key(sensor_id, deployment_id, wavelength_monitored), cycles,
+                          lambda loaded: fetch_spectrum_block(deployment_id, sensor_id, loaded, wavelength_monitored))
 
-    # Retrieve the latest spectrum before the given timestamp for the specified sensor
-    last_spectrum = Spectrum.objects.filter(
-        pfiona_sensor_id=sensor_id,
-        pfiona_time__timestamp__lt=timestamp,
-        cycle__gte=1
-    ).exclude(
-        pfiona_spectrumtype__type__endswith='wavelength_monitored'
-    ).order_by('-pfiona_time__timestamp').first()
+    return fetch_spectrum_block(deployment_id, sensor_id, cycles, wavelength_monitored)
 
-    # If no spectrum is found, return None for all outputs
-    if not last_spectrum:
-        return None, None, None
 
-    # Get the deployment ID from the last spectrum found
-    deployment_id = last_spectrum.deployment
+def fetch_spectrum_block(deployment_id, sensor_id, cycles=None, wavelength_monitored=False):
+    """
+    Fetch the spectrums of a deployment with their value arrays from the database in a single query.
 
-    # Aggregate start and end times for both the deployment and the specific cycle
-    times = Spectrum.objects.filter(
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycles: Optional list of cycles to restrict the spectrums loaded.
+    :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
+    :return: The SpectrumBlock of the spectrums.
+    """
+    # Retrieve spectrums of the whole deployment (or of the given cycles), with or without wavelength monitoring
+    spectrums = Spectrum.objects.filter(
         deployment=deployment_id,
         pfiona_sensor_id=sensor_id,
         cycle__gte=1
-    ).aggregate(
-        deployment_start_time=Min('pfiona_time__timestamp'),
-        deployment_end_time=Max('pfiona_time__timestamp'),
-        cycle_start_time=Min('pfiona_time__timestamp', filter=Q(cycle=cycle)),
-        cycle_end_time=Max('pfiona_time__timestamp', filter=Q(cycle=cycle))
     )
+    if cycles is not None:
+        spectrums = spectrums.filter(cycle__in=cycles)
+    if not wavelength_monitored:
+        spectrums = spectrums.exclude(pfiona_spectrumtype__is_wavelength_monitored=True)
 
-    # Extract the aggregated times
-    deployment_start_time = times['deployment_start_time']
-    deployment_end_time = times['deployment_end_time']
-    cycle_start_time = times['cycle_start_time']
-    cycle_end_time = times['cycle_end_time']
-
-    # Retrieve spectrums for the given cycle and sensor, with or without wavelength monitoring
-    if wavelength_monitored:
-        spectrums = Spectrum.objects.filter(
-            deployment=deployment_id,
-            cycle=cycle,
-            pfiona_sensor_id=sensor_id
-        ).select_related(
-            'pfiona_spectrumtype', 'pfiona_time'
-        ).annotate(
-            wavelengths=ArrayAgg('value__wavelength', ordering='value__wavelength'),
-            values=ArrayAgg('value__value', ordering='value__wavelength')
-        ).order_by('id')
-    else:
-        spectrums = Spectrum.objects.filter(
-            deployment=deployment_id,
-            cycle=cycle,
-            pfiona_sensor_id=sensor_id
-        ).exclude(
-            pfiona_spectrumtype__type__endswith='wavelength_monitored'
-        ).select_related(
-            'pfiona_spectrumtype', 'pfiona_time'
-        ).annotate(
-            wavelengths=ArrayAgg('value__wavelength', ordering='value__wavelength'),
-            values=ArrayAgg('value__value', ordering='value__wavelength')
-        ).order_by('id')
+    return SpectrumBlock.from_rows(load_spectrum_rows(spectrums), deployment=deployment_id)
 
-    # Initialize a dictionary to organize spectrum data
+
+def load_deployment_spectrums(timestamp, sensor_id, wavelength_monitored=False, cycle=None):
+    """
+    Load every spectrum of a deployment into a SpectrumBlock.
+
+    The deployment is resolved once, the start and end times of every cycle are aggregated in a single query,
+    and all spectrums with their value arrays are fetched in a single query, whatever the number of cycles.
+    Cycles and subcycles are then split in memory by the block.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
+    :param cycle: Optional cycle number to restrict the spectrums loaded to a single cycle.
+    :return: A tuple containing the deployment ID, a dictionary mapping each cycle to its (start time, end time),
+             and the SpectrumBlock of the spectrums, or (None, None, None).
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+
+    # If no spectrum is found, return None for all outputs
+    if deployment_id is None:
+        return None, None, None
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    block = load_spectrum_block(deployment_id, sensor_id, cycles=None if cycle is None else [cycle],
+                                wavelength_monitored=wavelength_monitored)
+
+    return deployment_id, cycle_times, block
+
+
+"""
+ABSORBANCE STORE
+"""
+
+
+def get_completed_cycles(deployment_id, sensor_id, cycle_times):
+    """
+    Find the cycles of a deployment whose spectrums are complete.
+
+    A cycle is complete once the sensor has started a later cycle, in the same deployment or in a later one.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :return: The sorted list of complete cycles.
+    """
+    cycles = sorted(cycle_times)
+
+    # The last cycle is only complete if the sensor has moved to a later deployment
+    if cycles and not any(deployment > deployment_id for deployment in get_deployment_index(sensor_id).catalog):
+        cycles = cycles[:-1]
+
+    return cycles
+
+
+def load_absorbance_block(deployment_id, sensor_id, cycle_times, cycles=None):
+    """
+    Load the absorbance spectrums of a deployment.
+
+    Absorbance spectrums of completed cycles are read from the absorbance store, where the imports store them.
+    Cycles which are not stored yet (the cycle in progress, or spectrums written directly by the sensors) are
+    computed from the raw spectrums, and stored as soon as they are complete.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :param cycles: Optional list of cycles to restrict the absorbance spectrums loaded.
+    :return: A SpectrumBlock of absorbance spectrums, one row per subcycle, in display order.
+    """
+    cycles = sorted(cycle_times) if cycles is None else sorted(cycles)
+
+    # Share the block with the other queries of a batch
+    scope = get_block_scope()
+    if scope is not None:
+        return scope.load(absorbance_block_key(sensor_id, deployment_id), cycles,
+                          lambda loaded: build_absorbance_block(deployment_id, sensor_id, cycle_times, loaded))
+
+    return build_absorbance_block(deployment_id, sensor_id, cycle_times, cycles)
+
+
+def build_absorbance_block(deployment_id, sensor_id, cycle_times, cycles):
+    """
+    Read the absorbance spectrums of some cycles of a deployment from the absorbance store, computing and storing
+    the ones which are not stored yet.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :param cycles: Sorted list of cycles.
+    :return: A SpectrumBlock of absorbance spectrums, one row per subcycle, in display order.
+    """
+    stored = read_absorbance(sensor_id, deployment_id, cycles)
+    missing = sorted(set(cycles) - read_absorbance_cycles(sensor_id, deployment_id, cycles))
+    if not missing:
+        return stored
+
+    # Compute the absorbance of the missing cycles from the raw spectrums
+    computed = load_spectrum_block(deployment_id, sensor_id, cycles=missing).absorbance()
+
+    # Store the absorbance of the completed cycles, even the ones without any absorbance spectrum
+    completed = [cycle for cycle in get_completed_cycles(deployment_id, sensor_id, cycle_times) if cycle in missing]
+    write_absorbance(sensor_id, computed.select(np.isin(computed.cycles, completed)), cycles=completed)
+
+    if not len(stored):
+        return computed
+
+    block = SpectrumBlock.concatenate([stored, computed])
+
+    return block.select(block.display_order(np.arange(len(block))))
+
+
+def load_deployment_absorbance(timestamp, sensor_id, cycle=None):
+    """
+    Load the absorbance spectrums of the deployment of a given timestamp.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle: Optional cycle number to restrict the absorbance spectrums loaded to a single cycle.
+    :return: A tuple containing the deployment ID, a dictionary mapping each cycle to its (start time, end time),
+             and the SpectrumBlock of absorbance spectrums, or (None, None, None).
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+
+    # If no spectrum is found, return None for all outputs
+    if deployment_id is None:
+        return None, None, None
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    block = load_absorbance_block(deployment_id, sensor_id, cycle_times, cycles=None if cycle is None else [cycle])
+
+    return deployment_id, cycle_times, block
+
+
+def store_deployment_absorbance(deployment_id, sensor_id, rebuild=False):
+    """
+    Compute and store the absorbance spectrums of the completed cycles of a deployment.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor.
+    :param rebuild: Boolean to delete and recompute the absorbance spectrums already stored.
+    :return: The number of absorbance spectrums stored.
+    """
+    # Concentrations and calibration curves are calculated from the absorbance spectrums, and invalidated with them
+    if rebuild:
+        delete_absorbance(sensor_id, deployment_id)
+        invalidate_concentrations(sensor_id, deployment_id=deployment_id)
+        delete_calibrations(sensor_id, deployment_id=deployment_id)
+
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    completed = get_completed_cycles(deployment_id, sensor_id, cycle_times)
+
+    # Only compute the completed cycles which are not stored yet
+    stored = read_absorbance_cycles(sensor_id, deployment_id)
+    missing = [cycle for cycle in completed if cycle not in stored]
+    if not missing:
+        return 0
+
+    return write_absorbance(sensor_id, load_spectrum_block(deployment_id, sensor_id, cycles=missing).absorbance(),
+                            cycles=missing)
+
+
+def spectrums_to_dict(block):
+    """
+    Organize the spectrums of a block by reaction, type key and subcycle.
+
+    :param block: SpectrumBlock of a single cycle.
+    :return: A dictionary containing spectrums data (reaction -> type -> subcycle -> spectrums).
+    """
     spectrums_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
-    wavelengths = []
-    current_subcycle = defaultdict(lambda: defaultdict(int))
+    wavelengths = block.wavelengths.tolist()
 
-    # Iterate over each spectrum to sort and organize data
-    for spectrum in spectrums:
-        if not wavelengths:
-            wavelengths = sorted(spectrum.wavelengths)  # Sort wavelengths initially
+    for row in block.display_order(np.arange(len(block))).tolist():
+        spectrum_type = block.type_names[block.types[row]]
+        spectrums_data[block.reaction_names[block.reactions[row]]][block.key_names[block.keys[row]]][
+            int(block.subcycles[row])].append({
+                'id': int(block.ids[row]),
+                'time': int(block.times[row]),
+                'spectrumtype': spectrum_type,
+                'cycle': int(block.cycles[row]),
+                'deployment': block.deployment,
+                'values': list(zip(wavelengths, block.values[row, :block.sizes[row]].tolist()))
+            })
 
-        # Sort values by the sorted order of wavelengths
-        sorted_values = [value for _, value in sorted(zip(spectrum.wavelengths, spectrum.values))]
+    return spectrums_data
 
-        # Prepare spectrum data structure
-        spectrum_data = {
-            'id': spectrum.id,
-            'time': spectrum.pfiona_time.timestamp,
-            'spectrumtype': spectrum.pfiona_spectrumtype.type,
-            'cycle': spectrum.cycle,
-            'deployment': spectrum.deployment,
-            'values': list(zip(wavelengths, sorted_values))  # Use sorted wavelengths and corresponding values
-        }
 
-        spectrum_type = spectrum.pfiona_spectrumtype.type
-        reaction_type = spectrum_type.split('_')[0]
-
-        parts = spectrum_type.split('_')
-
-        # Determine the key for organizing spectrums based on their type
-        if 'Blank' in spectrum_type:
-            key = 'Blank'
-        elif 'Sample' in spectrum_type:
-            key = 'Sample'
-        elif 'CRM' in spectrum_type:
-            key = 'CRM'
-        elif 'Standard' in spectrum_type:
-            if len(parts) >= 4 and parts[2] == 'Dillution':
-                dilution = parts[3]
-                key = f'Standard_Dillution_{dilution}'
-            else:
-                key = 'Standard'
-        else:
-            key = spectrum_type
+def absorbance_to_dict(block, deployment_info):
+    """
+    Organize the absorbance spectrums of a block by reaction, type key and subcycle.
 
-        # Handle subcycle increment for specific conditions
-        if key in spectrum_type and 'Dark' in spectrum_type and spectrums_data[reaction_type][key][
-            current_subcycle[reaction_type][key]]:
-            current_subcycle[reaction_type][key] += 1
+    The time of each sample scan is added to the deployment information under
+    'time_<reaction>_<type>_subcycle_<subcycle>'.
 
-        # Append spectrum data to the organized dictionary
-        spectrums_data[reaction_type][key][current_subcycle[reaction_type][key]].append(spectrum_data)
+    :param block: Absorbance SpectrumBlock of a single cycle.
+    :param deployment_info: Deployment information dictionary of the cycle, updated in place.
+    :return: A dictionary containing absorbance data (reaction -> type -> subcycle -> values).
+    """
+    absorbance_data = {}
 
-    # Prepare deployment information
-    deployment_info = {
-        'deployment_id': deployment_id,
-        'deployment_start_time': deployment_start_time,
-        'deployment_end_time': deployment_end_time,
-        'cycle_start_time': cycle_start_time,
-        'cycle_end_time': cycle_end_time,
-    }
+    for row in range(len(block)):
+        reaction = block.reaction_names[block.reactions[row]]
+        type_key = block.key_names[block.keys[row]]
+        subcycle = int(block.subcycles[row])
+
+        absorbance_data.setdefault(reaction, {}).setdefault(type_key, {})[subcycle] = \
+            block.values[row, :block.sizes[row]].tolist()
+        deployment_info["time_" + str(reaction) + "_" + str(type_key) + "_subcycle_" + str(subcycle)] = \
+            int(block.times[row])
+
+    return absorbance_data
+
+
+def mean_absorbance_to_dict(block):
+    """
+    Organize the mean absorbance spectrums of a block by reaction and type key.
+
+    :param block: Mean absorbance SpectrumBlock of a single cycle.
+    :return: A dictionary containing mean absorbance data (reaction -> type -> values).
+    """
+    mean_absorbance_data = {}
+
+    for row in range(len(block)):
+        mean_absorbance_data.setdefault(block.reaction_names[block.reactions[row]], {})[
+            block.key_names[block.keys[row]]] = block.values[row, :block.sizes[row]].tolist()
+
+    return mean_absorbance_data
+
+
+"""
+GET RAW SPECTRUMS
+"""
+
+
+def get_spectrums_in_cycle_block(timestamp, sensor_id, cycle, wavelength_monitored=False):
+    """
+    Retrieve the spectrums of a specific cycle for a given sensor as a block.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle: The cycle number to retrieve spectrums for.
+    :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
+    :return: A tuple containing the SpectrumBlock of the cycle and deployment information, or None for both.
+    """
+    cycle = int(cycle)
+
+    # Load the spectrums of the given cycle
+    deployment_id, cycle_times, block = load_deployment_spectrums(timestamp, sensor_id,
+                                                                  wavelength_monitored=wavelength_monitored,
+                                                                  cycle=cycle)
+
+    # If no spectrum is found, return None for all outputs
+    if deployment_id is None:
+        return None, None
+
+    return block, build_deployment_info(deployment_id, cycle_times, cycle)
+
+
+def get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle, wavelength_monitored=False):
+    """
+    Retrieve full information about spectrums in a specific cycle for a given sensor.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle: The cycle number to retrieve spectrums for.
+    :param wavelength_monitored: Boolean to include 'wavelength_monitored' spectrums or not.
+    :return: A tuple containing spectrums data, wavelengths, and deployment information.
+    """
+    block, deployment_info = get_spectrums_in_cycle_block(timestamp, sensor_id, cycle,
+                                                          wavelength_monitored=wavelength_monitored)
+
+    # If no spectrum is found, return None for all outputs
+    if block is None:
+        return None, None, None
 
     # Return the organized spectrums data, sorted wavelengths, and deployment information
-    return spectrums_data, wavelengths, deployment_info
+    return spectrums_to_dict(block), block.wavelengths.tolist(), deployment_info
+
+
+def get_spectrums_in_deployment_block(timestamp, sensor_id, wavelength_monitored=False):
+    """
+    Retrieve the spectrums of an entire deployment as a block.
+
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param wavelength_monitored: Boolean flag to include 'wavelength_monitored' spectrums or not.
+    :return: A tuple containing the SpectrumBlock of the deployment and deployment information, or None for both.
+    """
+    # Load every spectrum of the deployment at once
+    deployment_id, cycle_times, block = load_deployment_spectrums(timestamp, sensor_id,
+                                                                  wavelength_monitored=wavelength_monitored)
+
+    if deployment_id is None:
+        return None, None
+
+    # Deployment information is given for the first cycle of the deployment
+    return block, build_deployment_info(deployment_id, cycle_times, min(cycle_times, default=1))
 
 
 def get_spectrums_in_deployment_full_info(timestamp, sensor_id, wavelength_monitored=False):
@@ -197,33 +449,19 @@ def get_spectrums_in_deployment_full_info(timestamp, sensor_id, wavelength_monit
     :param wavelength_monitored: Boolean flag to include 'wavelength_monitored' spectrums or not.
     :return: A tuple containing all spectrums data, all wavelengths, and deployment information.
     """
-    # Retrieve the total number of cycles for the deployment
-    cycle_count = get_cycle_count(timestamp, sensor_id)
+    block, deployment_info = get_spectrums_in_deployment_block(timestamp, sensor_id,
+                                                               wavelength_monitored=wavelength_monitored)
 
-    if cycle_count == 0:
+    if block is None:
         return None, None, None
 
-    all_spectrums_data = defaultdict(lambda: defaultdict(dict))
-    all_wavelengths = []
-    deployment_info = None
-
-    # Iterate over each cycle to retrieve full spectrum information
-    for cycle in range(1, cycle_count + 1):
-        spectrums_data, wavelengths, cycle_deployment_info = get_spectrums_in_cycle_full_info(
-            timestamp, sensor_id, cycle, wavelength_monitored=wavelength_monitored
-        )
-
-        if spectrums_data:
-            all_spectrums_data[cycle] = spectrums_data
-
-        if wavelengths:
-            if not all_wavelengths:
-                all_wavelengths = wavelengths
-
-        if not deployment_info and cycle_deployment_info:
-            deployment_info = cycle_deployment_info
+    # Organize the spectrums of each cycle
+    all_spectrums_data = {
+        cycle: spectrums_to_dict(block.select(block.cycles == cycle))
+        for cycle in np.unique(block.cycles).tolist()
+    }
 
-    return all_spectrums_data, all_wavelengths, deployment_info
+    return all_spectrums_data, block.wavelengths.tolist(), deployment_info
 
 
 """
@@ -231,6 +469,7 @@ ABSORBANCE SPECTRUMS
 """
 
 
+@cached_result
 def get_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle):
     """
     Retrieve absorbance spectrums for a specific cycle and sensor.
@@ -240,48 +479,17 @@ def get_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle):
     :param cycle: The cycle number to retrieve spectrums for.
     :return: A tuple containing absorbance data, wavelengths, and deployment information.
     """
-    # Retrieve full spectrum information for the specified cycle and sensor
-    spectrums, wavelengths, deployment_info = get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle)
-    if not spectrums:
-        return None, None, None
-
-    absorbance_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
+    cycle = int(cycle)
 
-    # Process each reaction type and its corresponding spectrum data
-    for reaction, types in spectrums.items():
-        for type_key, subcycles in types.items():
-            for subcycle, spectrums_list in subcycles.items():
-                # Separate reference, dark, and sample scans
-                ref_scan = [s['values'] for s in spectrums_list if 'Reference' in s['spectrumtype']]
-                dark_scan = [s['values'] for s in spectrums_list if 'Dark' in s['spectrumtype']]
-                sample_scan = [s['values'] for s in spectrums_list if
-                               type_key in s['spectrumtype'] and 'Dark' not in s['spectrumtype'] and 'Reference' not in
-                               s['spectrumtype'] and 'wavelength_monitored' not in s['spectrumtype']]
-
-                # Ensure all necessary scans are available
-                if ref_scan and dark_scan and sample_scan:
-                    ref_values = [v[1] for v in ref_scan[0]]
-                    dark_values = [v[1] for v in dark_scan[0]]
-                    sample_values = [v[1] for v in sample_scan[0]]
+    # Load the absorbance spectrums of the given cycle
+    deployment_id, cycle_times, absorbance_block = load_deployment_absorbance(timestamp, sensor_id, cycle=cycle)
+    if deployment_id is None or cycle not in cycle_times:
+        return None, None, None
 
-                    # Compute absorbance values if the lengths match
-                    if len(ref_values) == len(dark_values) == len(sample_values):
-                        absorbance_values = absorbance(ref_values, dark_values, sample_values)
-                        absorbance_data[reaction][type_key][subcycle] = absorbance_values
-                        deployment_info["time_" + str(reaction) + "_" + str(type_key) + "_subcycle_" + str(subcycle)] = \
-                            [s['time'] for s in spectrums_list if
-                             type_key in s['spectrumtype'] and 'Dark' not in s['spectrumtype'] and 'Reference' not in
-                             s['spectrumtype'] and 'wavelength_monitored' not in s['spectrumtype']][0]
-                    else:
-                        print(
-                            f"Skipping due to shape mismatch: ref={len(ref_values)}, dark={len(dark_values)}, sample={len(sample_values)}")
+    deployment_info = build_deployment_info(deployment_id, cycle_times, cycle)
+    absorbance_data = absorbance_to_dict(absorbance_block, deployment_info)
 
-    # Convert defaultdict to dict to ensure JSON serialization
-    absorbance_data = {k: dict(v) for k, v in absorbance_data.items()}
-    for reaction, types in absorbance_data.items():
-        absorbance_data[reaction] = {k: dict(v) for k, v in types.items()}
-
-    return absorbance_data, wavelengths, deployment_info
+    return absorbance_data, absorbance_block.wavelengths.tolist(), deployment_info
 
 
 def get_mean_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle):
@@ -296,34 +504,18 @@ def get_mean_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle):
     :param cycle: The cycle number to retrieve spectrums for.
     :return: A tuple containing mean absorbance data, wavelengths, and deployment information.
     """
-    # Retrieve absorbance data, wavelengths, and deployment info for the specified cycle and sensor
-    absorbance_data, wavelengths, deployment_info = get_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle)
+    cycle = int(cycle)
 
-    if not absorbance_data:
+    # Load the absorbance spectrums of the given cycle
+    deployment_id, cycle_times, absorbance_block = load_deployment_absorbance(timestamp, sensor_id, cycle=cycle)
+    if deployment_id is None or not len(absorbance_block):
         return None, None, None
 
-    mean_absorbance_data = defaultdict(lambda: defaultdict(list))
+    deployment_info = build_deployment_info(deployment_id, cycle_times, cycle)
+    absorbance_to_dict(absorbance_block, deployment_info)
+    mean_absorbance_data = mean_absorbance_to_dict(absorbance_block.mean_over_subcycles())
 
-    # Process each reaction and its corresponding absorbance data
-    for reaction, types in absorbance_data.items():
-        for type_key, subcycles in types.items():
-            all_subcycle_values = []
-
-            # Collect all subcycle values for the current type key
-            for subcycle, values in subcycles.items():
-                all_subcycle_values.append(values)
-
-            # Calculate the mean values if there are multiple subcycles
-            if all_subcycle_values:
-                mean_values = np.mean(all_subcycle_values, axis=0).tolist()
-                mean_absorbance_data[reaction][type_key] = mean_values
-
-    # Convert defaultdict to dict to ensure JSON serialization
-    mean_absorbance_data = {k: dict(v) for k, v in mean_absorbance_data.items()}
-    for reaction, types in mean_absorbance_data.items():
-        mean_absorbance_data[reaction] = {k: v for k, v in types.items()}
-
-    return mean_absorbance_data, wavelengths, deployment_info
+    return mean_absorbance_data, absorbance_block.wavelengths.tolist(), deployment_info
 
 
 def get_absorbance_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle):
@@ -338,48 +530,29 @@ def get_absorbance_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle):
     :param cycle: The cycle number to retrieve absorbance spectrums for.
     :return: A tuple containing absorbance data, wavelengths, and deployment information.
     """
-    # Retrieve full spectrum information for the specified cycle and sensor
-    spectrums, wavelengths, deployment_info = get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle)
-    if not spectrums:
-        return None, None, None
+    return get_absorbance_spectrums_in_cycle(timestamp, sensor_id, cycle)
 
-    absorbance_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
 
-    # Process each reaction and its corresponding spectrum data
-    for reaction, types in spectrums.items():
-        for type_key, subcycles in types.items():
-            for subcycle, spectrums_list in subcycles.items():
-                # Separate reference, dark, and sample scans
-                ref_scan = [s['values'] for s in spectrums_list if 'Reference' in s['spectrumtype']]
-                dark_scan = [s['values'] for s in spectrums_list if 'Dark' in s['spectrumtype']]
-                sample_scan = [s['values'] for s in spectrums_list if
-                               type_key in s['spectrumtype'] and 'Dark' not in s['spectrumtype'] and 'Reference' not in
-                               s['spectrumtype'] and 'wavelength_monitored' not in s['spectrumtype']]
-
-                # Ensure all necessary scans are available
-                if ref_scan and dark_scan and sample_scan:
-                    ref_values = [v[1] for v in ref_scan[0]]
-                    dark_values = [v[1] for v in dark_scan[0]]
-                    sample_values = [v[1] for v in sample_scan[0]]
+def get_absorbance_spectrums_in_deployment_block(timestamp, sensor_id):
+    """
+    Retrieve the absorbance spectrums of an entire deployment as a block.
 
-                    # Compute absorbance values if the lengths match
-                    if len(ref_values) == len(dark_values) == len(sample_values):
-                        absorbance_values = absorbance(ref_values, dark_values, sample_values)
-                        absorbance_data[reaction][type_key][subcycle] = absorbance_values
-                        deployment_info["time_" + str(reaction) + "_" + str(type_key) + "_subcycle_" + str(subcycle)] = \
-                            [s['time'] for s in spectrums_list if
-                             type_key in s['spectrumtype'] and 'Dark' not in s['spectrumtype'] and 'Reference' not in
-                             s['spectrumtype'] and 'wavelength_monitored' not in s['spectrumtype']][0]
-                    else:
-                        print(
-                            f"Skipping due to shape mismatch: ref={len(ref_values)}, dark={len(dark_values)}, sample={len(sample_values)}")
+    Sample scan times are carried by the rows of the block instead of the deployment information.
 
-    # Convert defaultdict to dict to ensure JSON serialization
-    absorbance_data = {k: dict(v) for k, v in absorbance_data.items()}
-    for reaction, types in absorbance_data.items():
-        absorbance_data[reaction] = {k: dict(v) for k, v in types.items()}
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A tuple containing the absorbance SpectrumBlock of the deployment and deployment information,
+             or None for both.
+    """
+    # Load the absorbance spectrums of every subcycle of the deployment at once
+    deployment_id, cycle_times, absorbance_block = load_deployment_absorbance(timestamp, sensor_id)
 
-    return absorbance_data, wavelengths, deployment_info
+    # If no cycles are found, return None for all outputs
+    if deployment_id is None:
+        return None, None
+
+    # Deployment information is given for the first cycle of the deployment
+    return absorbance_block, build_deployment_info(deployment_id, cycle_times, min(cycle_times, default=1))
 
 
 def get_absorbance_spectrums_in_deployment_full_info(timestamp, sensor_id):
@@ -393,39 +566,31 @@ def get_absorbance_spectrums_in_deployment_full_info(timestamp, sensor_id):
     :param sensor_id: The ID of the sensor to retrieve data for.
     :return: A tuple containing all absorbance data, all wavelengths, and deployment information.
     """
-    # Retrieve the total number of cycles for the deployment
-    cycle_count = get_cycle_count(timestamp, sensor_id)
+    # Load the absorbance spectrums of every subcycle of the deployment at once
+    deployment_id, cycle_times, absorbance_block = load_deployment_absorbance(timestamp, sensor_id)
 
     # If no cycles are found, return None for all outputs
-    if cycle_count == 0:
+    if deployment_id is None:
         return None, None, None
 
-    # Initialize data structures to store absorbance data, wavelengths, and deployment information
-    all_absorbance_data = defaultdict(lambda: defaultdict(dict))
-    all_wavelengths = []
+    all_absorbance_data = {}
     deployment_info = None
 
-    # Iterate over each cycle to retrieve full absorbance spectrum information
-    for cycle in range(1, cycle_count + 1):
-        absorbance_data, wavelengths, cycle_deployment_info = get_absorbance_spectrums_in_cycle_full_info(
-            timestamp, sensor_id, cycle
-        )
+    # Split the absorbance data by cycle
+    for cycle in cycle_times:
+        cycle_deployment_info = build_deployment_info(deployment_id, cycle_times, cycle)
+        absorbance_data = absorbance_to_dict(absorbance_block.select(absorbance_block.cycles == cycle),
+                                             cycle_deployment_info)
 
         # Store absorbance data for the current cycle
         if absorbance_data:
             all_absorbance_data[cycle] = absorbance_data
 
-        # Store wavelengths if not already stored
-        if wavelengths:
-            if not all_wavelengths:
-                all_wavelengths = wavelengths
-
         # Update deployment information with the current cycle information
-        if cycle_deployment_info:
-            deployment_info = update_deployment_info_with_cycle(deployment_info, cycle_deployment_info, cycle)
+        deployment_info = update_deployment_info_with_cycle(deployment_info, cycle_deployment_info, cycle)
 
     # Return the collected absorbance data, wavelengths, and deployment information
-    return all_absorbance_data, all_wavelengths, deployment_info
+    return all_absorbance_data, absorbance_block.wavelengths.tolist(), deployment_info
 
 
 """
@@ -433,6 +598,59 @@ MONITORED WAVELENGTHS
 """
 
 
+def get_monitored_wavelengths(sensor_id):
+    """
+    Retrieve the monitored wavelengths of every reaction of a sensor in a single query.
+
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A dictionary mapping each reaction name to its sorted monitored wavelengths.
+    """
+    monitored_wavelengths = defaultdict(list)
+
+    for reaction_name, wavelength in WavelengthMonitored.objects.filter(
+            pfiona_reaction__standard__pfiona_sensor_id=sensor_id
+    ).values_list('pfiona_reaction__name', 'wavelength'):
+        monitored_wavelengths[reaction_name].append(wavelength)
+
+    # Sort the monitored wavelengths in ascending order
+    return {reaction: sorted(wavelengths) for reaction, wavelengths in monitored_wavelengths.items()}
+
+
+def monitored_wavelength_values_to_dict(block, monitored_wavelengths):
+    """
+    Extract the mean absorbance values at the monitored wavelengths of each reaction of a block.
+
+    :param block: Mean absorbance SpectrumBlock.
+    :param monitored_wavelengths: Dictionary mapping each reaction name to its sorted monitored wavelengths.
+    :return: A dictionary containing monitored wavelength values (cycle -> reaction -> type -> wavelength -> value).
+    """
+    monitored_wavelength_values = {}
+
+    # Find the indices of the closest wavelengths of every reaction of the block
+    reactions = [reaction for reaction in block.reaction_names if monitored_wavelengths.get(reaction)]
+    if not len(block) or not reactions:
+        return monitored_wavelength_values
+    indices = [closest_wavelength_indices(block.wavelengths, monitored_wavelengths[reaction]) for reaction in reactions]
+
+    # Extract the values of every monitored wavelength at once
+    values = block.values[:, np.concatenate(indices)].tolist()
+    offsets = np.cumsum([0] + [len(reaction_indices) for reaction_indices in indices]).tolist()
+    columns = {reaction: (offsets[i], offsets[i + 1]) for i, reaction in enumerate(reactions)}
+
+    for row in range(len(block)):
+        reaction = block.reaction_names[block.reactions[row]]
+
+        # If the reaction is not found, skip this reaction
+        if reaction not in columns:
+            continue
+
+        start, end = columns[reaction]
+        monitored_wavelength_values.setdefault(int(block.cycles[row]), {}).setdefault(reaction, {})[
+            block.key_names[block.keys[row]]] = dict(zip(monitored_wavelengths[reaction], values[row][start:end]))
+
+    return monitored_wavelength_values
+
+
 def get_monitored_wavelength_values_in_cycle(timestamp, sensor_id, cycle):
     """
     Retrieve monitored absorbance wavelength values for a specific cycle and sensor.
@@ -445,105 +663,112 @@ def get_monitored_wavelength_values_in_cycle(timestamp, sensor_id, cycle):
     :param cycle: The cycle number to retrieve wavelength values for.
     :return: A dictionary containing monitored wavelength values and deployment information.
     """
-    # Retrieve mean absorbance data, wavelengths, and deployment info for the specified cycle and sensor
-    mean_absorbance_data, wavelengths, deployment_info = get_mean_absorbance_spectrums_in_cycle(timestamp, sensor_id,
-                                                                                                cycle)
+    cycle = int(cycle)
 
-    if not mean_absorbance_data:
+    # Load the absorbance spectrums of the given cycle
+    deployment_id, cycle_times, absorbance_block = load_deployment_absorbance(timestamp, sensor_id, cycle=cycle)
+    if deployment_id is None or not len(absorbance_block):
         return None
 
-    monitored_wavelength_values = defaultdict(dict)
+    deployment_info = build_deployment_info(deployment_id, cycle_times, cycle)
+    absorbance_to_dict(absorbance_block, deployment_info)
+    monitored_wavelength_values = monitored_wavelength_values_to_dict(absorbance_block.mean_over_subcycles(),
+                                                                      get_monitored_wavelengths(sensor_id))
+
+    return monitored_wavelength_values.get(cycle, {}), deployment_info
 
-    # Process each reaction and its corresponding mean absorbance data
-    for reaction, types in mean_absorbance_data.items():
-        try:
-            # Retrieve the Reaction object corresponding to the reaction name
-            reaction_obj = Reaction.objects.get(name=reaction, standard__pfiona_sensor_id=sensor_id)
-        except Reaction.DoesNotExist:
-            # If the reaction is not found, skip this reaction
-            continue
 
-        # Retrieve all monitored wavelengths for this reaction
-        monitored_wavelengths = list(
-            WavelengthMonitored.objects.filter(pfiona_reaction=reaction_obj).values_list('wavelength', flat=True))
+def build_last_cycle_deployment_info(deployment_id, cycle_times, absorbance_block):
+    """
+    Build the deployment information of the last cycle with absorbance data.
 
-        # Sort the monitored wavelengths in ascending order
-        monitored_wavelengths.sort()
+    :param deployment_id: The ID of the deployment.
+    :param cycle_times: Dictionary mapping each cycle to its (start time, end time).
+    :param absorbance_block: Absorbance SpectrumBlock containing at least the last cycle of the deployment.
+    :return: The deployment information dictionary, or None if there is no absorbance data.
+    """
+    # Deployment information is given for the last cycle with absorbance data
+    if not len(absorbance_block):
+        return None
+    last_cycle = int(absorbance_block.cycles.max())
+    deployment_info = build_deployment_info(deployment_id, cycle_times, last_cycle)
+    absorbance_to_dict(absorbance_block.select(absorbance_block.cycles == last_cycle), deployment_info)
 
-        # Find the indices of the closest wavelengths
-        for type_key, mean_values in types.items():
-            wavelength_values = {}
+    # Remove cycle start and end times from deployment info
+    if deployment_info['cycle_start_time']:
+        deployment_info.pop('cycle_start_time', None)
+    if deployment_info['cycle_end_time']:
+        deployment_info.pop('cycle_end_time', None)
 
-            for mw in monitored_wavelengths:
-                closest_index = (np.abs(np.array(wavelengths) - mw)).argmin()
+    return deployment_info
 
-                # Add the mean absorbance value to the monitored wavelength
-                wavelength_values[mw] = mean_values[closest_index]
 
-            if wavelength_values:
-                monitored_wavelength_values[reaction][type_key] = dict(sorted(wavelength_values.items()))
+def load_last_cycle_deployment_info(deployment_id, sensor_id, cycle_times):
+    """
+    Build the deployment information of the last cycle with absorbance data, loading the cycles one at a time
+    from the last one.
 
-    # Convert defaultdict to dict to ensure JSON serialization
-    monitored_wavelength_values = {k: dict(v) for k, v in monitored_wavelength_values.items()}
-    for reaction, types in monitored_wavelength_values.items():
-        monitored_wavelength_values[reaction] = {k: dict(v) for k, v in types.items()}
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :return: The deployment information dictionary, or None if there is no absorbance data.
+    """
+    for cycle in sorted(cycle_times, reverse=True):
+        absorbance_block = load_absorbance_block(deployment_id, sensor_id, cycle_times, cycles=[cycle])
+        if len(absorbance_block):
+            return build_last_cycle_deployment_info(deployment_id, cycle_times, absorbance_block)
 
-    return monitored_wavelength_values, deployment_info
+    return None
 
 
-def get_monitored_wavelength_values_in_deployment(timestamp, sensor_id):
+def compute_monitored_wavelength_values_in_deployment(deployment_id, sensor_id, cycle_times):
     """
-    Retrieve monitored absorbance wavelength values for an entire deployment.
-
-    This function calculates the monitored wavelength values for all cycles within a deployment.
+    Compute monitored absorbance wavelength values for an entire deployment.
 
-    :param timestamp: The timestamp to compare against.
+    :param deployment_id: The ID of the deployment.
     :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
     :return: A dictionary containing monitored wavelength values for each cycle and deployment information.
     """
-    # Get the total number of cycles for the deployment
-    total_cycles = get_cycle_count(timestamp, sensor_id)
-
-    all_monitored_wavelength_values = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
-    deployment_info = None
+    # Load the absorbance spectrums of the deployment and the monitored wavelengths of every reaction at once
+    absorbance_block = load_absorbance_block(deployment_id, sensor_id, cycle_times)
 
-    # Iterate over each cycle to retrieve monitored wavelength values
-    for cycle in range(1, total_cycles + 1):
-        monitored_wavelength_values, deployment_info = get_monitored_wavelength_values_in_cycle(timestamp, sensor_id,
-                                                                                                cycle)
+    # Compute mean absorbance and monitored values of every cycle at once
+    monitored_wavelength_values = monitored_wavelength_values_to_dict(absorbance_block.mean_over_subcycles(),
+                                                                      get_monitored_wavelengths(sensor_id))
 
-        if monitored_wavelength_values:
-            # Extract cycle start and end times from deployment info
-            cycle_start_time = deployment_info.get('cycle_start_time')
-            cycle_end_time = deployment_info.get('cycle_end_time')
+    all_monitored_wavelength_values = {}
+    for cycle, reactions in monitored_wavelength_values.items():
+        for reaction, types in reactions.items():
+            # Add cycle start and end times to the monitored wavelength values
+            cycle_start_time, cycle_end_time = cycle_times.get(cycle, (None, None))
+            all_monitored_wavelength_values.setdefault(reaction, {})[cycle] = {
+                'cycle_start_time': cycle_start_time,
+                'cycle_end_time': cycle_end_time,
+                **types
+            }
 
-            for reaction, types in monitored_wavelength_values.items():
-                if cycle not in all_monitored_wavelength_values[reaction]:
-                    all_monitored_wavelength_values[reaction][cycle] = defaultdict(dict)
+    return all_monitored_wavelength_values, build_last_cycle_deployment_info(deployment_id, cycle_times,
+                                                                             absorbance_block)
 
-                # Add cycle start and end times to the monitored wavelength values
-                all_monitored_wavelength_values[reaction][cycle]['cycle_start_time'] = cycle_start_time
-                all_monitored_wavelength_values[reaction][cycle]['cycle_end_time'] = cycle_end_time
 
-                for type_key, wavelength_values in types.items():
-                    if type_key not in all_monitored_wavelength_values[reaction][cycle]:
-                        all_monitored_wavelength_values[reaction][cycle][type_key] = {}
-                    for wavelength, value in wavelength_values.items():
-                        all_monitored_wavelength_values[reaction][cycle][type_key][wavelength] = value
+@cached_result
+def get_monitored_wavelength_values_in_deployment(timestamp, sensor_id):
+    """
+    Retrieve monitored absorbance wavelength values for an entire deployment.
 
-    # Convert defaultdict to dict to ensure JSON serialization
-    all_monitored_wavelength_values = {reaction: {
-        cycle: {type_key: dict(wavelength_values) if isinstance(wavelength_values, defaultdict) else wavelength_values
-                for type_key, wavelength_values in types.items()} for cycle, types in cycles.items()} for
-        reaction, cycles in all_monitored_wavelength_values.items()}
+    This function calculates the monitored wavelength values for all cycles within a deployment.
 
-    # Remove cycle start and end times from deployment info
-    if deployment_info['cycle_start_time']:
-        deployment_info.pop('cycle_start_time', None)
-    if deployment_info['cycle_end_time']:
-        deployment_info.pop('cycle_end_time', None)
+    :param timestamp: The timestamp to compare against.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :return: A dictionary containing monitored wavelength values for each cycle and deployment information.
+    """
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+    if deployment_id is None:
+        return {}, None
 
-    return all_monitored_wavelength_values, deployment_info
+    return compute_monitored_wavelength_values_in_deployment(deployment_id, sensor_id,
+                                                             get_cycle_times(deployment_id, sensor_id))
 
 
 def get_only_wavelength_monitored_through_time_in_cycle_full_info(timestamp, sensor_id, cycle):
@@ -558,50 +783,25 @@ def get_only_wavelength_monitored_through_time_in_cycle_full_info(timestamp, sen
     :param cycle: The cycle number to retrieve spectrum information for.
     :return: A tuple containing spectrums data, wavelengths, and deployment information.
     """
-    # Retrieve the latest spectrum before the given timestamp for the specified sensor
-    last_spectrum = Spectrum.objects.filter(
-        pfiona_sensor_id=sensor_id,
-        pfiona_time__timestamp__lt=timestamp,
-        cycle__gte=1
-    ).exclude(
-        pfiona_spectrumtype__type__endswith='wavelength_monitored'
-    ).order_by('-pfiona_time__timestamp').first()
+    # Resolve the deployment of the timestamp
+    deployment_id = get_deployment_id(timestamp, sensor_id)
 
     # If no spectrum is found, return None for all outputs
-    if not last_spectrum:
+    if deployment_id is None:
         return None, None, None
 
-    # Get the deployment ID from the last spectrum found
-    deployment_id = last_spectrum.deployment
-
-    # Aggregate start and end times for both the deployment and the specific cycle
-    times = Spectrum.objects.filter(
-        deployment=deployment_id,
-        pfiona_sensor_id=sensor_id,
-        cycle__gte=1
-    ).aggregate(
-        deployment_start_time=Min('pfiona_time__timestamp'),
-        deployment_end_time=Max('pfiona_time__timestamp'),
-        cycle_start_time=Min('pfiona_time__timestamp', filter=Q(cycle=cycle)),
-        cycle_end_time=Max('pfiona_time__timestamp', filter=Q(cycle=cycle))
-    )
-
-    # Extract the aggregated times
-    deployment_start_time = times['deployment_start_time']
-    deployment_end_time = times['deployment_end_time']
+    # Read the start and end times of the deployment from the deployment catalog
+    deployment = get_catalog_deployment(sensor_id, deployment_id)
+    deployment_start_time = deployment.start_time if deployment else None
+    deployment_end_time = deployment.end_time if deployment else None
 
     # Retrieve spectrums for the given cycle and sensor where the spectrum type ends with 'wavelength_monitored'
     spectrums = Spectrum.objects.filter(
         deployment=deployment_id,
         cycle=cycle,
         pfiona_sensor_id=sensor_id,
-        pfiona_spectrumtype__type__endswith='wavelength_monitored'
-    ).select_related(
-        'pfiona_spectrumtype', 'pfiona_time'
-    ).annotate(
-        wavelengths=ArrayAgg('value__wavelength', ordering='value__wavelength'),
-        values=ArrayAgg('value__value', ordering='value__wavelength')
-    ).order_by('id')
+        pfiona_spectrumtype__is_wavelength_monitored=True
+    )
 
     # Initialize a dictionary to organize spectrum data
     spectrums_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
@@ -610,54 +810,32 @@ def get_only_wavelength_monitored_through_time_in_cycle_full_info(timestamp, sen
     previous_id = defaultdict(lambda: defaultdict(lambda: None))
 
     # Iterate over each spectrum to sort and organize data
-    for spectrum in spectrums:
-        spectrum_type = spectrum.pfiona_spectrumtype.type
-        reaction_type = spectrum_type.split('_')[0]
+    for spectrum_id, timestamp, spectrum_type, spectrum_cycle, wavelengths, values in load_spectrum_rows(spectrums):
+        # Determine the reaction and the key for organizing spectrums based on their type
+        reaction_type, key, _ = classify_spectrum_type(spectrum_type)
 
         if not wavelengths_dict[reaction_type]:
-            wavelengths_dict[reaction_type] = sorted(
-                spectrum.wavelengths)  # Sort wavelengths initially for each reaction type
-
-        # Sort values by the sorted order of wavelengths
-        sorted_values = [value for _, value in sorted(zip(spectrum.wavelengths, spectrum.values))]
+            wavelengths_dict[reaction_type] = wavelengths  # Keep the sorted wavelengths of each reaction type
 
         # Prepare spectrum data structure
         spectrum_data = {
-            'id': spectrum.id,
-            'time': spectrum.pfiona_time.timestamp,
-            'spectrumtype': spectrum.pfiona_spectrumtype.type,
-            'cycle': spectrum.cycle,
-            'deployment': spectrum.deployment,
-            'values': list(zip(wavelengths_dict[reaction_type], sorted_values))
+            'id': spectrum_id,
+            'time': timestamp,
+            'spectrumtype': spectrum_type,
+            'cycle': spectrum_cycle,
+            'deployment': deployment_id,
+            'values': list(zip(wavelengths_dict[reaction_type], values))
             # Use sorted wavelengths and corresponding values
         }
 
-        parts = spectrum_type.split('_')
-
-        # Determine the key for organizing spectrums based on their type
-        if 'Blank' in spectrum_type:
-            key = 'Blank'
-        elif 'Sample' in spectrum_type:
-            key = 'Sample'
-        elif 'CRM' in spectrum_type:
-            key = 'CRM'
-        elif 'Standard' in spectrum_type:
-            if len(parts) >= 4 and parts[2] == 'Dillution':
-                dilution = parts[3]
-                key = f'Standard_Dillution_{dilution}'
-            else:
-                key = 'Standard'
-        else:
-            key = spectrum_type
-
         # Check if this is a new subcycle for the specific reaction and key
-        if previous_id[reaction_type][key] is not None and spectrum.id != previous_id[reaction_type][key] + 1:
-            current_subcycle[reaction_type][key][spectrum.cycle] += 1
+        if previous_id[reaction_type][key] is not None and spectrum_id != previous_id[reaction_type][key] + 1:
+            current_subcycle[reaction_type][key][spectrum_cycle] += 1
 
-        previous_id[reaction_type][key] = spectrum.id
+        previous_id[reaction_type][key] = spectrum_id
 
         # Append spectrum data to the organized dictionary
-        spectrums_data[reaction_type][key][current_subcycle[reaction_type][key][spectrum.cycle]].append(spectrum_data)
+        spectrums_data[reaction_type][key][current_subcycle[reaction_type][key][spectrum_cycle]].append(spectrum_data)
 
     # Prepare deployment information
     deployment_info = {
@@ -682,37 +860,17 @@ def get_dark_reference_in_cycle_full_info(timestamp, sensor_id, cycle):
     :param cycle: The cycle number to retrieve spectrum information for.
     :return: A tuple containing spectrums data, wavelengths, and deployment information.
     """
-    # Retrieve the latest spectrum before the given timestamp for the specified sensor
-    last_spectrum = Spectrum.objects.filter(
-        pfiona_sensor_id=sensor_id,
-        pfiona_time__timestamp__lt=timestamp,
-        cycle__gte=1
-    ).exclude(
-        pfiona_spectrumtype__type__endswith='wavelength_monitored'
-    ).order_by('-pfiona_time__timestamp').first()
+    # Resolve the deployment of the timestamp
+    deployment_id = get_deployment_id(timestamp, sensor_id)
 
     # If no spectrum is found, return None for all outputs
-    if not last_spectrum:
+    if deployment_id is None:
         return None, None, None
 
-    # Get the deployment ID from the last spectrum found
-    deployment_id = last_spectrum.deployment
-
-    # Aggregate start and end times for both the deployment and the specific cycle
-    times = Spectrum.objects.filter(
-        deployment=deployment_id,
-        pfiona_sensor_id=sensor_id,
-        cycle__gte=1
-    ).aggregate(
-        deployment_start_time=Min('pfiona_time__timestamp'),
-        deployment_end_time=Max('pfiona_time__timestamp'),
-        cycle_start_time=Min('pfiona_time__timestamp', filter=Q(cycle=cycle)),
-        cycle_end_time=Max('pfiona_time__timestamp', filter=Q(cycle=cycle))
-    )
-
-    # Extract the aggregated times
-    deployment_start_time = times['deployment_start_time']
-    deployment_end_time = times['deployment_end_time']
+    # Read the start and end times of the deployment from the deployment catalog
+    deployment = get_catalog_deployment(sensor_id, deployment_id)
+    deployment_start_time = deployment.start_time if deployment else None
+    deployment_end_time = deployment.end_time if deployment else None
 
     # Retrieve spectrums for the given cycle and sensor where the spectrum type ends 'Dark', or 'Reference'
     spectrums = Spectrum.objects.filter(
@@ -720,14 +878,8 @@ def get_dark_reference_in_cycle_full_info(timestamp, sensor_id, cycle):
         cycle=cycle,
         pfiona_sensor_id=sensor_id
     ).filter(
-        Q(pfiona_spectrumtype__type__endswith='Dark') |
-        Q(pfiona_spectrumtype__type__endswith='Reference')
-    ).select_related(
-        'pfiona_spectrumtype', 'pfiona_time'
-    ).annotate(
-        wavelengths=ArrayAgg('value__wavelength', ordering='value__wavelength'),
-        values=ArrayAgg('value__value', ordering='value__wavelength')
-    ).order_by('id')
+        pfiona_spectrumtype__scan_kind__in=[SpectrumType.DARK, SpectrumType.REFERENCE]
+    )
 
     # Initialize a dictionary to organize spectrum data
     spectrums_data = defaultdict(lambda: defaultdict(lambda: defaultdict(list)))
@@ -736,54 +888,32 @@ def get_dark_reference_in_cycle_full_info(timestamp, sensor_id, cycle):
     previous_id = defaultdict(lambda: defaultdict(lambda: None))
 
     # Iterate over each spectrum to sort and organize data
-    for spectrum in spectrums:
-        spectrum_type = spectrum.pfiona_spectrumtype.type
-        reaction_type = spectrum_type.split('_')[0]
+    for spectrum_id, timestamp, spectrum_type, spectrum_cycle, wavelengths, values in load_spectrum_rows(spectrums):
+        # Determine the reaction and the key for organizing spectrums based on their type
+        reaction_type, key, _ = classify_spectrum_type(spectrum_type)
 
         if not wavelengths_dict[reaction_type]:
-            wavelengths_dict[reaction_type] = sorted(
-                spectrum.wavelengths)  # Sort wavelengths initially for each reaction type
-
-        # Sort values by the sorted order of wavelengths
-        sorted_values = [value for _, value in sorted(zip(spectrum.wavelengths, spectrum.values))]
+            wavelengths_dict[reaction_type] = wavelengths  # Keep the sorted wavelengths of each reaction type
 
         # Prepare spectrum data structure
         spectrum_data = {
-            'id': spectrum.id,
-            'time': spectrum.pfiona_time.timestamp,
-            'spectrumtype': spectrum.pfiona_spectrumtype.type,
-            'cycle': spectrum.cycle,
-            'deployment': spectrum.deployment,
-            'values': list(zip(wavelengths_dict[reaction_type], sorted_values))
+            'id': spectrum_id,
+            'time': timestamp,
+            'spectrumtype': spectrum_type,
+            'cycle': spectrum_cycle,
+            'deployment': deployment_id,
+            'values': list(zip(wavelengths_dict[reaction_type], values))
             # Use sorted wavelengths and corresponding values
         }
 
-        parts = spectrum_type.split('_')
-
-        # Determine the key for organizing spectrums based on their type
-        if 'Blank' in spectrum_type:
-            key = 'Blank'
-        elif 'Sample' in spectrum_type:
-            key = 'Sample'
-        elif 'CRM' in spectrum_type:
-            key = 'CRM'
-        elif 'Standard' in spectrum_type:
-            if len(parts) >= 4 and parts[2] == 'Dillution':
-                dilution = parts[3]
-                key = f'Standard_Dillution_{dilution}'
-            else:
-                key = 'Standard'
-        else:
-            key = spectrum_type
-
         # Check if this is a new subcycle for the specific reaction and key
-        if previous_id[reaction_type][key] is not None and spectrum.id != previous_id[reaction_type][key] + 1:
-            current_subcycle[reaction_type][key][spectrum.cycle] += 1
+        if previous_id[reaction_type][key] is not None and spectrum_id != previous_id[reaction_type][key] + 1:
+            current_subcycle[reaction_type][key][spectrum_cycle] += 1
 
-        previous_id[reaction_type][key] = spectrum.id
+        previous_id[reaction_type][key] = spectrum_id
 
         # Append spectrum data to the organized dictionary
-        spectrums_data[reaction_type][key][current_subcycle[reaction_type][key][spectrum.cycle]].append(spectrum_data)
+        spectrums_data[reaction_type][key][current_subcycle[reaction_type][key][spectrum_cycle]].append(spectrum_data)
 
     # Prepare deployment information
     deployment_info = {
@@ -828,9 +958,10 @@ def get_only_absorbance_wavelength_monitored_through_time_in_cycle_full_info(tim
                 dark_scan = []
                 ref_scan = []
                 for dr_spectrum in dark_reference_data.get(reaction, {}).get(type_key, {}).get(subcycle, []):
-                    if 'Dark' in dr_spectrum['spectrumtype']:
+                    scan = classify_spectrum_type(dr_spectrum['spectrumtype'])[2]
+                    if scan == SpectrumType.DARK:
                         dark_scan = dr_spectrum['values']
-                    elif 'Reference' in dr_spectrum['spectrumtype']:
+                    elif scan == SpectrumType.REFERENCE:
                         ref_scan = dr_spectrum['values']
 
                 if not dark_scan or not ref_scan:
@@ -843,7 +974,7 @@ def get_only_absorbance_wavelength_monitored_through_time_in_cycle_full_info(tim
                 # Process each wavelength monitored spectrum
                 for spectrum in spectrums_list:
                     spectrum_type = spectrum['spectrumtype']
-                    if 'wavelength_monitored' not in spectrum_type:
+                    if classify_spectrum_type(spectrum_type)[2] != MONITORED:
                         continue
 
                     sample_values = spectrum['values']
@@ -882,100 +1013,147 @@ CONCENTRATION
 """
 
 
+def compute_concentrations(tensors, std_concs, pairs, calibrations):
+    """
+    Calculate the concentrations of some (reaction, cycle) pairs of a deployment.
+
+    Concentrations are calculated using either standard dilutions or blank/sample/standard absorbance values,
+    for every cycle of a reaction at once. Cycles without standard dilutions fall back on the calibration curve
+    of the previous standard dilutions.
+
+    :param tensors: Dictionary mapping each reaction name to its MonitoredTensor.
+    :param std_concs: Dictionary mapping each reaction name to its standard concentration.
+    :param pairs: Set of (reaction, cycle) pairs to calculate.
+    :param calibrations: CalibrationIndex of the standard dilutions of the deployment.
+    :return: A dictionary containing concentrations (reaction -> cycle -> wavelength -> concentration).
+    """
+    concentrations = {}
+
+    for reaction, tensor in tensors.items():
+        cycles = tensor.cycles.tolist()
+        if not any((reaction, cycle) in pairs for cycle in cycles):
+            continue
+
+        slopes, intercepts = calibrations.latest_batch(reaction, tensor.wavelengths, tensor.cycles)
+        values, computed = compute_tensor_concentrations(tensor, std_concs[reaction], slopes, intercepts)
+        values = values.tolist()
+
+        for row, cycle in enumerate(cycles):
+            if (reaction, cycle) in pairs:
+                concentrations.setdefault(reaction, {})[cycle] = {
+                    wavelength: values[row][column] for column, wavelength in enumerate(tensor.wavelengths[:-1])
+                    if computed[row, column]
+                }
+
+    return concentrations
+
+
+def get_concentrations_in_cycles(deployment_id, sensor_id, cycle_times, cycles, completed, curves=None,
+                                 std_concs=None):
+    """
+    Retrieve the concentrations of some cycles of a deployment.
+
+    Concentrations of completed cycles are read from the concentration store. Only the cycles which are not stored
+    yet, and the reactions whose stored concentrations were invalidated, are calculated from the monitored
+    wavelength values, then stored once their cycle is complete.
+
+    :param deployment_id: The ID of the deployment.
+    :param sensor_id: The ID of the sensor to retrieve data for.
+    :param cycle_times: Dictionary mapping each cycle of the deployment to its (start time, end time).
+    :param cycles: List of the cycles to retrieve.
+    :param completed: Set of the completed cycles of the deployment.
+    :param curves: Optional dictionary of the calibration curves of the earlier cycles, updated in place.
+    :param std_concs: Optional dictionary of the standard concentration of each reaction, updated in place.
+    :return: A tuple containing the concentrations (reaction -> cycle -> wavelength -> concentration)
+             and the absorbance SpectrumBlock of the cycles, or None if every cycle was read from the store.
+    """
+    stored_concentrations, stored_cycles, stale_reactions = read_concentrations(sensor_id, deployment_id, cycles)
+    missing = [cycle for cycle in cycles if cycle not in stored_cycles]
+    if not missing and not stale_reactions:
+        return stored_concentrations, None
+
+    # Retrieve the monitored absorbance of the cycles
+    absorbance_block = load_absorbance_block(deployment_id, sensor_id, cycle_times, cycles=cycles)
+    tensors = monitored_tensors(absorbance_block.mean_over_subcycles(), get_monitored_wavelengths(sensor_id))
+    if std_concs is None:
+        std_concs = {}
+    for reaction in tensors:
+        if reaction not in std_concs:
+            std_concs[reaction] = get_standard_concentration(reaction_name=reaction, sensor_id=sensor_id)
+    calibrations = load_calibrations(deployment_id, sensor_id, tensors, std_concs, completed, curves)
+
+    # Calculate the missing cycles and the invalidated reactions
+    pairs = {(reaction, cycle) for reaction, tensor in tensors.items() for cycle in tensor.cycles.tolist()
+             if cycle in missing or reaction in stale_reactions}
+    computed = compute_concentrations(tensors, std_concs, pairs, calibrations)
+
+    # Store the concentrations of the completed cycles
+    write_concentrations(sensor_id, deployment_id, computed, [cycle for cycle in missing if cycle in completed])
+    if stale_reactions:
+        write_concentrations(sensor_id, deployment_id, computed,
+                             [cycle for cycle in cycles if cycle in completed and cycle not in missing],
+                             reactions=stale_reactions)
+
+    # Merge the stored and calculated concentrations
+    concentrations = {reaction: {cycle: values for cycle, values in reaction_cycles.items()}
+                      for reaction, reaction_cycles in stored_concentrations.items()
+                      if reaction not in stale_reactions}
+    for reaction, reaction_cycles in computed.items():
+        concentrations.setdefault(reaction, {}).update(reaction_cycles)
+
+    return concentrations, absorbance_block
+
+
+def concentrations_to_dict(concentrations, cycle_times):
+    """
+    Add the cycle start and end times to concentrations.
+
+    :param concentrations: Dictionary of concentrations (reaction -> cycle -> wavelength -> concentration).
+    :param cycle_times: Dictionary mapping each cycle to its (start time, end time).
+    :return: A dictionary containing concentrations for each cycle
+             (reaction -> cycle -> 'concentration' -> wavelength -> value).
+    """
+    return {
+        reaction: {
+            cycle: {
+                **({'concentration': concentrations[reaction][cycle]} if concentrations[reaction][cycle] else {}),
+                'cycle_start_time': cycle_times.get(cycle, (None, None))[0],
+                'cycle_end_time': cycle_times.get(cycle, (None, None))[1]
+            } for cycle in sorted(concentrations[reaction])
+        } for reaction in sorted(concentrations)
+    }
+
+
+@cached_result
 def get_concentration_in_deployment(timestamp, sensor_id):
     """
     Calculate concentrations for an entire deployment based on monitored wavelength values.
 
-    This function retrieves the monitored wavelength values for all cycles within a deployment
-    and calculates the concentration of samples using either standard dilutions or blank/sample/standard
-    absorbance values.
-
     :param timestamp: The timestamp to compare against.
     :param sensor_id: The ID of the sensor to retrieve data for.
     :return: A dictionary containing concentrations for each cycle and deployment information.
     """
-    # Retrieve the total number of cycles
-    cycle_count = get_cycle_count(timestamp, sensor_id)
-
-    if cycle_count == 0:
+    deployment_id = get_deployment_id(timestamp, sensor_id)
+    if deployment_id is None:
         return None, None
 
-    monitored_wavelength_values, deployment_info = get_monitored_wavelength_values_in_deployment(timestamp, sensor_id)
-    concentrations = defaultdict(lambda: defaultdict(lambda: defaultdict(dict)))
-
-    # Process each reaction and its corresponding cycles
-    for reaction, cycles in monitored_wavelength_values.items():
-        std_conc = get_standard_concentration(reaction_name=reaction, sensor_id=sensor_id)
-        for cycle, types in cycles.items():
-            cycle_start_time = types.get('cycle_start_time')
-            cycle_end_time = types.get('cycle_end_time')
-            abs_blank = types.get('Blank', {})
-            abs_sample = types.get('Sample', {})
-            abs_standard = types.get('Standard', {})
-
-            wavelengths = sorted(list(abs_sample.keys()))
-            if wavelengths:
-                reference_wavelength = wavelengths[-1]
-
-            if any(key.startswith('Standard_Dillution') for key in types.keys()):
-                # Handle the case with standard dilutions
-                standard_dilution_data = {key: types[key] for key in types.keys() if
-                                          key.startswith('Standard_Dillution')}
-                for wavelength in wavelengths[:-1]:
-                    # Collect the dilution levels and corresponding absorbance values
-                    dilution_levels = []
-                    absorbance_values = []
-
-                    for dilution, absorbances in standard_dilution_data.items():
-                        if wavelength in absorbances:
-                            dilution_level = int(dilution.split('_')[-1]) * 0.25 * std_conc
-                            absorbance_value = absorbances[wavelength]
-                            dilution_levels.append(dilution_level)
-                            absorbance_values.append(absorbance_value)
-
-                    # Calculate the linear regression
-                    slope, intercept = np.polyfit(dilution_levels, absorbance_values, 1)
-
-                    if wavelength in abs_sample:
-                        sample_absorbance = abs_sample[wavelength]
-                        sample_concentration = (sample_absorbance - intercept) / slope
-                        concentrations[reaction][cycle]['concentration'][wavelength] = sample_concentration
-
-            else:
-                # Handle the regular case with blank/sample/standard
-                for wavelength in wavelengths[:-1]:
-                    if wavelength in abs_blank and reference_wavelength in abs_blank and wavelength in abs_standard and reference_wavelength in abs_standard:
-                        abs_sample_val = abs_sample[wavelength] - abs_sample[reference_wavelength]
-                        abs_blank_val = abs_blank[wavelength] - abs_blank[reference_wavelength]
-                        abs_standard_val = abs_standard[wavelength] - abs_standard[reference_wavelength]
-
-                        conc = concentration(abs_sample_val, abs_blank_val, abs_standard_val, std_conc)
-                        concentrations[reaction][cycle]['concentration'][wavelength] = conc
-                    else:
-                        # Find the last cycle with standard dilutions
-                        last_standard_dilution_data = get_last_standard_dillution(reaction, cycle, wavelength,
-                                                                                  monitored_wavelength_values,
-                                                                                  sensor_id)
-                        if last_standard_dilution_data:
-                            dilution_levels, absorbance_values = last_standard_dilution_data
-                            slope, intercept = np.polyfit(dilution_levels, absorbance_values, 1)
-
-                            if wavelength in abs_sample:
-                                sample_absorbance = abs_sample[wavelength]
-                                sample_concentration = (sample_absorbance - intercept) / slope
-                                concentrations[reaction][cycle]['concentration'][wavelength] = sample_concentration
-
-            # Store cycle start and end times
-            concentrations[reaction][cycle]['cycle_start_time'] = cycle_start_time
-            concentrations[reaction][cycle]['cycle_end_time'] = cycle_end_time
+    cycle_times = get_cycle_times(deployment_id, sensor_id)
+    completed = set(get_completed_cycles(deployment_id, sensor_id, cycle_times))
+    concentrations, absorbance_block = get_concentrations_in_cycles(deployment_id, sensor_id, cycle_times,
+                                                                    list(cycle_times), completed)
 
-    # Convert defaultdict to dict to ensure JSON serialization
-    concentrations = {reaction: {
-        cycle: {type_key: dict(wavelength_values) if isinstance(wavelength_values, defaultdict) else wavelength_values
-                for type_key, wavelength_values in types.items()} for cycle, types in cycles.items()} for
-        reaction, cycles in concentrations.items()}
+    if absorbance_block is None:
+        # Every cycle is stored, only the last cycle absorbance is needed for the deployment information
+        last_cycle = Absorbance.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id).aggregate(
+            last_cycle=Max('cycle'))['last_cycle']
+        absorbance_block = read_absorbance(sensor_id, deployment_id, [last_cycle])
+
+    deployment_info = build_last_cycle_deployment_info(deployment_id, cycle_times, absorbance_block)
+    if deployment_info is None:
+        return None, None
 
-    return concentrations, deployment_info
+    # Add cycle start and end times to the concentrations
+    return concentrations_to_dict(concentrations, cycle_times), deployment_info
 
 
 """
@@ -983,49 +1161,39 @@ MULTI STANDARD
 """
 
 
-def get_last_standard_dillution(reaction, cycle, wavelength, monitored_wavelength_values, sensor_id):
+def load_calibrations(deployment_id, sensor_id, tensors, std_concs, completed, curves=None):
     """
-    Retrieve the last standard dilution for a given cycle in multi-standard mode.
+    Retrieve the calibration curves of the standard dilution cycles of a deployment.
 
-    This function searches for the last standard dilution values for a specified cycle and wavelength,
-    based on previously monitored wavelength values.
+    Stored curves are read in a single query. The curves of the other standard dilution cycles are fitted
+    at once, then stored once their cycle is complete.
 
-    :param reaction: The name of the reaction.
-    :param cycle: The cycle number to start searching from.
-    :param wavelength: The wavelength to find standard dilutions for.
-    :param monitored_wavelength_values: Dictionary containing monitored wavelength values for all cycles.
+    :param deployment_id: The ID of the deployment.
     :param sensor_id: The ID of the sensor to retrieve data for.
-    :return: A tuple containing dilution levels and absorbance values, or None if not found.
-    """
-    # Get a sorted list of cycles
-    cycles = sorted(monitored_wavelength_values[reaction].keys())
-    cycle_index = cycles.index(cycle)
-
-    # Iterate through previous cycles to find standard dilutions
-    for i in range(cycle_index - 1, -1, -1):
-        previous_cycle = cycles[i]
-        if any(key.startswith('Standard_Dillution') for key in
-               monitored_wavelength_values[reaction][previous_cycle].keys()):
-            standard_dilution_data = {key: monitored_wavelength_values[reaction][previous_cycle][key] for key in
-                                      monitored_wavelength_values[reaction][previous_cycle].keys() if
-                                      key.startswith('Standard_Dillution')}
-
-            # Check if the wavelength is present in the standard dilution data
-            if wavelength in list(standard_dilution_data.values())[0].keys():
-                dilution_levels = []
-                absorbance_values = []
-
-                # Collect dilution levels and corresponding absorbance values
-                for dilution, absorbances in standard_dilution_data.items():
-                    if wavelength in absorbances:
-                        dilution_level = int(dilution.split('_')[-1]) * 0.25 * get_standard_concentration(
-                            reaction_name=reaction, sensor_id=sensor_id)
-                        dilution_levels.append(dilution_level)
-                        absorbance_values.append(absorbances[wavelength])
-
-                return dilution_levels, absorbance_values
+    :param tensors: Dictionary mapping each reaction name to its MonitoredTensor.
+    :param std_concs: Dictionary mapping each reaction name to its standard concentration.
+    :param completed: Set of the completed cycles of the deployment.
+    :param curves: Optional dictionary of the curves already retrieved, as returned by read_calibrations,
+                   updated in place with the fitted curves (read from the store by default).
+    :return: A CalibrationIndex of the deployment.
+    """
+    if curves is None:
+        curves = read_calibrations(sensor_id, deployment_id)
+    fitted = {}
 
-    return None
+    for reaction, tensor in tensors.items():
+        cycles = [cycle for cycle, has_dilutions in zip(tensor.cycles.tolist(), tensor.has_dilutions())
+                  if has_dilutions and (reaction, cycle) not in curves]
+        if cycles:
+            fitted.update({(reaction, cycle): wavelengths for cycle, wavelengths in
+                           fit_dilution_curves(tensor, std_concs[reaction], cycles).items()})
+
+    write_calibrations(sensor_id, deployment_id, {
+        (reaction, cycle): wavelengths for (reaction, cycle), wavelengths in fitted.items() if cycle in completed
+    })
+    curves.update(fitted)
+
+    return CalibrationIndex(curves)
 
 
 """
@@ -1037,19 +1205,18 @@ def get_deployment_list(sensor_id):
     """
     Retrieve a list of deployments for a specific sensor.
 
-    This function gathers all deployments for the given sensor, along with the start and end times for each deployment.
+    This function reads all deployments for the given sensor, along with the start and end times for each deployment,
+    from the deployment catalog.
 
     :param sensor_id: The ID of the sensor to retrieve deployment data for.
     :return: A list of dictionaries, each containing deployment ID, start time, and end time.
     """
-    # Filter spectrums for the given sensor where cycle number is 1 or higher
-    deployment_list = Spectrum.objects.filter(pfiona_sensor_id=sensor_id, cycle__gte=1).values('deployment').annotate(
-        start_time=Min('pfiona_time__timestamp'),
-        end_time=Max('pfiona_time__timestamp')
-    ).order_by('deployment')
+    catalog = get_deployment_index(sensor_id).catalog
 
-    # Convert the QuerySet to a list of dictionaries
-    return list(deployment_list)
+    return [
+        {'deployment': deployment.deployment, 'start_time': deployment.start_time, 'end_time': deployment.end_time}
+        for _, deployment in sorted(catalog.items())
+    ]
 
 
 def update_deployment_info_with_cycle(existing_info, new_info, cycle):
@@ -0,0 +1,138 @@
+import hashlib
+
+import numpy as np
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db import transaction
+
+from pFIONA_sensors.models import Value, WavelengthAxis, SpectrumValues
+
+# Wavelength axes never change once created, they are kept in memory by ID
+_wavelength_axes = {}
+
+"""
+WAVELENGTH AXES
+"""
+
+
+def get_wavelength_axes(axis_ids):
+    """
+    Retrieve wavelength axes by ID, reading the ones not in memory yet in a single query.
+
+    :param axis_ids: Iterable of wavelength axis IDs.
+    :return: A dictionary mapping each wavelength axis ID to its list of wavelengths.
+    """
+    missing = set(axis_ids) - set(_wavelength_axes)
+    if missing:
+        _wavelength_axes.update(WavelengthAxis.objects.filter(id__in=missing).values_list('id', 'wavelengths'))
+
+    return {axis_id: _wavelength_axes[axis_id] for axis_id in axis_ids}
+
+
+def get_or_create_wavelength_axis(wavelengths):
+    """
+    Retrieve the wavelength axis of a list of wavelengths, creating it if it does not exist yet.
+
+    :param wavelengths: Sorted list of wavelengths.
+    :return: The wavelength axis ID.
+    """
+    checksum = hashlib.sha256(np.asarray(wavelengths, dtype='<f8').tobytes()).hexdigest()
+    axis, _ = WavelengthAxis.objects.get_or_create(checksum=checksum, defaults={'wavelengths': list(wavelengths)})
+    _wavelength_axes[axis.id] = axis.wavelengths
+
+    return axis.id
+
+
+"""
+READ
+"""
+
+
+def load_spectrum_rows(spectrums):
+    """
+    Load the values of spectrums from either storage layout.
+
+    Packed spectrums are read with their wavelength axis in a single query. Spectrums still stored one row
+    per wavelength in `Value` are then aggregated into arrays in a second query, only if there are any.
+
+    :param spectrums: Spectrum queryset.
+    :return: A list of (id, timestamp, type, cycle, wavelengths, values) tuples ordered by ID,
+             with wavelengths in ascending order.
+    """
+    rows = list(spectrums.order_by('id').values_list(
+        'id', 'pfiona_time__timestamp', 'pfiona_spectrumtype__type', 'cycle',
+        'spectrumvalues__pfiona_wavelengthaxis', 'spectrumvalues__values'
+    ))
+
+    # Aggregate the values of the spectrums which are not packed
+    unpacked = {}
+    if any(row[5] is None for row in rows):
+        unpacked = {
+            spectrum_id: (wavelengths, values)
+            for spectrum_id, wavelengths, values in Value.objects.filter(
+                pfiona_spectrum__in=spectrums.filter(spectrumvalues__isnull=True).values('id')
+            ).values('pfiona_spectrum_id').annotate(
+                wavelengths=ArrayAgg('wavelength', ordering='wavelength'),
+                values=ArrayAgg('value', ordering='wavelength')
+            ).values_list('pfiona_spectrum_id', 'wavelengths', 'values')
+        }
+
+    axes = get_wavelength_axes({row[4] for row in rows if row[4] is not None})
+
+    return [
+        (spectrum_id, timestamp, spectrum_type, cycle, axes[axis_id], values) if values is not None else
+        (spectrum_id, timestamp, spectrum_type, cycle) + unpacked.get(spectrum_id, ([], []))
+        for spectrum_id, timestamp, spectrum_type, cycle, axis_id, values in rows
+    ]
+
+
+"""
+MIGRATION
+"""
+
+
+def pack_spectrums(spectrums, delete_values=False, batch_size=1000):
+    """
+    Move the values of spectrums from `Value` rows to packed arrays.
+
+    :param spectrums: Spectrum queryset.
+    :param delete_values: Boolean to delete the `Value` rows of the packed spectrums, including the ones packed before.
+    :param batch_size: Number of spectrums packed per transaction.
+    :return: The number of spectrums packed.
+    """
+    # Delete the rows left behind by spectrums already packed
+    if delete_values:
+        Value.objects.filter(pfiona_spectrum__in=spectrums.filter(spectrumvalues__isnull=False).values('id')).delete()
+
+    spectrum_ids = list(spectrums.filter(spectrumvalues__isnull=True).order_by('id').values_list('id', flat=True))
+    packed = 0
+
+    for start in range(0, len(spectrum_ids), batch_size):
+        batch = spectrum_ids[start:start + batch_size]
+
+        with transaction.atomic():
+            rows = Value.objects.filter(pfiona_spectrum_id__in=batch).values('pfiona_spectrum_id').annotate(
+                wavelengths=ArrayAgg('wavelength', ordering='wavelength'),
+                values=ArrayAgg('value', ordering='wavelength')
+            ).values_list('pfiona_spectrum_id', 'wavelengths', 'values')
+
+            # Share one wavelength axis between every spectrum with the same wavelengths
+            axis_ids = {}
+            spectrum_values = []
+            for spectrum_id, wavelengths, values in rows:
+                if tuple(wavelengths) not in axis_ids:
+                    axis_ids[tuple(wavelengths)] = get_or_create_wavelength_axis(wavelengths)
+                spectrum_values.append(SpectrumValues(
+                    pfiona_spectrum_id=spectrum_id,
+                    pfiona_wavelengthaxis_id=axis_ids[tuple(wavelengths)],
+                    values=values
+                ))
+
+            SpectrumValues.objects.bulk_create(spectrum_values, ignore_conflicts=True)
+            if delete_values:
+                Value.objects.filter(
+                    pfiona_spectrum_id__in=[spectrum_value.pfiona_spectrum_id for spectrum_value in spectrum_values]
+                ).delete()
+
+        packed += len(spectrum_values)
+
+    return packed
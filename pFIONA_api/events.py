@@ -0,0 +1,318 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections
+from django.db.models import Max, Q
+
+import pFIONA_api.queries as q
+from pFIONA_sensors.models import Spectrum
+
+# Seconds between two reads of the sensor states and new spectrums, whatever the number of subscribers
+EVENT_POLL_INTERVAL = 2
+
+# Seconds without event after which a comment is sent to keep the connection open
+EVENT_KEEPALIVE_INTERVAL = 15
+
+# Milliseconds a client waits before reconnecting once the stream is closed
+EVENT_RETRY = 5000
+
+# Events kept for a subscriber which does not read them, the oldest ones are dropped beyond
+EVENT_QUEUE_SIZE = 100
+
+logger = logging.getLogger(__name__)
+
+"""
+EVENTS
+"""
+
+
+def format_event(name, data):
+    """
+    Format an event as a server-sent event.
+
+    :param name: Name of the event.
+    :param data: Data of the event, serialized as JSON.
+    :return: The event text.
+    """
+    return f"event: {name}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n"
+
+
+def status_event(sensor_id, snapshot):
+    """
+    Build the event of the status of a sensor.
+
+    :param sensor_id: The ID of the sensor.
+    :param snapshot: Status of the sensor, see `get_sensor_status_snapshots`.
+    :return: A tuple containing the sensor ID, the name and the data of the event.
+    """
+    return sensor_id, 'status', {'sensor_id': sensor_id, **snapshot}
+
+
+def cycle_event(sensor_id, deployment, cycle):
+    """
+    Build the event of a new cycle of a deployment.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployment: The ID of the deployment.
+    :param cycle: The cycle number.
+    :return: A tuple containing the sensor ID, the name and the data of the event.
+    """
+    return sensor_id, 'cycle', {'sensor_id': sensor_id, 'deployment': deployment, 'cycle': cycle}
+
+
+def get_last_cycles(sensor_ids):
+    """
+    Retrieve the deployment and cycle of the last spectrum of several sensors in a single query.
+
+    :param sensor_ids: Iterable of sensor IDs.
+    :return: A dictionary mapping each sensor ID to its (deployment, cycle).
+    """
+    return {
+        sensor_id: (deployment, cycle)
+        for sensor_id, deployment, cycle in Spectrum.objects.filter(
+            pfiona_sensor_id__in=sensor_ids,
+            cycle__gte=1,
+            deployment__isnull=False
+        ).order_by('pfiona_sensor_id', '-id').distinct('pfiona_sensor_id').values_list(
+            'pfiona_sensor_id', 'deployment', 'cycle')
+    }
+
+
+def get_last_spectrum_ids(sensor_ids):
+    """
+    Retrieve the ID of the last spectrum of several sensors in a single query.
+
+    The IDs are compared per sensor since each sensor writes in its own ID range, so a new spectrum of a sensor may
+    have a lower ID than the spectrums already stored for another one.
+
+    :param sensor_ids: Iterable of sensor IDs.
+    :return: A dictionary mapping each sensor ID to the ID of its last spectrum, 0 for a sensor without spectrum.
+    """
+    last_ids = dict.fromkeys(sensor_ids, 0)
+    last_ids.update(Spectrum.objects.filter(pfiona_sensor_id__in=last_ids).values('pfiona_sensor_id').annotate(
+        last_id=Max('id')
+    ).values_list('pfiona_sensor_id', 'last_id'))
+
+    return last_ids
+
+
+"""
+BROADCASTER
+"""
+
+
+class Subscription:
+    """
+    Events of some sensors waiting to be sent to one client.
+    """
+
+    def __init__(self, sensor_ids):
+        self.sensor_ids = set(sensor_ids)
+        self.queue = asyncio.Queue(maxsize=EVENT_QUEUE_SIZE)
+
+    def put(self, name, data):
+        """
+        Queue an event, dropping the oldest one if the client does not keep up.
+
+        :param name: Name of the event.
+        :param data: Data of the event.
+        """
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait((name, data))
+
+
+class EventBroadcaster:
+    """
+    Watch the database for sensor state changes and new cycles, and broadcast them to the subscribed clients.
+
+    A single task per process reads the database every EVENT_POLL_INTERVAL seconds while there are subscribers,
+    so the load does not grow with the number of open pages.
+    """
+
+    def __init__(self):
+        self.subscriptions = set()
+        self.task = None
+        self.statuses = {}
+        self.cycles = {}
+        self.last_spectrum_ids = {}
+
+    def snapshot(self, sensor_ids):
+        """
+        Read the current status and last cycle of some sensors, sent to a client when it subscribes.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        :return: A list of (sensor ID, name, data) events.
+        """
+        close_old_connections()
+        statuses = q.get_sensor_status_snapshots(list(sensor_ids))
+        cycles = get_last_cycles(sensor_ids)
+
+        # Sensors which were not watched yet start from this snapshot
+        for sensor_id, status in statuses.items():
+            self.statuses.setdefault(sensor_id, status)
+        for sensor_id, cycle in cycles.items():
+            self.cycles.setdefault(sensor_id, cycle)
+        self.watch_spectrums(sensor_ids)
+
+        return [status_event(sensor_id, status) for sensor_id, status in statuses.items()] + \
+            [cycle_event(sensor_id, *cycle) for sensor_id, cycle in cycles.items()]
+
+    def watch_spectrums(self, sensor_ids):
+        """
+        Start watching the new spectrums of the sensors which were not watched yet, after their last spectrum.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        :return: The set of the sensors which were already watched.
+        """
+        watched = {sensor_id for sensor_id in sensor_ids if sensor_id in self.last_spectrum_ids}
+        new = [sensor_id for sensor_id in sensor_ids if sensor_id not in watched]
+        if new:
+            self.last_spectrum_ids.update(get_last_spectrum_ids(new))
+
+        return watched
+
+    def collect(self, sensor_ids):
+        """
+        Find the status changes and new cycles of some sensors since the last read.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        :return: A list of (sensor ID, name, data) events.
+        """
+        close_old_connections()
+        events = []
+
+        # Compare the status of every sensor with the last one read, in a single query
+        for sensor_id, status in q.get_sensor_status_snapshots(list(sensor_ids)).items():
+            if self.statuses.get(sensor_id) != status:
+                self.statuses[sensor_id] = status
+                events.append(status_event(sensor_id, status))
+
+        # Find the cycles of the spectrums recorded since the last read of each sensor
+        watched = self.watch_spectrums(sensor_ids)
+        if not watched:
+            return events
+
+        for sensor_id, deployment, cycle, last_id in Spectrum.objects.filter(
+                Q.create([(Q(pfiona_sensor_id=sensor_id) & Q(id__gt=self.last_spectrum_ids[sensor_id]))
+                          for sensor_id in watched], connector=Q.OR),
+                cycle__gte=1,
+                deployment__isnull=False
+        ).values('pfiona_sensor_id', 'deployment').annotate(
+            last_cycle=Max('cycle'), last_id=Max('id')
+        ).order_by('pfiona_sensor_id', 'deployment').values_list(
+            'pfiona_sensor_id', 'deployment', 'last_cycle', 'last_id'
+        ):
+            self.last_spectrum_ids[sensor_id] = max(self.last_spectrum_ids[sensor_id], last_id)
+            if self.cycles.get(sensor_id) != (deployment, cycle):
+                self.cycles[sensor_id] = (deployment, cycle)
+                events.append(cycle_event(sensor_id, deployment, cycle))
+
+        return events
+
+    def publish(self, events):
+        """
+        Send events to the clients subscribed to their sensor.
+
+        :param events: List of (sensor ID, name, data) events.
+        """
+        for sensor_id, name, data in events:
+            for subscription in self.subscriptions:
+                if sensor_id in subscription.sensor_ids:
+                    subscription.put(name, data)
+
+    async def watch(self):
+        """
+        Read the database and publish the events found while there are subscribers.
+        """
+        try:
+            while self.subscriptions:
+                sensor_ids = set().union(*(subscription.sensor_ids for subscription in self.subscriptions))
+                try:
+                    self.publish(await sync_to_async(self.collect)(sensor_ids))
+                except Exception as e:
+                    logger.exception("Error while watching sensor events: %s", e)
+
+                await asyncio.sleep(EVENT_POLL_INTERVAL)
+        finally:
+            self.task = None
+
+    async def subscribe(self, sensor_ids):
+        """
+        Subscribe a client to the events of some sensors.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        :return: A tuple containing the Subscription and the events of the current state of the sensors.
+        """
+        subscription = Subscription(sensor_ids)
+        events = await sync_to_async(self.snapshot)(subscription.sensor_ids)
+
+        self.subscriptions.add(subscription)
+        if self.task is None:
+            self.task = asyncio.create_task(self.watch())
+
+        return subscription, events
+
+    def unsubscribe(self, subscription):
+        """
+        Unsubscribe a client, the watch task stops with the last subscriber.
+
+        :param subscription: Subscription of the client.
+        """
+        self.subscriptions.discard(subscription)
+
+
+# Broadcaster of the process
+broadcaster = EventBroadcaster()
+
+"""
+STREAMS
+"""
+
+
+async def stream_sensor_events(sensor_ids):
+    """
+    Generate the server-sent events of some sensors until the client disconnects.
+
+    The current status and last cycle of each sensor are sent first, then every status change and new cycle.
+
+    :param sensor_ids: List of sensor IDs.
+    :return: An asynchronous generator of event texts.
+    """
+    subscription, events = await broadcaster.subscribe(sensor_ids)
+    try:
+        yield f"retry: {EVENT_RETRY}\n\n"
+        for _, name, data in events:
+            yield format_event(name, data)
+
+        while True:
+            try:
+                name, data = await asyncio.wait_for(subscription.queue.get(), EVENT_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(name, data)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+def snapshot_sensor_events(sensor_ids):
+    """
+    Generate the server-sent events of the current state of some sensors, then end the stream.
+
+    Used when the server cannot hold streams open (WSGI): clients reconnect every EVENT_RETRY milliseconds instead.
+
+    :param sensor_ids: List of sensor IDs.
+    :return: A generator of event texts.
+    """
+    yield f"retry: {EVENT_RETRY}\n\n"
+
+    statuses = q.get_sensor_status_snapshots(sensor_ids)
+    cycles = get_last_cycles(sensor_ids)
+    for sensor_id, status in statuses.items():
+        yield format_event(*status_event(sensor_id, status)[1:])
+    for sensor_id, cycle in cycles.items():
+        yield format_event(*cycle_event(sensor_id, *cycle)[1:])
@@ -0,0 +1,89 @@
+from django.db import connection, transaction
+from django.db.models import Max
+
+from pFIONA_sensors.models import Reagent, Spectrum, Time
+
+# Size of the ID range of each sensor, the IDs of sensor N start at N * SENSOR_ID_RANGE
+SENSOR_ID_RANGE = 10000000000
+
+# Size of the ID range of each sensor for the tables using a narrower one than SENSOR_ID_RANGE
+TABLE_ID_RANGES = {
+    Reagent._meta.db_table: 10000000,
+}
+
+# Tables whose IDs are those of the sensor databases placed in the sensor ranges (see `global_id`) by the imports,
+# pushes and syncs, without any counter. The allocator never reserves IDs in them, so that both never share an ID.
+IMPORTED_TABLES = {Spectrum._meta.db_table, Time._meta.db_table}
+
+
+def get_id_range(model, sensor_id=None):
+    """
+    Retrieve the range of the IDs of a table reserved for a sensor.
+
+    :param model: Model of the table.
+    :param sensor_id: The ID of the sensor, None for a table whose IDs are shared by every sensor.
+    :return: A tuple containing the lowest ID of the range and the ID following it, None if the range is unbounded.
+    """
+    if sensor_id is None:
+        return 0, None
+
+    size = TABLE_ID_RANGES.get(model._meta.db_table, SENSOR_ID_RANGE)
+
+    return sensor_id * size, (sensor_id + 1) * size
+
+
+def allocate_ids(model, sensor_id=None, count=1):
+    """
+    Reserve a block of consecutive IDs for new rows of a table, in the ID range of a sensor.
+
+    Each (sensor, table) pair has a counter row holding the next free ID, moved forward with a single UPDATE
+    whatever the number of rows in the table. The counter row stays locked until the calling transaction ends, so
+    that concurrent allocations never share an ID, and the IDs reserved by a transaction rolled back are free again.
+    The counter starts after the last ID of the range on the first allocation.
+
+    :param model: Model of the table.
+    :param sensor_id: The ID of the sensor owning the rows, None for a table whose IDs are shared by every sensor.
+    :param count: Number of IDs to reserve.
+    :return: The range of the reserved IDs.
+    """
+    if count < 1:
+        return range(0)
+
+    table = model._meta.db_table
+    if table in IMPORTED_TABLES:
+        raise ValueError(f"The IDs of {table} are those of the sensor databases, they are never allocated")
+    lowest, end = get_id_range(model, sensor_id)
+    scope = 0 if sensor_id is None else sensor_id
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute('UPDATE pfiona_idcounter SET next_id = next_id + %s WHERE sensor_id = %s AND "table" = %s '
+                       'RETURNING next_id', [count, scope, table])
+        row = cursor.fetchone()
+
+        if row is None:
+            # First allocation, start after the last ID already in the range
+            ids = model.objects.filter(id__gt=lowest)
+            if end is not None:
+                ids = ids.filter(id__lt=end)
+            first = (ids.aggregate(last_id=Max('id'))['last_id'] or lowest) + 1
+
+            cursor.execute('INSERT INTO pfiona_idcounter (sensor_id, "table", next_id) VALUES (%s, %s, %s) '
+                           'ON CONFLICT (sensor_id, "table") DO UPDATE SET next_id = pfiona_idcounter.next_id + %s '
+                           'RETURNING next_id', [scope, table, first + count, count])
+            row = cursor.fetchone()
+
+        if end is not None and row[0] > end:
+            raise ValueError(f"No ID left for {count} rows of {table} in the ID range of sensor {sensor_id}")
+
+    return range(row[0] - count, row[0])
+
+
+def allocate_id(model, sensor_id=None):
+    """
+    Reserve the ID of a new row of a table, in the ID range of a sensor.
+
+    :param model: Model of the table.
+    :param sensor_id: The ID of the sensor owning the row, None for a table whose IDs are shared by every sensor.
+    :return: The reserved ID.
+    """
+    return allocate_ids(model, sensor_id)[0]
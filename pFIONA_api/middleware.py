@@ -0,0 +1,14 @@
+from pFIONA_api.analysis.deployment_catalog import deployment_catalog_scope
+
+
+class DeploymentCatalogMiddleware:
+    """
+    Scope the deployment catalog to each request, so that a request reads it at most once.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deployment_catalog_scope():
+            return self.get_response(request)
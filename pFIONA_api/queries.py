@@ -1,10 +1,15 @@
 import math
-from math import floor
+from functools import lru_cache
 
+from django.core.exceptions import ValidationError
 from django.db import transaction
 from django.db.models import Q, F, Max, When, Case, OuterRef, Value, IntegerField, Subquery
 
 import pFIONA_sensors.models as models
+from pFIONA_api.analysis.deployment_catalog import touch_deployment_catalog
+from pFIONA_api.analysis.spectrum_values import load_spectrum_rows
+from pFIONA_api.id_allocator import allocate_id, allocate_ids
+from pFIONA_api.validation import validate_reaction_data
 import json
 
 state_dict = {'Boot': 0,
@@ -80,6 +85,16 @@ def delete_spectrums_by_deployment(sensor_id, deployment_id):
             # Filter the Spectrum objects by sensor_id and deployment_id, then delete them
             models.Spectrum.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id).delete()
 
+            # Delete the concentrations and calibration curves calculated from these spectrums
+            models.Concentration.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id).delete()
+            models.Calibration.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id).delete()
+
+            # Remove the deployment from the deployment catalog
+            models.Deployment.objects.filter(pfiona_sensor_id=sensor_id, deployment=deployment_id).delete()
+
+            # Its timestamps now resolve to the previous deployment, which must not be served from a cache
+            touch_deployment_catalog(sensor_id)
+
             # Print a success message after deletion
             print(
                 f"All spectrums for sensor_id {sensor_id} and deployment {deployment_id} have been successfully deleted.")
@@ -90,164 +105,6 @@ def delete_spectrums_by_deployment(sensor_id, deployment_id):
         print(f"An error occurred while deleting spectrums: {e}")
 
 
-def create_reaction(name, standard_id, standard_concentration, volume_of_mixture, volume_to_push_to_flow_cell,
-                    number_of_blank, number_of_sample, number_of_standard, multi_standard, multi_standard_time,
-                    reaction_time, crm, crm_time):
-    """
-    Create a reaction in database
-
-    :param name: Name of reaction
-    :param standard_id: Standard ID of reaction
-    :param standard_concentration: Standard concentration of reaction
-    :param volume_of_mixture: Volume of mixture of reaction
-    :param volume_to_push_to_flow_cell: Volume to push to flow cell of reaction
-    :param number_of_blank : Number of blank in each cycle
-    :param number_of_standard : Number of standard cycle in each cycle
-    :param number_of_sample : Number of sample in each cycle
-    :param multi_standard : True or False for multi-standard reaction
-    :param multi_standard_time : Time for multi-standard reaction
-    :param reaction_time : Time for reaction
-    :param crm : True or False for crm in reaction
-    :param crm_time : Time for each crm
-
-    :return: Reaction object
-    """
-
-    # Retrieve the standard reagent object using the provided standard_id
-    standard = models.Reagent.objects.get(id=standard_id)
-
-    # Calculate the sensor ID based on the standard ID
-    sensor_id = floor(standard_id / 10000000000)
-
-    # Define the range of possible IDs for the new reaction
-    min_id = sensor_id * 10000000000
-    max_id = ((sensor_id + 1) * 10000000000) - 1
-
-    creating_id = None
-
-    # Retrieve existing reaction IDs within the calculated range
-    existing_ids = set(models.Reaction.objects.filter(id__gte=min_id, id__lte=max_id).values_list('id', flat=True))
-
-    # Find the first available ID within the specified range
-    for possible_id in range(min_id, max_id + 1):
-        if possible_id not in existing_ids:
-            creating_id = possible_id
-            break
-
-    # Create a new Reaction object with the specified parameters and the determined ID
-    reaction = models.Reaction.objects.create(
-        name=name,
-        standard_concentration=standard_concentration,
-        standard=standard,
-        volume_of_mixture=volume_of_mixture,
-        volume_to_push_to_flow_cell=volume_to_push_to_flow_cell,
-        number_of_blank=number_of_blank,
-        number_of_standard=number_of_standard,
-        number_of_sample=number_of_sample,
-        multi_standard=multi_standard,
-        multi_standard_time=multi_standard_time,
-        reaction_time=reaction_time,
-        id=creating_id,
-        crm=crm,
-        crm_time=crm_time*1440, # One day in UI = 1440 min for the sensor
-    )
-
-    # Save the newly created reaction to the database
-    reaction.save()
-
-    # Return the created reaction object
-    return reaction
-
-
-def create_step(reagent_id, reaction_id, number, order):
-    """
-    Create a step object in database
-
-    :param reagent_id: Reagent ID (or null if waiting time)
-    :param reaction_id: Reaction ID
-    :param number: Volume to add / Waiting time (depends on param reagent_id)
-    :param order: Order of the action in reaction
-
-    :return: Step object
-    """
-
-    # Calculate the sensor ID based on the reaction ID
-    sensor_id = floor(reaction_id / 10000000000)
-
-    # Define the range of possible IDs for the new step
-    min_id = sensor_id * 10000000000
-    max_id = ((sensor_id + 1) * 10000000000) - 1
-
-    creating_id = None
-
-    # Retrieve existing step IDs within the calculated range
-    existing_ids = set(models.Step.objects.filter(id__gte=min_id, id__lte=max_id).values_list('id', flat=True))
-
-    # Find the first available ID within the specified range
-    for possible_id in range(min_id, max_id + 1):
-        if possible_id not in existing_ids:
-            creating_id = possible_id
-            break
-
-    # Create a new Step object with the specified parameters and the determined ID
-    step = models.Step.objects.create(
-        pfiona_reagent_id=reagent_id,
-        pfiona_reaction_id=reaction_id,
-        number=number,
-        order=order,
-        id=creating_id
-    )
-
-    # Save the newly created step to the database
-    step.save()
-
-    # Return the created step object
-    return step
-
-
-def create_monitored_wavelength(reaction_id, wavelength):
-    """
-    Create a monitored wavelength object in the database
-
-    :param reaction_id: Reaction ID
-    :param wavelength: Wavelength to be monitored
-
-    :return: WavelengthMonitored object
-    """
-
-    # Calculate the sensor ID based on the reaction ID
-    sensor_id = floor(reaction_id / 10000000000)
-
-    # Define the range of possible IDs for the new monitored wavelength
-    min_id = sensor_id * 10000000000
-    max_id = ((sensor_id + 1) * 10000000000) - 1
-
-    creating_id = None
-
-    # Retrieve existing monitored wavelength IDs within the calculated range
-    existing_ids = set(
-        models.WavelengthMonitored.objects.filter(id__gte=min_id, id__lte=max_id).values_list('id', flat=True))
-
-    # Find the first available ID within the specified range
-    for possible_id in range(min_id, max_id + 1):
-        if possible_id not in existing_ids:
-            creating_id = possible_id
-            break
-
-    # Create a new WavelengthMonitored object with the specified parameters and the determined ID
-    monitored_wavelength = models.WavelengthMonitored.objects.create(
-        pfiona_reaction_id=reaction_id,
-        wavelength=wavelength,
-        id=creating_id
-    )
-
-    # Save the newly created monitored wavelength to the database
-    monitored_wavelength.save()
-
-    # Return the created monitored wavelength object
-    return monitored_wavelength
-
-
 def get_reaction_details(reaction_id=None, reaction_name=None, sensor_id=None):
     """
     Get reaction details with the reaction and step details.
@@ -316,63 +173,85 @@ def get_reaction_details(reaction_id=None, reaction_name=None, sensor_id=None):
     return reaction_json
 
 
-def delete_all_step(reaction_id):
+def save_reaction(data, reaction_id=None):
     """
-    Delete all step objects in the database associated with a specific reaction ID.
+    Create or update a reaction with its steps and monitored wavelengths, from the data of the reaction builder
 
-    :param reaction_id: Reaction ID
-    """
+    The reaction is validated, then written in a single transaction with the same number of queries whatever its
+    number of steps: the IDs of the steps and monitored wavelengths are reserved in one block each, and they are
+    inserted with bulk_create. The previous steps and monitored wavelengths of an updated reaction are replaced.
 
-    # Filter the Step objects by the given reaction_id and delete all matching entries
-    models.Step.objects.filter(pfiona_reaction_id=reaction_id).delete()
+    :param data: Reaction data, in the format of validate_reaction_data
+    :param reaction_id: ID of the reaction to update, None to create a new reaction
 
-
-def update_reaction(reaction_id, name, standard_id, standard_concentration, volume_of_mixture,
-                    volume_to_push_to_flow_cell, number_of_blank, number_of_sample, number_of_standard,
-                    multi_standard, multi_standard_time, reaction_time, crm, crm_time):
+    :return: Reaction object
     """
-    Update a reaction in the database
 
-    :param reaction_id: Reaction ID
-    :param name: Name of reaction
-    :param standard_id: Standard ID of reaction
-    :param standard_concentration: Standard concentration of reaction
-    :param volume_of_mixture: Volume of mixture of reaction
-    :param volume_to_push_to_flow_cell: Volume to push to flow cell of reaction
-    :param number_of_blank: Number of blanks in each cycle
-    :param number_of_standard: Number of standard cycles in each cycle
-    :param number_of_sample: Number of samples in each cycle
-    :param multi_standard: True or False for multi-standard reaction
-    :param multi_standard_time: Time for multi-standard reaction
-    :param reaction_time: Time of reaction
-    :param crm: True or False for crm in reaction
-    :param crm_time: Time for each crm
+    # Validate the data and parse the monitored wavelengths
+    validate_reaction_data(data)
+    elements = data['monitored_wavelength'].split(';')
+    wavelength_monitored = sorted(set(int(e) for e in elements if e))
+
+    # Check that the standard and the reagents of the steps exist, on the same sensor
+    standard_id = int(data['standard_reagent_id'])
+    step_reagent_ids = {int(step[0]) for step in data['steps'] if step[0] != "w"}
+    reagent_sensors = dict(models.Reagent.objects.filter(id__in=step_reagent_ids | {standard_id}).values_list(
+        'id', 'pfiona_sensor_id'))
+    if standard_id not in reagent_sensors:
+        raise ValidationError('Unknown standard reagent')
+    sensor_id = reagent_sensors[standard_id]
+    if any(reagent_sensors.get(reagent_id) != sensor_id for reagent_id in step_reagent_ids):
+        raise ValidationError('Reagents must belong to the sensor of the standard reagent')
+
+    fields = {
+        'name': data['name'],
+        'standard_id': standard_id,
+        'standard_concentration': float(data['standard_concentration']),
+        'volume_of_mixture': float(data['volume_of_mixture']),
+        'volume_to_push_to_flow_cell': float(data['volume_to_push_to_flow_cell']),
+        'number_of_blank': int(data['number_of_blank']),
+        'number_of_sample': int(data['number_of_sample']),
+        'number_of_standard': int(data['number_of_standard']),
+        'multi_standard': bool(data['multi_standard']),
+        'multi_standard_time': int(data['multi_standard_time']),
+        'reaction_time': int(data['reaction_time']),
+        'crm': bool(data['crm']),
+        'crm_time': int(data['crm_time']) * 1440,  # One day in UI = 1440 min for the sensor
+    }
+
+    with transaction.atomic():
+        if reaction_id is None:
+            # Create the reaction in the ID range of the sensor
+            reaction = models.Reaction(id=allocate_id(models.Reaction, sensor_id), **fields)
+            reaction.save(force_insert=True)
+        else:
+            # Update the reaction and delete its previous steps and monitored wavelengths
+            if not models.Reaction.objects.filter(id=reaction_id).update(**fields):
+                raise models.Reaction.DoesNotExist('Reaction not found')
+            reaction = models.Reaction(id=reaction_id, **fields)
+            models.Step.objects.filter(pfiona_reaction_id=reaction_id).delete()
+            models.WavelengthMonitored.objects.filter(pfiona_reaction_id=reaction_id).delete()
+
+        # Insert the steps and monitored wavelengths with IDs reserved in one block each
+        step_ids = allocate_ids(models.Step, sensor_id, len(data['steps']))
+        models.Step.objects.bulk_create([
+            models.Step(
+                id=step_id,
+                pfiona_reaction_id=reaction.id,
+                pfiona_reagent_id=None if step[0] == "w" else int(step[0]),  # Reagent or wait time
+                number=int(step[1]),
+                order=key,
+            )
+            for key, (step_id, step) in enumerate(zip(step_ids, data['steps']))
+        ])
 
-    :return: Reaction object
-    """
+        wavelength_ids = allocate_ids(models.WavelengthMonitored, sensor_id, len(wavelength_monitored))
+        models.WavelengthMonitored.objects.bulk_create([
+            models.WavelengthMonitored(id=wavelength_id, pfiona_reaction_id=reaction.id, wavelength=wavelength)
+            for wavelength_id, wavelength in zip(wavelength_ids, wavelength_monitored)
+        ])
 
-    # Retrieve the reaction object from the database using the provided reaction_id
-    reaction = models.Reaction.objects.get(id=reaction_id)
-
-    # Update the reaction's attributes with the provided values
-    reaction.name = name
-    reaction.standard_concentration = standard_concentration
-    reaction.standard_id = standard_id
-    reaction.volume_of_mixture = volume_of_mixture
-    reaction.volume_to_push_to_flow_cell = volume_to_push_to_flow_cell
-    reaction.number_of_blank = number_of_blank
-    reaction.number_of_sample = number_of_sample
-    reaction.number_of_standard = number_of_standard
-    reaction.multi_standard = multi_standard
-    reaction.multi_standard_time = multi_standard_time
-    reaction.reaction_time = reaction_time
-    reaction.crm = crm
-    reaction.crm_time = crm_time
-
-    # Save the updated reaction object back to the database
-    reaction.save()
-
-    # Return the updated reaction object
+    # Return the saved reaction object
     return reaction
 
 
@@ -601,14 +480,19 @@ def set_sample_frequency(sensor_id, sample_frequency):
     sensor.save()
 
 
-def delete_all_wavelength_monitored(reaction_id):
+def get_reaction_calibration(reaction_id):
     """
-    Delete all WavelengthMonitored objects associated with a specific reaction ID.
+    Retrieve the parameters of a reaction which concentrations are calculated from.
 
     :param reaction_id: Reaction ID
+
+    :return: Tuple of the sensor ID, reaction name, standard concentration and sorted monitored wavelengths
     """
-    # Filter the WavelengthMonitored objects by the given reaction_id and delete all matching entries
-    models.WavelengthMonitored.objects.filter(pfiona_reaction_id=reaction_id).delete()
+    reaction = models.Reaction.objects.select_related('standard').get(id=reaction_id)
+    wavelengths = sorted(models.WavelengthMonitored.objects.filter(pfiona_reaction_id=reaction_id).values_list(
+        'wavelength', flat=True))
+
+    return reaction.standard.pfiona_sensor_id, reaction.name, reaction.standard_concentration, wavelengths
 
 
 def get_last_states(sensor_id):
@@ -626,6 +510,50 @@ def get_last_states(sensor_id):
     return sensor.last_states
 
 
+@lru_cache(maxsize=256)
+def parse_states(states):
+    """
+    Parse the last states of a sensor, as stored by the sensor in `last_states`.
+
+    Sensors only store a handful of distinct state lists, so parsed lists are kept in memory.
+
+    :param states: JSON list of state codes
+
+    :return: Tuple of state codes, empty if the states cannot be parsed
+    """
+    try:
+        return tuple(json.loads(states))
+    except (TypeError, ValueError):
+        return ()
+
+
+def get_sensor_status_snapshots(sensor_ids):
+    """
+    Retrieve the status of several sensors in a single query.
+
+    :param sensor_ids: List of sensor IDs
+
+    :return: Dictionary mapping each existing sensor ID to its deployed, sleeping and stop deploying flags,
+             sleep setting, sample frequency and last states
+    """
+    snapshots = {}
+
+    for sensor_id, sleep, sample_frequency, last_states in models.Sensor.objects.filter(
+            id__in=sensor_ids
+    ).order_by('id').values_list('id', 'sleep', 'sample_frequency', 'last_states'):
+        states = parse_states(last_states)
+        snapshots[sensor_id] = {
+            'is_deployed': state_dict['Deployed'] in states or state_dict['Stop_deploying_in_progress'] in states,
+            'is_sleeping': state_dict['Sleep'] in states,
+            'is_stop_deploying_in_progress': state_dict['Stop_deploying_in_progress'] in states,
+            'sleep': sleep,
+            'sample_frequency': sample_frequency,
+            'last_states': list(states),
+        }
+
+    return snapshots
+
+
 def get_standard_concentration(reaction_name=None, reaction_id=None, sensor_id=None):
     """
     Retrieve the standard concentration of a reaction from the database.
@@ -707,24 +635,21 @@ def get_3_last_spectrum_cycle_0(sensor_id):
     :param sensor_id: Sensor ID
     :return: List of dictionaries containing spectrum type and associated values
     """
-    # Retrieve the three last spectra for the given sensor and cycle 0, ordered by descending ID
-    spectra = models.Spectrum.objects.filter(pfiona_sensor_id=sensor_id, cycle=0).order_by('-id')[:3]
+    # Retrieve the IDs of the three last spectra for the given sensor and cycle 0
+    spectrum_ids = list(models.Spectrum.objects.filter(pfiona_sensor_id=sensor_id, cycle=0).order_by(
+        '-id').values_list('id', flat=True)[:3])
 
     # Prepare the response data
     response_data = []
 
-    # Iterate over the retrieved spectra
-    for spectrum in spectra:
-        spectrum_data = {}
-        # Add the spectrum type to the dictionary
-        spectrum_data['type'] = spectrum.pfiona_spectrumtype.type
-        # Retrieve and order the associated values by wavelength, then add them to the dictionary
-        spectrum_data['values'] = list(
-            models.Value.objects.filter(pfiona_spectrum=spectrum).order_by('wavelength').values('wavelength', 'value')
-        )
-
-        # Append the spectrum data to the response list
-        response_data.append(spectrum_data)
+    # Iterate over the retrieved spectra, ordered by descending ID
+    for _, _, spectrum_type, _, wavelengths, values in reversed(
+            load_spectrum_rows(models.Spectrum.objects.filter(id__in=spectrum_ids))):
+        # Add the spectrum type and its values ordered by wavelength to the response
+        response_data.append({
+            'type': spectrum_type,
+            'values': [{'wavelength': wavelength, 'value': value} for wavelength, value in zip(wavelengths, values)]
+        })
 
     # Return the prepared response data
     return response_data
@@ -0,0 +1,524 @@
+import io
+import math
+import sqlite3
+import struct
+import threading
+import time
+import uuid
+from itertools import groupby
+
+import numpy as np
+from django.db import connection, connections, transaction
+
+from pFIONA_api.analysis.absorbance_store import delete_absorbance
+from pFIONA_api.analysis.calibration_store import delete_calibrations
+from pFIONA_api.analysis.concentration_store import invalidate_concentrations
+from pFIONA_api.analysis.deployment_catalog import get_deployment_index, update_deployments
+from pFIONA_api.analysis.spectrum_finder import store_deployment_absorbance
+from pFIONA_api.analysis.spectrum_values import get_or_create_wavelength_axis
+from pFIONA_api.id_allocator import SENSOR_ID_RANGE
+from pFIONA_sensors.models import Sensor, SpectrumType, SpectrumValues, WavelengthAxis
+
+# Rows copied between two progress reports
+PROGRESS_ROWS = 10000
+
+# Characters written to COPY per read
+COPY_CHUNK_SIZE = 1 << 16
+
+# Header and trailer of a binary COPY
+COPY_BINARY_HEADER = b'PGCOPY\n\xff\r\n\x00' + struct.pack('>ii', 0, 0)
+COPY_BINARY_TRAILER = struct.pack('>h', -1)
+
+# Type OID of double precision, the type of the values arrays
+FLOAT8_OID = 701
+
+# Staging tables of an import, dropped with the transaction
+STAGING_TABLES = [
+    'CREATE TEMPORARY TABLE import_time (id bigint, timestamp integer) ON COMMIT DROP',
+    'CREATE TEMPORARY TABLE import_spectrum (id bigint, time_id bigint, spectrumtype_id bigint, cycle integer, '
+    'deployment integer) ON COMMIT DROP',
+    'CREATE TEMPORARY TABLE import_spectrumvalues (spectrum_id bigint, wavelengthaxis_id bigint, '
+    'values double precision[]) ON COMMIT DROP',
+]
+
+# Columns of the spectrum staging table
+SPECTRUM_COLUMNS = ['id', 'time_id', 'spectrumtype_id', 'cycle', 'deployment']
+
+# Imports started from the API, by import ID
+_imports = {}
+_imports_lock = threading.Lock()
+
+"""
+COPY
+"""
+
+
+def copy_value(value):
+    """
+    Format a value for COPY in text format.
+
+    :param value: None, a number, a string or a list of floats.
+    :return: The text of the value.
+    """
+    if value is None:
+        return '\\N'
+    if isinstance(value, float):
+        return repr(value) if math.isfinite(value) else ('NaN' if math.isnan(value) else
+                                                          'Infinity' if value > 0 else '-Infinity')
+    if isinstance(value, list):
+        return '{' + ','.join(copy_value(float(e)) for e in value) + '}'
+    if isinstance(value, str):
+        return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+    return str(value)
+
+
+class CopySource:
+    """
+    File-like object streaming rows to COPY FROM STDIN, so that they are never held in memory all at once.
+    """
+
+    def __init__(self, rows, progress=None):
+        self.rows = iter(rows)
+        self.progress = progress
+        self.buffer = ''
+        self.count = 0
+
+    def read(self, size=-1):
+        size = COPY_CHUNK_SIZE if size is None or size < 0 else size
+        parts = [self.buffer]
+        length = len(self.buffer)
+
+        # Format rows only until the chunk is full, a long row is kept in the buffer for the next reads
+        while length < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+
+            line = '\t'.join(copy_value(value) for value in row) + '\n'
+            parts.append(line)
+            length += len(line)
+
+            self.count += 1
+            if self.progress is not None and self.count % PROGRESS_ROWS == 0:
+                self.progress(self.count)
+
+        data = ''.join(parts)
+        self.buffer = data[size:]
+
+        return data[:size]
+
+
+def copy_rows(cursor, table, columns, rows, progress=None):
+    """
+    Copy rows into a table with COPY.
+
+    :param cursor: Database cursor.
+    :param table: Name of the table.
+    :param columns: List of the columns of the rows.
+    :param rows: Iterable of row tuples.
+    :param progress: Optional function called with the number of rows copied so far.
+    :return: The number of rows copied.
+    """
+    source = CopySource(rows, progress)
+    cursor.copy_expert(f'COPY {table} ({", ".join(columns)}) FROM STDIN', source, COPY_CHUNK_SIZE)
+    if progress is not None:
+        progress(source.count)
+
+    return source.count
+
+
+def copy_packed_values(cursor, spectrum_ids, axis_id, values):
+    """
+    Copy the values of spectrums sharing a wavelength axis into the values staging table.
+
+    The rows are built at once from the value matrix in the binary COPY format, so that values are never formatted
+    as text.
+
+    :param cursor: Database cursor.
+    :param spectrum_ids: Array of the central spectrum IDs.
+    :param axis_id: The wavelength axis ID of every spectrum.
+    :param values: (spectrums x wavelengths) float array.
+    :return: The number of rows copied.
+    """
+    count, size = values.shape
+    rows = np.zeros(count, dtype=[
+        ('fields', '>i2'),
+        ('spectrum_id_size', '>i4'), ('spectrum_id', '>i8'),
+        ('axis_id_size', '>i4'), ('axis_id', '>i8'),
+        ('values_size', '>i4'), ('dimensions', '>i4'), ('has_null', '>i4'), ('element_type', '>i4'),
+        ('length', '>i4'), ('lower_bound', '>i4'),
+        ('values', [('size', '>i4'), ('value', '>f8')], (size,)),
+    ])
+
+    # Each row holds 3 fields, the values field is a one-dimensional array starting at index 1
+    rows['fields'] = 3
+    rows['spectrum_id_size'] = 8
+    rows['spectrum_id'] = spectrum_ids
+    rows['axis_id_size'] = 8
+    rows['axis_id'] = axis_id
+    rows['values_size'] = 20 + 12 * size
+    rows['dimensions'] = 1
+    rows['element_type'] = FLOAT8_OID
+    rows['length'] = size
+    rows['lower_bound'] = 1
+    rows['values']['size'] = 8
+    rows['values']['value'] = values
+
+    data = io.BytesIO(COPY_BINARY_HEADER + rows.tobytes() + COPY_BINARY_TRAILER)
+    cursor.copy_expert('COPY import_spectrumvalues (spectrum_id, wavelengthaxis_id, values) FROM STDIN '
+                       'WITH (FORMAT binary)', data, COPY_CHUNK_SIZE)
+
+    return count
+
+
+"""
+SQLITE
+"""
+
+
+def global_id(sensor_id, local_id):
+    """
+    Place an ID of a sensor database in the ID range of the sensor, if it is not already in it.
+
+    Only the tables of `id_allocator.IMPORTED_TABLES` take their IDs from the sensor databases, the allocator
+    never reserves IDs in them.
+
+    :param sensor_id: The ID of the sensor.
+    :param local_id: ID read from the sensor database.
+    :return: The ID in the central database.
+    """
+    offset = sensor_id * SENSOR_ID_RANGE
+    if offset <= local_id < offset + SENSOR_ID_RANGE:
+        return local_id
+    if 0 < local_id < SENSOR_ID_RANGE:
+        return offset + local_id
+
+    raise ValueError(f"ID {local_id} is outside of the ID range of sensor {sensor_id}")
+
+
+def get_spectrum_type_ids(spectrum_types):
+    """
+    Retrieve the central IDs of spectrum types by name, creating the missing ones.
+
+    Spectrum type IDs are not placed in the ID range of the sensors, so the same type may have different IDs on a
+    sensor and in the central database. The spectrum types are parsed before they are used, so that the spectrums
+    written with them are found by the filters on their structured columns.
+
+    :param spectrum_types: Iterable of spectrum type names.
+    :return: A dictionary mapping each spectrum type name to its central ID.
+    """
+    spectrum_types = set(spectrum_types)
+    SpectrumType.parse_pending(spectrum_types)
+    known = dict(SpectrumType.objects.filter(type__in=spectrum_types).values_list('type', 'id'))
+
+    for spectrum_type in sorted(spectrum_types - set(known)):
+        known[spectrum_type] = SpectrumType.objects.create(type=spectrum_type).id
+
+    return known
+
+
+def read_spectrum_types(database):
+    """
+    Map the spectrum types of a sensor database to the spectrum types of the central database, creating the
+    missing ones.
+
+    :param database: SQLite connection.
+    :return: A dictionary mapping each spectrum type ID of the sensor database to its central ID.
+    """
+    types = dict(database.execute('SELECT id, type FROM pfiona_spectrumtype'))
+    known = get_spectrum_type_ids(types.values())
+
+    return {local_id: known[spectrum_type] for local_id, spectrum_type in types.items()}
+
+
+class AxisResolver:
+    """
+    Wavelength axes of the spectrums being copied.
+
+    No query can run while a COPY is in progress, so the wavelength axes which do not exist yet get a temporary
+    negative ID, replaced once the COPY is over.
+    """
+
+    def __init__(self):
+        self.ids = {tuple(wavelengths): axis_id
+                    for axis_id, wavelengths in WavelengthAxis.objects.values_list('id', 'wavelengths')}
+        self.pending = {}
+
+    def resolve(self, wavelengths):
+        """
+        Retrieve the ID of a wavelength axis, or a temporary ID if it does not exist yet.
+
+        :param wavelengths: Tuple of sorted wavelengths.
+        :return: The wavelength axis ID.
+        """
+        if wavelengths in self.ids:
+            return self.ids[wavelengths]
+
+        return self.pending.setdefault(wavelengths, -len(self.pending) - 1)
+
+    def create_pending(self, cursor, table):
+        """
+        Create the wavelength axes with a temporary ID, and replace their temporary ID in a staging table.
+
+        :param cursor: Database cursor.
+        :param table: Name of the staging table.
+        """
+        for wavelengths, temporary_id in self.pending.items():
+            axis_id = get_or_create_wavelength_axis(list(wavelengths))
+            cursor.execute(f'UPDATE {table} SET wavelengthaxis_id = %s WHERE wavelengthaxis_id = %s',
+                           [axis_id, temporary_id])
+            self.ids[wavelengths] = axis_id
+
+        self.pending = {}
+
+
+def read_spectrum_values(database, sensor_id, skip_ids, axes):
+    """
+    Read the values of the spectrums of a sensor database, packed into arrays over shared wavelength axes.
+
+    :param database: SQLite connection.
+    :param sensor_id: The ID of the sensor.
+    :param skip_ids: Set of central spectrum IDs whose values are already packed.
+    :param axes: AxisResolver of the import.
+    :return: A generator of (spectrum ID, wavelength axis ID, values) tuples.
+    """
+    rows = database.execute('SELECT pfiona_spectrum_id, wavelength, value FROM pfiona_value '
+                            'ORDER BY pfiona_spectrum_id, wavelength')
+
+    for local_id, spectrum_rows in groupby(rows, key=lambda row: row[0]):
+        spectrum_id = global_id(sensor_id, local_id)
+        if spectrum_id in skip_ids:
+            continue
+
+        spectrum_rows = list(spectrum_rows)
+        axis_id = axes.resolve(tuple(row[1] for row in spectrum_rows))
+
+        yield spectrum_id, axis_id, [row[2] for row in spectrum_rows]
+
+
+"""
+MERGE
+"""
+
+
+def create_staging_tables(cursor):
+    """
+    Create the staging tables of a transaction, dropped when it commits.
+
+    :param cursor: Database cursor.
+    """
+    for statement in STAGING_TABLES:
+        cursor.execute(statement)
+
+
+def merge_staging(cursor, sensor_id):
+    """
+    Merge the staging tables into the central tables with one set-based upsert per table.
+
+    Times and spectrums are updated only when they differ, and the values of spectrums already packed are left as
+    they are, so merging the same rows again changes nothing.
+
+    :param cursor: Database cursor, in the transaction of the staging tables.
+    :param sensor_id: The ID of the sensor the rows come from.
+    :return: A tuple containing the number of spectrums inserted or updated, the number of spectrum values inserted
+             and the sorted list of the deployments which changed.
+    """
+    cursor.execute(
+        'INSERT INTO pfiona_time (id, timestamp) SELECT DISTINCT ON (id) id, timestamp FROM import_time '
+        'ON CONFLICT (id) DO UPDATE SET timestamp = EXCLUDED.timestamp '
+        'WHERE pfiona_time.timestamp IS DISTINCT FROM EXCLUDED.timestamp'
+    )
+
+    # Deployments the spectrums are moved out of
+    cursor.execute(
+        'SELECT DISTINCT s.deployment FROM pfiona_spectrum s JOIN import_spectrum i ON i.id = s.id '
+        'WHERE (s.pfiona_time_id, s.pfiona_spectrumtype_id, s.cycle, s.deployment) '
+        'IS DISTINCT FROM (i.time_id, i.spectrumtype_id, i.cycle, i.deployment)'
+    )
+    deployments = {row[0] for row in cursor.fetchall()}
+
+    cursor.execute(
+        'INSERT INTO pfiona_spectrum (id, pfiona_sensor_id, pfiona_time_id, pfiona_spectrumtype_id, cycle, '
+        'deployment) SELECT DISTINCT ON (id) id, %s, time_id, spectrumtype_id, cycle, deployment '
+        'FROM import_spectrum '
+        'ON CONFLICT (id) DO UPDATE SET pfiona_time_id = EXCLUDED.pfiona_time_id, '
+        'pfiona_spectrumtype_id = EXCLUDED.pfiona_spectrumtype_id, cycle = EXCLUDED.cycle, '
+        'deployment = EXCLUDED.deployment '
+        'WHERE (pfiona_spectrum.pfiona_time_id, pfiona_spectrum.pfiona_spectrumtype_id, pfiona_spectrum.cycle, '
+        'pfiona_spectrum.deployment) IS DISTINCT FROM (EXCLUDED.pfiona_time_id, '
+        'EXCLUDED.pfiona_spectrumtype_id, EXCLUDED.cycle, EXCLUDED.deployment) '
+        'RETURNING deployment',
+        [sensor_id]
+    )
+    merged = cursor.fetchall()
+    deployments.update(row[0] for row in merged)
+
+    cursor.execute(
+        'WITH inserted AS ('
+        'INSERT INTO pfiona_spectrumvalues (pfiona_spectrum_id, pfiona_wavelengthaxis_id, "values") '
+        'SELECT DISTINCT ON (i.spectrum_id) i.spectrum_id, i.wavelengthaxis_id, i.values '
+        'FROM import_spectrumvalues i JOIN pfiona_spectrum s ON s.id = i.spectrum_id '
+        'ON CONFLICT (pfiona_spectrum_id) DO NOTHING RETURNING pfiona_spectrum_id) '
+        'SELECT s.deployment, COUNT(*) FROM inserted '
+        'JOIN pfiona_spectrum s ON s.id = inserted.pfiona_spectrum_id GROUP BY s.deployment'
+    )
+    inserted = cursor.fetchall()
+    deployments.update(row[0] for row in inserted)
+
+    deployments = sorted(deployment for deployment in deployments if deployment is not None)
+
+    return len(merged), sum(row[1] for row in inserted), deployments
+
+
+def invalidate_deployments(sensor_id, deployments):
+    """
+    Refresh the catalog of deployments whose spectrums changed, and store the absorbance of their completed cycles
+    again. Their other derived data is computed again on the next read.
+
+    :param sensor_id: The ID of the sensor.
+    :param deployments: List of the deployment IDs.
+    """
+    if not deployments:
+        return
+
+    update_deployments(sensor_id, deployments)
+    for deployment in deployments:
+        delete_absorbance(sensor_id, deployment)
+        delete_calibrations(sensor_id, deployment_id=deployment)
+        invalidate_concentrations(sensor_id, deployment_id=deployment)
+
+    # The last cycle of the previous deployment is completed by the first spectrums of the next one
+    previous = [deployment for deployment in get_deployment_index(sensor_id).catalog if deployment < deployments[0]]
+    for deployment in ([max(previous)] if previous else []) + deployments:
+        store_deployment_absorbance(deployment, sensor_id)
+
+
+"""
+IMPORT
+"""
+
+
+def import_sensor_database(sensor_id, path, progress=None):
+    """
+    Import the spectrums of a sensor SQLite database into the central database.
+
+    The rows are copied with COPY into staging tables, then merged into the central tables with one set-based
+    upsert per table, in a single transaction. Values are stored packed, one row per spectrum. Re-importing the
+    same database changes nothing: rows already imported are left as they are, and the values of spectrums
+    already packed are not read again.
+
+    :param sensor_id: The ID of the sensor the database comes from.
+    :param path: Path of the SQLite database.
+    :param progress: Optional function called with the name of the current step and the number of rows it handled.
+    :return: A dictionary containing the number of rows read per table, of spectrums inserted or updated, of
+             spectrum values inserted, and the list of the deployments which changed.
+    """
+    if not Sensor.objects.filter(id=sensor_id).exists():
+        raise ValueError("Sensor not found")
+
+    report = progress or (lambda step, rows: None)
+    database = sqlite3.connect(f'file:{path}?mode=ro', uri=True)
+
+    try:
+        with transaction.atomic(), connection.cursor() as cursor:
+            create_staging_tables(cursor)
+
+            # Copy the times and spectrums, placed in the ID range of the sensor
+            types = read_spectrum_types(database)
+            time_rows = (
+                (global_id(sensor_id, time_id), timestamp)
+                for time_id, timestamp in database.execute('SELECT id, timestamp FROM pfiona_time')
+            )
+            spectrum_rows = (
+                (global_id(sensor_id, spectrum_id), global_id(sensor_id, time_id), types[type_id], cycle, deployment)
+                for spectrum_id, time_id, type_id, cycle, deployment in database.execute(
+                    'SELECT id, pfiona_time_id, pfiona_spectrumtype_id, cycle, deployment FROM pfiona_spectrum')
+            )
+            times = copy_rows(cursor, 'import_time', ['id', 'timestamp'], time_rows,
+                              lambda rows: report('time', rows))
+            spectrums = copy_rows(cursor, 'import_spectrum', SPECTRUM_COLUMNS, spectrum_rows,
+                                  lambda rows: report('spectrum', rows))
+
+            # Copy the values of the spectrums which are not packed yet
+            offset = sensor_id * SENSOR_ID_RANGE
+            packed = set(SpectrumValues.objects.filter(
+                pfiona_spectrum_id__gte=offset, pfiona_spectrum_id__lt=offset + SENSOR_ID_RANGE
+            ).values_list('pfiona_spectrum_id', flat=True))
+            axes = AxisResolver()
+            values = copy_rows(cursor, 'import_spectrumvalues', ['spectrum_id', 'wavelengthaxis_id', 'values'],
+                               read_spectrum_values(database, sensor_id, packed, axes),
+                               lambda rows: report('values', rows))
+            axes.create_pending(cursor, 'import_spectrumvalues')
+
+            report('merge', 0)
+            merged, inserted, deployments = merge_staging(cursor, sensor_id)
+            report('catalog', len(deployments))
+            invalidate_deployments(sensor_id, deployments)
+    finally:
+        database.close()
+
+    return {
+        'times': times,
+        'spectrums': spectrums,
+        'values': values,
+        'spectrums_merged': merged,
+        'values_inserted': inserted,
+        'deployments': deployments,
+    }
+
+
+"""
+BACKGROUND IMPORTS
+"""
+
+
+def start_import(sensor_id, path, on_done=None):
+    """
+    Import a sensor SQLite database from a background thread.
+
+    :param sensor_id: The ID of the sensor the database comes from.
+    :param path: Path of the SQLite database.
+    :param on_done: Optional function called once the import is over, to remove the database file.
+    :return: The import ID, to follow its progress with `get_import_progress`.
+    """
+    import_id = uuid.uuid4().hex
+    with _imports_lock:
+        _imports[import_id] = {'sensor_id': sensor_id, 'status': 'running', 'step': 'start', 'rows': 0,
+                               'started': time.time(), 'result': None, 'message': None}
+
+    def progress(step, rows):
+        with _imports_lock:
+            _imports[import_id].update({'step': step, 'rows': rows})
+
+    def run():
+        try:
+            result = import_sensor_database(sensor_id, path, progress)
+            update = {'status': 'success', 'step': 'done', 'result': result}
+        except Exception as e:
+            update = {'status': 'error', 'message': str(e)}
+        finally:
+            connections.close_all()
+            if on_done is not None:
+                on_done()
+
+        with _imports_lock:
+            _imports[import_id].update(update)
+
+    threading.Thread(target=run, name=f'sensor-import-{import_id}', daemon=True).start()
+
+    return import_id
+
+
+def get_import_progress(import_id):
+    """
+    Retrieve the progress of an import started with `start_import`.
+
+    :param import_id: The import ID.
+    :return: A dictionary containing the sensor ID, status, current step, rows handled by the step, start time,
+             result and error message of the import, or None if the import is unknown.
+    """
+    with _imports_lock:
+        state = _imports.get(import_id)
+
+        return dict(state, elapsed=round(time.time() - state['started'], 3)) if state is not None else None
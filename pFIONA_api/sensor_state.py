@@ -0,0 +1,249 @@
+import http.client
+import json
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import close_old_connections, connections
+
+from pFIONA_auth.serializers import CustomTokenObtainPairSerializer
+from pFIONA_sensors.models import Sensor
+
+# Path of the state endpoint of the sensors
+SENSOR_STATE_PATH = '/sensor/get_state'
+
+# Seconds a sensor keeps being polled after the last client asking for its state
+SENSOR_STATE_IDLE_TIMEOUT = 60
+
+# Seconds after which the JWT sent to the sensors is renewed
+SENSOR_TOKEN_RENEWAL = 3600
+
+# Most sensors polled at the same time
+SENSOR_STATE_MAX_WORKERS = 8
+
+# Claim of the JWT binding it to the only sensor allowed to push spectrums with it
+SENSOR_CLAIM = 'sensor_id'
+
+logger = logging.getLogger(__name__)
+
+"""
+TOKEN
+"""
+
+
+def get_sensor_token():
+    """
+    Build the JWT sent to the sensors, the same one the browser receives from /jwt/.
+
+    :return: The token, or None if there is no user to issue it for.
+    """
+    if settings.SENSOR_STATE_USER:
+        user = User.objects.filter(username=settings.SENSOR_STATE_USER, is_active=True).first()
+    else:
+        user = User.objects.filter(is_superuser=True, is_active=True).order_by('id').first()
+
+    if user is None:
+        return None
+
+    return str(CustomTokenObtainPairSerializer.get_token(user))
+
+
+def get_sensor_push_token(user, sensor_id):
+    """
+    Build the JWT a sensor pushes its spectrums with, bound to the sensor by its SENSOR_CLAIM claim. The access
+    tokens obtained from its refresh token keep the claim.
+
+    :param user: The user the token is issued for, a member of the ADMIN group.
+    :param sensor_id: The ID of the sensor.
+    :return: The refresh token.
+    """
+    token = CustomTokenObtainPairSerializer.get_token(user)
+    token[SENSOR_CLAIM] = int(sensor_id)
+
+    return token
+
+
+"""
+POLLER
+"""
+
+
+class SensorStatePoller:
+    """
+    Poll the state of the sensors from a background thread and keep the latest one of each sensor in memory.
+
+    Only the sensors whose state was asked for in the last SENSOR_STATE_IDLE_TIMEOUT seconds are polled, once per
+    SENSOR_STATE_POLL_INTERVAL seconds whatever the number of clients, over one keep-alive connection per sensor.
+    The thread stops when no sensor is watched anymore.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.watched = {}
+        self.states = {}
+        self.pool = {}
+        self.token = None
+        self.token_time = None
+
+    def watch(self, sensor_ids):
+        """
+        Keep polling some sensors, starting the thread if needed.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for sensor_id in sensor_ids:
+                self.watched[sensor_id] = now
+
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='sensor-state-poller', daemon=True)
+                self.thread.start()
+
+    def get_states(self, sensor_ids):
+        """
+        Retrieve the latest state of some sensors.
+
+        :param sensor_ids: Iterable of sensor IDs.
+        :return: A dictionary mapping each sensor ID to its connection flag, state, error and age in seconds, with
+                 a None age if the sensor was not polled yet.
+        """
+        now = time.monotonic()
+        states = {}
+        with self.lock:
+            for sensor_id in sensor_ids:
+                polled = self.states.get(sensor_id)
+                if polled is None:
+                    states[sensor_id] = {'connected': None, 'state': None, 'error': None, 'age': None}
+                else:
+                    states[sensor_id] = {**polled[1], 'age': round(now - polled[0], 3)}
+
+        return states
+
+    def get_connection(self, sensor_id, host):
+        """
+        Retrieve the keep-alive connection of a sensor, opened on first use.
+
+        :param sensor_id: The ID of the sensor.
+        :param host: IP address of the sensor.
+        :return: The HTTPConnection of the sensor.
+        """
+        with self.lock:
+            connection = self.pool.get(sensor_id)
+            if connection is None or connection.host != host:
+                connection = http.client.HTTPConnection(host, settings.SENSOR_PORT,
+                                                        timeout=settings.SENSOR_STATE_TIMEOUT)
+                self.pool[sensor_id] = connection
+
+        return connection
+
+    def close_connection(self, sensor_id):
+        """
+        Close the connection of a sensor, a new one is opened on the next poll.
+
+        :param sensor_id: The ID of the sensor.
+        """
+        with self.lock:
+            connection = self.pool.pop(sensor_id, None)
+        if connection is not None:
+            connection.close()
+
+    def poll(self, sensor_id, host):
+        """
+        Read the state of a sensor and store it.
+
+        :param sensor_id: The ID of the sensor.
+        :param host: IP address of the sensor.
+        """
+        headers = {'Content-Type': 'application/json'}
+        if self.token is not None:
+            headers['Authorization'] = f'Bearer {self.token}'
+
+        try:
+            for attempt in range(2):
+                connection = self.get_connection(sensor_id, host)
+                try:
+                    connection.request('GET', SENSOR_STATE_PATH, headers=headers)
+                    response = connection.getresponse()
+                    body = response.read()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    # The sensor may have closed the idle connection, retry once on a new one
+                    self.close_connection(sensor_id)
+                    if attempt:
+                        raise
+
+            if response.status == 401:
+                self.token_time = None
+            if response.status != 200:
+                raise ValueError(f"Sensor answered {response.status}")
+
+            state = {'connected': True, 'state': json.loads(body), 'error': None}
+        except Exception as e:
+            self.close_connection(sensor_id)
+            state = {'connected': False, 'state': None, 'error': str(e) or e.__class__.__name__}
+
+        with self.lock:
+            self.states[sensor_id] = (time.monotonic(), state)
+
+    def run(self):
+        """
+        Poll the watched sensors until none is watched anymore.
+        """
+        try:
+            with ThreadPoolExecutor(max_workers=SENSOR_STATE_MAX_WORKERS) as executor:
+                while True:
+                    start = time.monotonic()
+
+                    # Forget the sensors nobody asked for recently
+                    with self.lock:
+                        for sensor_id, last_watch in list(self.watched.items()):
+                            if start - last_watch > SENSOR_STATE_IDLE_TIMEOUT:
+                                del self.watched[sensor_id]
+                                self.states.pop(sensor_id, None)
+                        if not self.watched:
+                            self.thread = None
+                            idle_connections = list(self.pool.values())
+                            self.pool.clear()
+                            break
+                        sensor_ids = list(self.watched)
+
+                    close_old_connections()
+                    if self.token_time is None or start - self.token_time > SENSOR_TOKEN_RENEWAL:
+                        self.token = get_sensor_token()
+                        self.token_time = start
+                    hosts = dict(Sensor.objects.filter(id__in=sensor_ids).values_list('id', 'ip_address'))
+
+                    # Poll the sensors together, each over its own connection
+                    list(executor.map(lambda item: self.poll(*item), hosts.items()))
+
+                    time.sleep(max(0.0, settings.SENSOR_STATE_POLL_INTERVAL - (time.monotonic() - start)))
+
+            for connection in idle_connections:
+                connection.close()
+        except Exception as e:
+            logger.exception("Error while polling sensor states: %s", e)
+            with self.lock:
+                self.thread = None
+        finally:
+            connections.close_all()
+
+
+# Poller of the process
+poller = SensorStatePoller()
+
+
+def get_sensor_states(sensor_ids):
+    """
+    Retrieve the latest polled state of some sensors, and keep polling them.
+
+    :param sensor_ids: Iterable of sensor IDs.
+    :return: A dictionary mapping each sensor ID to its connection flag, state, error and age in seconds.
+    """
+    poller.watch(sensor_ids)
+
+    return poller.get_states(sensor_ids)
@@ -0,0 +1,334 @@
+import asyncio
+import json
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from pFIONA_api.analysis.binary_payload import decode_payload
+from pFIONA_api.analysis.negotiation import BINARY_CONTENT_TYPE
+from pFIONA_api.sensor_import import SENSOR_ID_RANGE, global_id
+from pFIONA_api.sensor_state import get_sensor_token
+from pFIONA_api.spectrum_ingest import get_high_water_mark, ingest_spectrums
+from pFIONA_sensors.models import Sensor, SyncCheckpoint
+
+# Path of the endpoint of the sensors answering the spectrums after a spectrum ID, as a pushed batch
+SENSOR_SPECTRUMS_PATH = '/sensor/get_spectrums'
+
+# Spectrums asked for per request
+SYNC_BATCH_SIZE = 500
+
+# Seconds between the starts of two rounds over the sensors
+SYNC_INTERVAL = 300
+
+# Most sensors synced at the same time
+SYNC_CONCURRENCY = 4
+
+# Seconds to wait for the answer of a sensor
+SYNC_TIMEOUT = 60
+
+# Bounds of the delay in seconds before syncing a failing sensor again, doubled on each consecutive failure
+SYNC_BACKOFF_MIN = 30
+SYNC_BACKOFF_MAX = 3600
+
+"""
+HTTP
+"""
+
+
+async def http_get(host, port, path, headers, timeout):
+    """
+    Send a GET request over a new connection and read the whole answer.
+
+    The request is sent as HTTP/1.0 so that the sensor answers without chunked encoding and closes the connection
+    at the end of the body.
+
+    :param host: IP address of the sensor.
+    :param port: Port of the sensor API.
+    :param path: Path and query string of the request.
+    :param headers: Dictionary of the request headers.
+    :param timeout: Seconds to wait for the whole answer.
+    :return: A tuple containing the status code, the dictionary of the answer headers with lower case names, and
+             the body.
+    """
+    async def exchange():
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            lines = [f'GET {path} HTTP/1.0', f'Host: {host}:{port}'] + [f'{name}: {value}'
+                                                                         for name, value in headers.items()]
+            writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+            await writer.drain()
+
+            return await reader.read()
+        finally:
+            writer.close()
+
+    answer = await asyncio.wait_for(exchange(), timeout)
+
+    # Split the status line and the headers from the body
+    head, separator, body = answer.partition(b'\r\n\r\n')
+    status_line, *header_lines = head.decode('latin-1').split('\r\n')
+    status = status_line.split(' ', 2)
+    if not separator or len(status) < 2 or not status[1].isdigit():
+        raise ValueError("Invalid HTTP answer")
+
+    answer_headers = {}
+    for line in header_lines:
+        name, _, value = line.partition(':')
+        answer_headers[name.strip().lower()] = value.strip()
+
+    length = answer_headers.get('content-length', '')
+    if length.isdigit() and len(body) < int(length):
+        raise ValueError("Truncated HTTP answer")
+
+    return int(status[1]), answer_headers, body
+
+
+def parse_batch(content_type, body):
+    """
+    Decode a batch of spectrums answered by a sensor, as JSON or as a binary spectrum payload.
+
+    :param content_type: Content type of the answer.
+    :param body: Body of the answer.
+    :return: A tuple containing the metadata columns, the wavelengths and the values of the batch.
+    """
+    if content_type.split(';')[0].strip() == BINARY_CONTENT_TYPE:
+        header, arrays = decode_payload(body)
+        batch = dict(header, **arrays)
+    else:
+        try:
+            batch = json.loads(body)
+        except ValueError:
+            raise ValueError("Invalid JSON answer")
+
+    if not isinstance(batch, dict) or not isinstance(batch.get('columns'), dict) \
+            or not isinstance(batch['columns'].get('id'), list):
+        raise ValueError("Invalid batch, missing id column")
+
+    return batch['columns'], batch.get('wavelengths'), batch.get('values')
+
+
+"""
+CHECKPOINTS
+"""
+
+
+def get_checkpoint(sensor_id):
+    """
+    Retrieve the checkpoint of a sensor. A sensor never synced starts after the last spectrum already stored, by an
+    import or a push.
+
+    :param sensor_id: The ID of the sensor.
+    :return: The SyncCheckpoint of the sensor.
+    """
+    close_old_connections()
+    checkpoint = SyncCheckpoint.objects.filter(pfiona_sensor_id=sensor_id).first()
+    if checkpoint is None:
+        mark = get_high_water_mark(sensor_id)
+        checkpoint, _ = SyncCheckpoint.objects.get_or_create(
+            pfiona_sensor_id=sensor_id, defaults={'last_spectrum_id': mark['id'], 'last_timestamp': mark['timestamp']}
+        )
+
+    return checkpoint
+
+
+def store_batch(sensor_id, after_id, columns, wavelengths, values):
+    """
+    Store a batch of spectrums pulled from a sensor and move its checkpoint forward in the same transaction, so that
+    an interrupted sync resumes after the last batch stored.
+
+    :param sensor_id: The ID of the sensor.
+    :param after_id: Spectrum ID of the checkpoint the batch was asked from.
+    :param columns: Dictionary of the metadata columns of the batch.
+    :param wavelengths: Wavelengths of the batch.
+    :param values: Values of the batch.
+    :return: The ID of the last spectrum of the batch, in the sensor database.
+    """
+    close_old_connections()
+    try:
+        local_ids = [global_id(sensor_id, int(spectrum_id)) - sensor_id * SENSOR_ID_RANGE
+                     for spectrum_id in columns['id']]
+        last = max(range(len(local_ids)), key=local_ids.__getitem__)
+        last_timestamp = int(columns['timestamp'][last])
+    except (KeyError, IndexError, TypeError):
+        raise ValueError("Invalid batch, IDs and timestamps must be integers")
+
+    # A sensor answering spectrums before the checkpoint would be pulled again forever
+    if local_ids[last] <= after_id:
+        raise ValueError(f"Sensor answered no spectrum after spectrum {after_id}")
+
+    with transaction.atomic():
+        ingest_spectrums(sensor_id, columns, wavelengths, values)
+        SyncCheckpoint.objects.filter(pfiona_sensor_id=sensor_id).update(
+            last_spectrum_id=local_ids[last], last_timestamp=last_timestamp
+        )
+
+    return local_ids[last]
+
+
+def record_success(sensor_id):
+    """
+    Mark a sensor as synced up to date, clearing its failures.
+
+    :param sensor_id: The ID of the sensor.
+    """
+    close_old_connections()
+    SyncCheckpoint.objects.filter(pfiona_sensor_id=sensor_id).update(
+        last_sync=timezone.now(), failures=0, next_attempt=None, error=None
+    )
+
+
+def record_failure(sensor_id, error):
+    """
+    Record a failed sync of a sensor, and postpone its next sync by a delay doubled on each consecutive failure.
+
+    :param sensor_id: The ID of the sensor.
+    :param error: Error message of the failure.
+    :return: The delay in seconds before the next sync of the sensor.
+    """
+    checkpoint = get_checkpoint(sensor_id)
+
+    # Spread the retries of sensors failing together, such as after a network outage
+    delay = min(SYNC_BACKOFF_MAX, SYNC_BACKOFF_MIN * 2 ** min(checkpoint.failures, 16))
+    delay = round(delay * random.uniform(0.75, 1))
+
+    checkpoint.failures += 1
+    checkpoint.next_attempt = timezone.now() + timedelta(seconds=delay)
+    checkpoint.error = error
+    checkpoint.save()
+
+    return delay
+
+
+def get_due_sensors(sensor_ids=None):
+    """
+    List the sensors to sync, skipping the sensors waiting after a failure unless they are asked for explicitly.
+
+    :param sensor_ids: Optional list of the IDs of the sensors to sync, every sensor by default.
+    :return: A list of (sensor ID, IP address) tuples.
+    """
+    close_old_connections()
+    if sensor_ids:
+        sensors = Sensor.objects.filter(id__in=sensor_ids)
+    else:
+        sensors = Sensor.objects.exclude(synccheckpoint__next_attempt__gt=timezone.now())
+
+    return list(sensors.order_by('id').values_list('id', 'ip_address'))
+
+
+"""
+WORKER
+"""
+
+
+class SensorSyncWorker:
+    """
+    Pull the new spectrums of the sensors into the central database.
+
+    Each round walks the sensors and pulls, from SYNC_CONCURRENCY sensors at a time, the spectrums after the
+    checkpoint of each sensor, batch after batch until it is up to date. The sensor requests run on the event loop,
+    the database work on a thread pool of the same size. A failing sensor is skipped for a delay growing with its
+    consecutive failures, without holding up the others.
+    """
+
+    def __init__(self, sensor_ids=None, concurrency=SYNC_CONCURRENCY, interval=SYNC_INTERVAL, log=None):
+        self.sensor_ids = sensor_ids
+        self.concurrency = concurrency
+        self.interval = interval
+        self.log = log or (lambda message: None)
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='sensor-sync')
+        self.token = None
+
+    async def database(self, function, *args):
+        """
+        Run a database function on the thread pool of the worker.
+
+        :param function: The function.
+        :param args: Arguments of the function.
+        :return: The result of the function.
+        """
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def sync_sensor(self, sensor_id, host, semaphore):
+        """
+        Pull the spectrums of a sensor after its checkpoint until it is up to date, recording a failure otherwise.
+
+        :param sensor_id: The ID of the sensor.
+        :param host: IP address of the sensor.
+        :param semaphore: Semaphore bounding the sensors synced at the same time.
+        :return: Whether the sensor is up to date.
+        """
+        async with semaphore:
+            headers = {'Accept': f'{BINARY_CONTENT_TYPE}, application/json'}
+            if self.token is not None:
+                headers['Authorization'] = f'Bearer {self.token}'
+
+            try:
+                checkpoint = await self.database(get_checkpoint, sensor_id)
+                after_id = checkpoint.last_spectrum_id
+                pulled = 0
+
+                while True:
+                    query = urlencode({'after_id': after_id, 'limit': SYNC_BATCH_SIZE})
+                    status, answer_headers, body = await http_get(
+                        host, settings.SENSOR_PORT, f'{SENSOR_SPECTRUMS_PATH}?{query}', headers, SYNC_TIMEOUT
+                    )
+                    if status != 200:
+                        raise ValueError(f"Sensor answered {status}")
+
+                    columns, wavelengths, values = parse_batch(answer_headers.get('content-type', ''), body)
+                    if not columns['id']:
+                        break
+
+                    after_id = await self.database(store_batch, sensor_id, after_id, columns, wavelengths, values)
+                    pulled += len(columns['id'])
+                    if len(columns['id']) < SYNC_BATCH_SIZE:
+                        break
+
+                await self.database(record_success, sensor_id)
+                self.log(f'Sensor {sensor_id}: {pulled} spectrums synced, up to spectrum {after_id}')
+
+                return True
+
+            except Exception as e:
+                error = str(e) or e.__class__.__name__
+                delay = await self.database(record_failure, sensor_id, error)
+                self.log(f'Sensor {sensor_id}: sync failed ({error}), next attempt in {delay} s')
+
+                return False
+
+    async def run_round(self):
+        """
+        Sync every due sensor once.
+
+        :return: A tuple containing the number of sensors synced up to date and the number of failed ones.
+        """
+        self.token = await self.database(get_sensor_token)
+        sensors = await self.database(get_due_sensors, self.sensor_ids)
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+        synced = await asyncio.gather(*(self.sync_sensor(sensor_id, host, semaphore) for sensor_id, host in sensors))
+
+        return sum(synced), len(synced) - sum(synced)
+
+    async def run(self, once=False):
+        """
+        Sync the sensors round after round, one round every `interval` seconds.
+
+        :param once: Whether to stop after the first round.
+        :return: The result of the last round, as returned by `run_round`.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                start = loop.time()
+                result = await self.run_round()
+                if once:
+                    return result
+                await asyncio.sleep(max(0.0, self.interval - (loop.time() - start)))
+        finally:
+            self.executor.shutdown(wait=True)
@@ -0,0 +1,136 @@
+import numpy as np
+from django.db import connection, transaction
+from rest_framework.parsers import BaseParser
+
+from pFIONA_api.analysis.binary_payload import decode_payload
+from pFIONA_api.analysis.negotiation import BINARY_CONTENT_TYPE
+from pFIONA_api.analysis.spectrum_values import get_or_create_wavelength_axis
+from pFIONA_api.sensor_import import SENSOR_ID_RANGE, SPECTRUM_COLUMNS, copy_rows, copy_packed_values, \
+    create_staging_tables, get_spectrum_type_ids, global_id, invalidate_deployments, merge_staging
+from pFIONA_sensors.models import Sensor, Spectrum
+
+# Metadata columns of a pushed batch, one value per spectrum
+INGEST_COLUMNS = ['id', 'time_id', 'timestamp', 'spectrumtype', 'cycle', 'deployment']
+
+# Maximum number of spectrums in a pushed batch
+MAX_INGEST_SPECTRUMS = 10000
+
+
+class SpectrumPayloadParser(BaseParser):
+    """
+    Parser of the binary spectrum payloads pushed by the sensors.
+
+    The payload has the layout of the binary spectrum payloads served by the API: its header holds the sensor_id
+    and the metadata columns, followed by the shared `wavelengths` axis and the (spectrums x wavelengths) `values`
+    matrix.
+    """
+    media_type = BINARY_CONTENT_TYPE
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        header, arrays = decode_payload(stream.read() if stream is not None else b'')
+
+        return dict(header, **arrays)
+
+
+def get_high_water_mark(sensor_id):
+    """
+    Retrieve the last spectrum of a sensor stored in the central database.
+
+    :param sensor_id: The ID of the sensor.
+    :return: A dictionary containing the ID of the last spectrum in the sensor database and its timestamp, the ID
+             is 0 and the timestamp None if no spectrum is stored.
+    """
+    offset = sensor_id * SENSOR_ID_RANGE
+    last = Spectrum.objects.filter(id__gte=offset, id__lt=offset + SENSOR_ID_RANGE).order_by('-id') \
+        .values_list('id', 'pfiona_time__timestamp').first()
+
+    return {'id': last[0] - offset, 'timestamp': last[1]} if last is not None else {'id': 0, 'timestamp': None}
+
+
+def validate_batch(columns, wavelengths, values):
+    """
+    Validate a batch of spectrums sharing a wavelength axis.
+
+    :param columns: Dictionary of the metadata columns, one list per column of INGEST_COLUMNS.
+    :param wavelengths: List or array of the wavelengths, in ascending order.
+    :param values: List of value lists or (spectrums x wavelengths) array.
+    :return: A tuple containing the wavelengths and the values as float64 arrays.
+    """
+    if not isinstance(columns, dict):
+        raise ValueError("Missing columns parameter")
+    for name in INGEST_COLUMNS:
+        if not isinstance(columns.get(name), list):
+            raise ValueError(f"Missing {name} column")
+
+    count = len(columns['id'])
+    if count > MAX_INGEST_SPECTRUMS:
+        raise ValueError(f"Too many spectrums, a batch holds at most {MAX_INGEST_SPECTRUMS}")
+    if any(len(columns[name]) != count for name in INGEST_COLUMNS):
+        raise ValueError("Columns must have the same length")
+
+    try:
+        wavelengths = np.asarray(wavelengths, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(count, -1) if count else np.zeros((0, 0))
+    except (TypeError, ValueError):
+        raise ValueError("Invalid wavelengths or values")
+    if wavelengths.ndim != 1 or len(wavelengths) == 0 or not np.all(np.diff(wavelengths) > 0):
+        raise ValueError("Wavelengths must be a non-empty list in ascending order")
+    if count and values.shape[1] != len(wavelengths):
+        raise ValueError("Each spectrum must have one value per wavelength")
+
+    return wavelengths, values
+
+
+def ingest_spectrums(sensor_id, columns, wavelengths, values):
+    """
+    Store a batch of spectrums pushed by a sensor, sharing one wavelength axis.
+
+    The batch is written in a single transaction: times, spectrums and values are copied into the staging tables of
+    the SQLite imports and merged the same way, so pushing the same batch again changes nothing. Local IDs of the
+    sensor are placed in its ID range.
+
+    :param sensor_id: The ID of the sensor.
+    :param columns: Dictionary of the metadata columns, one list per column of INGEST_COLUMNS.
+    :param wavelengths: List or array of the wavelengths, in ascending order.
+    :param values: List of value lists or (spectrums x wavelengths) array.
+    :return: A dictionary containing the number of spectrums received, of spectrums inserted or updated, of
+             spectrum values inserted, the list of the deployments which changed and the high-water mark.
+    """
+    if not Sensor.objects.filter(id=sensor_id).exists():
+        raise ValueError("Sensor not found")
+
+    wavelengths, values = validate_batch(columns, wavelengths, values)
+    try:
+        spectrum_ids = [global_id(sensor_id, int(spectrum_id)) for spectrum_id in columns['id']]
+        time_ids = [global_id(sensor_id, int(time_id)) for time_id in columns['time_id']]
+        timestamps = [int(timestamp) for timestamp in columns['timestamp']]
+        cycles = [int(cycle) if cycle is not None else None for cycle in columns['cycle']]
+        spectrum_deployments = [int(deployment) if deployment is not None else None
+                                for deployment in columns['deployment']]
+    except (TypeError, ValueError, OverflowError):
+        raise ValueError("IDs, timestamps, cycles and deployments must be integers")
+
+    with transaction.atomic(), connection.cursor() as cursor:
+        create_staging_tables(cursor)
+        types = get_spectrum_type_ids(str(spectrum_type) for spectrum_type in columns['spectrumtype'])
+        axis_id = get_or_create_wavelength_axis(wavelengths.tolist())
+
+        # Copy the batch into the staging tables, then merge it
+        copy_rows(cursor, 'import_time', ['id', 'timestamp'], zip(time_ids, timestamps))
+        copy_rows(cursor, 'import_spectrum', SPECTRUM_COLUMNS, zip(
+            spectrum_ids, time_ids, (types[str(spectrum_type)] for spectrum_type in columns['spectrumtype']),
+            cycles, spectrum_deployments
+        ))
+        if spectrum_ids:
+            copy_packed_values(cursor, np.asarray(spectrum_ids, dtype=np.int64), axis_id, values)
+
+        merged, inserted, deployments = merge_staging(cursor, sensor_id)
+        invalidate_deployments(sensor_id, deployments)
+
+    return {
+        'spectrums': len(spectrum_ids),
+        'spectrums_merged': merged,
+        'values_inserted': inserted,
+        'deployments': deployments,
+        'high_water_mark': get_high_water_mark(sensor_id),
+    }
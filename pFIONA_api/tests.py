@@ -1,3 +1,672 @@
-from django.test import TestCase
+import json
+import struct
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+import pFIONA_api.queries as q
+from pFIONA_api.analysis.binary_payload import decode_payload
+from pFIONA_api.analysis.concentration_store import read_concentrations, write_concentrations
+from pFIONA_api.analysis.deployment_catalog import deployment_catalog_scope, resolve_deployment
+from pFIONA_api.analysis.deployment_stream import ndjson_lines
+from pFIONA_api.analysis.formula import absorbance, absorbance_batch, linear_regression_batch
+from pFIONA_api.analysis.spectrum_finder import fetch_spectrum_block, get_concentration_in_deployment, \
+    get_dark_reference_in_cycle_full_info, get_only_wavelength_monitored_through_time_in_cycle_full_info, \
+    get_spectrums_in_cycle_full_info, load_deployment_absorbance
+from pFIONA_api.events import EventBroadcaster
+from pFIONA_api.id_allocator import allocate_id, allocate_ids, get_id_range
+from pFIONA_api.sensor_import import CopySource, copy_value, get_spectrum_type_ids, global_id, invalidate_deployments, \
+    SENSOR_ID_RANGE
+from pFIONA_api.sensor_state import get_sensor_push_token
+from pFIONA_api.sensor_sync import parse_batch, record_failure
+from pFIONA_api.spectrum_ingest import validate_batch
+from pFIONA_auth.serializers import CustomTokenObtainPairSerializer
+from pFIONA_sensors.models import Absorbance, AbsorbanceCycle, Concentration, Deployment, IdCounter, Reaction, \
+    Reagent, Sensor, Spectrum, SpectrumType, Step, SyncCheckpoint, Time, Value, WavelengthMonitored
+
+
+def spectrum_payload(values, offset=None):
+    """
+    Build the binary payload of a batch of two spectrums of sensor 1 over three wavelengths.
+
+    :param values: (2 x 3) array of the values.
+    :param offset: Optional offset of the values array, to build a truncated payload.
+    :return: The payload.
+    """
+    wavelengths = np.array([400.0, 500.0, 600.0], dtype='<f8')
+    header = json.dumps({
+        'sensor_id': 1,
+        'columns': {'id': [1, 2]},
+        'arrays': {
+            'wavelengths': {'dtype': '<f8', 'shape': [3], 'offset': 0},
+            'values': {'dtype': '<f4', 'shape': [2, 3], 'offset': 24 if offset is None else offset},
+        },
+    }).encode('utf-8')
+
+    return struct.pack('<I', len(header)) + header + wavelengths.tobytes() + values.astype('<f4').tobytes()
+
+
+class AbsorbanceBatchTest(SimpleTestCase):
+    """
+    Check that the batched absorbance gives the same results as the scan by scan absorbance.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.ref_scans = rng.uniform(1000, 5000, (6, 50))
+        self.dark_scans = rng.uniform(0, 500, (6, 50))
+        self.sample_scans = rng.uniform(500, 5000, (6, 50))
+
+        # Row 1: division by zero gives +inf, replaced with the row minimum
+        self.sample_scans[1, 3] = self.dark_scans[1, 3]
+        # Row 2: log of zero gives -inf, and 0/0 gives NaN replaced with 0
+        self.ref_scans[2, 5] = self.dark_scans[2, 5]
+        self.ref_scans[2, 7] = self.sample_scans[2, 7] = self.dark_scans[2, 7]
+        # Row 3: negative ratio gives NaN
+        self.sample_scans[3, 10] = self.dark_scans[3, 10] - 1
+        # Row 4: no finite value, infinite values are replaced with 0
+        self.sample_scans[4] = self.dark_scans[4]
+
+    def test_matches_scalar_absorbance(self):
+        batch = absorbance_batch(self.ref_scans, self.dark_scans, self.sample_scans)
+
+        for row in range(len(self.ref_scans)):
+            expected = absorbance(self.ref_scans[row].tolist(), self.dark_scans[row].tolist(),
+                                  self.sample_scans[row].tolist())
+            np.testing.assert_allclose(batch[row], expected, rtol=0, atol=1e-12)
+
+    def test_sizes_ignore_padding(self):
+        ref_scans = self.ref_scans.copy()
+        dark_scans = self.dark_scans.copy()
+        sample_scans = self.sample_scans.copy()
+        ref_scans[1, 40:] = dark_scans[1, 40:] = sample_scans[1, 40:] = np.nan
+
+        batch = absorbance_batch(ref_scans, dark_scans, sample_scans, sizes=[50, 40, 50, 50, 50, 50])
+
+        expected = absorbance(self.ref_scans[1, :40].tolist(), self.dark_scans[1, :40].tolist(),
+                              self.sample_scans[1, :40].tolist())
+        np.testing.assert_allclose(batch[1, :40], expected, rtol=0, atol=1e-12)
+        self.assertTrue(np.isnan(batch[1, 40:]).all())
+
+    def test_empty_batch(self):
+        batch = absorbance_batch(np.empty((0, 50)), np.empty((0, 50)), np.empty((0, 50)))
+
+        self.assertEqual(batch.shape, (0, 50))
+
+
+class LinearRegressionBatchTest(SimpleTestCase):
+    """
+    Check that the batched closed-form regression gives the same lines as `np.polyfit`.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.x = np.arange(5) * 0.25 * 3.0
+        self.y = 0.2 * self.x + rng.normal(0.01, 0.05, (4, 3, 5))
+        self.mask = np.ones((4, 3, 5), dtype=bool)
+        self.mask[1, 2, 0] = self.mask[2, 0, 3] = False
+
+    def test_matches_polyfit(self):
+        slopes, intercepts, r_squared, points = linear_regression_batch(self.x, self.y, self.mask)
+
+        for index in np.ndindex(*self.y.shape[:-1]):
+            x, y = self.x[self.mask[index]], self.y[index][self.mask[index]]
+            slope, intercept = np.polyfit(x, y, 1)
+            residuals = y - (slope * x + intercept)
+
+            np.testing.assert_allclose([slopes[index], intercepts[index]], [slope, intercept], rtol=1e-9, atol=1e-12)
+            self.assertAlmostEqual(r_squared[index], 1 - residuals.dot(residuals) / ((y - y.mean()) ** 2).sum())
+            self.assertEqual(points[index], len(x))
+
+    def test_degenerate_lines(self):
+        mask = np.zeros(5, dtype=bool)
+        mask[2] = True
+
+        slopes, intercepts, r_squared, points = linear_regression_batch(self.x, np.ones(5), mask)
+
+        self.assertTrue(np.isnan(slopes) and np.isnan(intercepts) and np.isnan(r_squared))
+        self.assertEqual(points, 1)
+
+
+class ConcentrationBaselineTest(TestCase):
+    """
+    Check the concentrations of a synthetic deployment against the ones of the cycle by cycle implementation which
+    preceded the vectorized engine, with standard dilutions fitted by `np.polyfit`.
+    """
+
+    # Concentrations computed by the cycle by cycle implementation on the same deployment
+    BASELINE = {
+        1: {520.0: 0.9125803250539136, 540.0: 0.9051926778258332},
+        2: {520.0: 1.127987127943155, 540.0: 1.0732489285221207},
+        3: {520.0: 1.2990456435652924, 540.0: 1.33960036620876},
+        4: {520.0: 0.6997039582493692, 540.0: 0.7750652660576545},
+        5: {520.0: 1.4931529800468388, 540.0: 1.4686472769333931},
+    }
+
+    def setUp(self):
+        self.timestamp = self.create_deployment()
+
+    def create_deployment(self):
+        """
+        Create a deployment of a NO2 reaction with standard dilutions in cycles 1 and 4, which have different
+        calibration lines, only samples in cycles 2 and 5, and a blank, a standard and samples in cycle 3.
+
+        :return: A timestamp after the last spectrum of the deployment.
+        """
+        rng = np.random.default_rng(12)
+        wavelengths = [518.632, 544.065, 696.614]
+        dark, reference = 1000.0, 50000.0
+
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+        standard = Reagent.objects.create(id=10000001, name='Standard', pfiona_sensor_id=1)
+        reaction = Reaction.objects.create(id=SENSOR_ID_RANGE + 1, name='NO2', standard=standard,
+                                           standard_concentration=2.0)
+        for index, wavelength in enumerate([520.0, 540.0, 700.0]):
+            WavelengthMonitored.objects.create(id=SENSOR_ID_RANGE + 1 + index, pfiona_reaction=reaction,
+                                               wavelength=wavelength)
+
+        # Absorbance of each wavelength as (slope, intercept) over the concentration, the reference one is flat
+        batches = [((0.10, 0.02), (0.07, 0.01), (0.0, 0.005)), ((0.15, 0.01), (0.05, 0.03), (0.0, 0.004))]
+        cycles = [
+            (batches[0], [(f'Standard_Dillution_{level}', level * 0.5) for level in range(5)] + [('Sample', 0.9)]),
+            (batches[0], [('Sample', 1.1)]),
+            (batches[0], [('Blank', 0.0), ('Standard', 2.0), ('Sample', 1.3)]),
+            (batches[1], [(f'Standard_Dillution_{level}', level * 0.5) for level in range(5)] + [('Sample', 0.7)]),
+            (batches[1], [('Sample', 1.5)]),
+        ]
+
+        spectrum_types = {}
+        local_id = 0
+        timestamp = 1700000000
+
+        for cycle, (lines, keys) in enumerate(cycles, start=1):
+            for key, concentration in keys:
+                for _ in range(2 if not key.startswith('Standard_Dillution') else 1):
+                    absorbances = [slope * concentration + intercept for slope, intercept in lines]
+                    scans = [('_Dark', [dark] * 3), ('_Reference', [reference] * 3)] + [
+                        (suffix, [dark + (reference - dark) * 10 ** -(a + noise) for a, noise in
+                                  zip(absorbances, rng.normal(0, 0.002, 3))])
+                        for suffix in ['', '_wavelength_monitored', '_wavelength_monitored', '_wavelength_monitored']
+                    ]
+
+                    for suffix, values in scans:
+                        name = f'NO2_{key}{suffix}'
+                        if name not in spectrum_types:
+                            spectrum_types[name] = SpectrumType.objects.create(type=name)
+
+                        local_id += 1
+                        timestamp += 7
+                        time = Time.objects.create(id=SENSOR_ID_RANGE + local_id, timestamp=timestamp)
+                        spectrum = Spectrum.objects.create(id=SENSOR_ID_RANGE + local_id, pfiona_sensor_id=1,
+                                                           pfiona_time=time,
+                                                           pfiona_spectrumtype=spectrum_types[name],
+                                                           cycle=cycle, deployment=1)
+                        Value.objects.bulk_create([
+                            Value(pfiona_spectrum=spectrum, wavelength=wavelength, value=value)
+                            for wavelength, value in zip(wavelengths, values)
+                        ])
+
+        return timestamp + 1
+
+    def test_matches_baseline(self):
+        concentrations, _ = get_concentration_in_deployment(self.timestamp, 1)
+
+        # Cycles 2 and 5 use the curves of the latest dilution cycle before them, 1 and 4
+        self.assertEqual(sorted(concentrations['NO2']), sorted(self.BASELINE))
+        for cycle, expected in self.BASELINE.items():
+            computed = concentrations['NO2'][cycle]['concentration']
+            self.assertEqual(sorted(computed), sorted(expected))
+            for wavelength, concentration in expected.items():
+                self.assertAlmostEqual(computed[wavelength], concentration, places=9)
+
+
+class CopySourceTest(SimpleTestCase):
+    """
+    Check that the rows streamed to COPY are escaped and split into chunks without losing any character.
+    """
+
+    def test_copy_values(self):
+        self.assertEqual(copy_value(None), '\\N')
+        self.assertEqual(copy_value(0.1), '0.1')
+        self.assertEqual(copy_value([1, float('nan'), float('-inf')]), '{1.0,NaN,-Infinity}')
+        self.assertEqual(copy_value('a\tb\\c\nd'), 'a\\tb\\\\c\\nd')
+
+    def test_chunks(self):
+        rows = [(row, f'type_{row}', [row * 0.5, row * 1.5]) for row in range(100)]
+        source = CopySource(rows)
+
+        chunks = []
+        while True:
+            chunk = source.read(7)
+            if not chunk:
+                break
+            self.assertLessEqual(len(chunk), 7)
+            chunks.append(chunk)
+
+        expected = ''.join(f'{row}\ttype_{row}\t{{{row * 0.5!r},{row * 1.5!r}}}\n' for row in range(100))
+        self.assertEqual(''.join(chunks), expected)
+        self.assertEqual(source.count, 100)
+
+    def test_global_ids(self):
+        self.assertEqual(global_id(3, 42), 3 * SENSOR_ID_RANGE + 42)
+        self.assertEqual(global_id(3, 3 * SENSOR_ID_RANGE + 42), 3 * SENSOR_ID_RANGE + 42)
+        with self.assertRaises(ValueError):
+            global_id(3, 4 * SENSOR_ID_RANGE + 42)
+
+
+class SpectrumPushTest(SimpleTestCase):
+    """
+    Check that pushed binary payloads are decoded into their arrays and that malformed batches are rejected.
+    """
+
+    def test_decode_payload(self):
+        values = np.array([[1.0, 2.0, 3.0], [4.0, 5.0, 6.0]])
+        header, arrays = decode_payload(spectrum_payload(values))
+
+        self.assertEqual(header, {'sensor_id': 1, 'columns': {'id': [1, 2]}})
+        self.assertEqual(arrays['wavelengths'].tolist(), [400.0, 500.0, 600.0])
+        self.assertEqual(arrays['values'].tolist(), values.tolist())
+
+    def test_decode_truncated_payload(self):
+        with self.assertRaises(ValueError):
+            decode_payload(spectrum_payload(np.zeros((2, 3)), offset=32))
+        with self.assertRaises(ValueError):
+            decode_payload(b'\x10\x00')
+
+    def test_validate_batch(self):
+        columns = {name: [1, 2] for name in ['id', 'time_id', 'timestamp', 'spectrumtype', 'cycle', 'deployment']}
+
+        wavelengths, values = validate_batch(columns, [400, 500], [[1, 2], [3, 4]])
+        self.assertEqual(values.shape, (2, 2))
+        with self.assertRaises(ValueError):
+            validate_batch(columns, [500, 400], [[1, 2], [3, 4]])
+        with self.assertRaises(ValueError):
+            validate_batch(columns, [400, 500, 600], [[1, 2], [3, 4]])
+        with self.assertRaises(ValueError):
+            validate_batch(dict(columns, cycle=[1]), [400, 500], [[1, 2], [3, 4]])
+
+
+class SpectrumTypeIdsTest(TestCase):
+    """
+    Check that the spectrum types are parsed when spectrums are written with them.
+    """
+
+    def test_types_parsed_on_write(self):
+        # Spectrum type inserted by a sensor without its structured columns
+        SpectrumType.objects.bulk_create([SpectrumType(type='NO2_Standard_Dillution_2_Dark')])
+
+        ids = get_spectrum_type_ids(['NO2_Standard_Dillution_2_Dark', 'NO2_Sample_Measure'])
+        self.assertEqual(set(ids), {'NO2_Standard_Dillution_2_Dark', 'NO2_Sample_Measure'})
+        self.assertFalse(SpectrumType.objects.filter(parsed=False).exists())
+        self.assertEqual(SpectrumType.objects.get(type='NO2_Standard_Dillution_2_Dark').scan_kind, SpectrumType.DARK)
+
+
+class SensorSpectrumTypeTest(TestCase):
+    """
+    Check that the spectrum types inserted by a sensor without their structured columns are parsed before their
+    spectrums are read.
+    """
+
+    def setUp(self):
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+
+        # Spectrum types and spectrums inserted directly by the sensor
+        names = ['NO2_Sample_Dark', 'NO2_Sample_Reference', 'NO2_Sample', 'NO2_Sample_wavelength_monitored']
+        types = SpectrumType.objects.bulk_create([SpectrumType(type=name) for name in names])
+        for local_id, spectrum_type in enumerate(types, start=1):
+            time = Time.objects.create(id=SENSOR_ID_RANGE + local_id, timestamp=1700000000 + local_id)
+            spectrum = Spectrum.objects.create(id=SENSOR_ID_RANGE + local_id, pfiona_sensor_id=1, pfiona_time=time,
+                                               pfiona_spectrumtype=spectrum_type, cycle=1, deployment=1)
+            Value.objects.bulk_create([Value(pfiona_spectrum=spectrum, wavelength=wavelength, value=100.0 * local_id)
+                                       for wavelength in (520.0, 540.0)])
+
+    def spectrum_types(self, data):
+        return sorted(spectrum['spectrumtype'] for types in data.values() for subcycles in types.values()
+                      for spectrums in subcycles.values() for spectrum in spectrums)
+
+    def test_unparsed_types_read(self):
+        self.assertEqual(SpectrumType.objects.filter(parsed=False).count(), 4)
+
+        data, _, _ = get_spectrums_in_cycle_full_info(1700000010, 1, 1)
+        self.assertEqual(self.spectrum_types(data), ['NO2_Sample', 'NO2_Sample_Dark', 'NO2_Sample_Reference'])
+        data, _, _ = get_only_wavelength_monitored_through_time_in_cycle_full_info(1700000010, 1, 1)
+        self.assertEqual(self.spectrum_types(data), ['NO2_Sample_wavelength_monitored'])
+        data, _, _ = get_dark_reference_in_cycle_full_info(1700000010, 1, 1)
+        self.assertEqual(self.spectrum_types(data), ['NO2_Sample_Dark', 'NO2_Sample_Reference'])
+
+        self.assertFalse(SpectrumType.objects.filter(parsed=False).exists())
+        self.assertEqual(Deployment.objects.get(pfiona_sensor_id=1, deployment=1).reactions, ['NO2'])
+
+
+class AbsorbanceImportTest(TestCase):
+    """
+    Check that the absorbance of the completed cycles is stored when spectrums are imported, and that the cycles
+    without any absorbance are not computed again on read.
+    """
+
+    def add_spectrum(self, local_id, cycle, spectrum_type):
+        time = Time.objects.create(id=SENSOR_ID_RANGE + local_id, timestamp=1700000000 + local_id)
+        spectrum = Spectrum.objects.create(id=SENSOR_ID_RANGE + local_id, pfiona_sensor_id=1, pfiona_time=time,
+                                           pfiona_spectrumtype=self.spectrum_types[spectrum_type], cycle=cycle,
+                                           deployment=1)
+        Value.objects.bulk_create([Value(pfiona_spectrum=spectrum, wavelength=wavelength, value=value)
+                                   for wavelength, value in ((520.0, 1000.0 * local_id), (540.0, 900.0 * local_id))])
+
+    def setUp(self):
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+        self.spectrum_types = {name: SpectrumType.objects.create(type=name)
+                               for name in ('NO2_Sample_Dark', 'NO2_Sample_Reference', 'NO2_Sample')}
+
+        # Cycle 2 has no reference nor sample scan, cycle 3 is in progress
+        for local_id, (cycle, spectrum_type) in enumerate([
+            (1, 'NO2_Sample_Dark'), (1, 'NO2_Sample_Reference'), (1, 'NO2_Sample'), (2, 'NO2_Sample_Dark'),
+            (3, 'NO2_Sample_Dark'), (3, 'NO2_Sample_Reference'), (3, 'NO2_Sample')
+        ], start=1):
+            self.add_spectrum(local_id, cycle, spectrum_type)
+
+    def test_stored_on_import(self):
+        invalidate_deployments(1, [1])
+
+        self.assertEqual(set(Absorbance.objects.values_list('cycle', flat=True)), {1})
+        self.assertEqual(set(AbsorbanceCycle.objects.values_list('cycle', flat=True)), {1, 2})
+
+        # Only the cycle in progress is computed from the raw spectrums
+        with mock.patch('pFIONA_api.analysis.spectrum_finder.fetch_spectrum_block',
+                        wraps=fetch_spectrum_block) as fetch:
+            _, _, block = load_deployment_absorbance(1700000010, 1)
+        fetch.assert_called_once_with(1, 1, [3], False)
+        self.assertEqual(block.cycles.tolist(), [1, 3])
+
+        # Importing the cycle again stores its absorbance again
+        invalidate_deployments(1, [1])
+        self.assertEqual(set(AbsorbanceCycle.objects.values_list('cycle', flat=True)), {1, 2})
+
+
+class SpectrumPushPermissionTest(TestCase):
+    """
+    Check that only the members of the ADMIN group may push spectrums, with a token issued for the sensor.
+    """
+
+    def push(self, token, sensor_id=1):
+        return self.client.post(reverse('api_push_spectrums'), json.dumps({'sensor_id': sensor_id, 'columns': {}}),
+                                content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+
+    def test_push_requires_admin(self):
+        user = User.objects.create_user('operator', password='operator')
+        self.assertEqual(self.push(get_sensor_push_token(user, 1)).status_code, 403)
+
+        user.groups.add(Group.objects.get_or_create(name='ADMIN')[0])
+        response = self.push(get_sensor_push_token(user, 1))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "Sensor not found")
+
+    def test_push_requires_sensor_token(self):
+        user = User.objects.create_user('operator', password='operator')
+        user.groups.add(Group.objects.get_or_create(name='ADMIN')[0])
+
+        # Tokens issued to a user or to another sensor cannot push the spectrums of the sensor
+        for token in (CustomTokenObtainPairSerializer.get_token(user), get_sensor_push_token(user, 2)):
+            response = self.push(token)
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.json()['message'], "Token not issued to sensor 1")
+
+        # The refreshed access tokens stay bound to the sensor
+        token = get_sensor_push_token(user, 2)
+        response = self.client.post(reverse('refresh_jwt_token'), json.dumps({'refresh': str(token)}),
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        access_token = response.json()['access']
+        response = self.client.post(reverse('api_push_spectrums'), json.dumps({'sensor_id': 1, 'columns': {}}),
+                                    content_type='application/json', HTTP_AUTHORIZATION=f'Bearer {access_token}')
+        self.assertEqual(response.status_code, 403)
+
+    def test_push_requires_token(self):
+        response = self.client.post(reverse('api_push_spectrums'), '{}', content_type='application/json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class SensorSyncTest(SimpleTestCase):
+    """
+    Check that the batches answered by the sensors are decoded from JSON or binary and rejected when malformed.
+    """
+
+    def test_parse_batch(self):
+        body = json.dumps({'columns': {'id': [7]}, 'wavelengths': [400.0], 'values': [[1.5]]}).encode('utf-8')
+        self.assertEqual(parse_batch('application/json; charset=utf-8', body), ({'id': [7]}, [400.0], [[1.5]]))
+
+        body = spectrum_payload(np.ones((2, 3)))
+        columns, wavelengths, values = parse_batch('application/vnd.pfiona.spectrums', body)
+        self.assertEqual(columns, {'id': [1, 2]})
+        self.assertEqual(values.shape, (2, 3))
+
+    def test_invalid_batch(self):
+        with self.assertRaises(ValueError):
+            parse_batch('application/json', b'<html></html>')
+        with self.assertRaises(ValueError):
+            parse_batch('application/json', b'{"columns": {}}')
+
+
+class SyncFailureTest(TestCase):
+    """
+    Check that a sensor failing its first sync keeps starting after the last spectrum already stored.
+    """
+
+    def setUp(self):
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+        time = Time.objects.create(id=SENSOR_ID_RANGE + 5, timestamp=1700000005)
+        Spectrum.objects.create(id=SENSOR_ID_RANGE + 5, pfiona_sensor_id=1, pfiona_time=time, cycle=1, deployment=1,
+                                pfiona_spectrumtype=SpectrumType.objects.create(type='NO2_Sample'))
+
+    # The sync closes the connections the way a request does, which would end the test transaction
+    @mock.patch('pFIONA_api.sensor_sync.close_old_connections')
+    def test_failure_seeds_checkpoint(self, close_old_connections):
+        record_failure(1, "Sensor answered 500")
+
+        checkpoint = SyncCheckpoint.objects.get(pfiona_sensor_id=1)
+        self.assertEqual((checkpoint.last_spectrum_id, checkpoint.last_timestamp), (5, 1700000005))
+        self.assertEqual((checkpoint.failures, checkpoint.error), (1, "Sensor answered 500"))
+
+
+class IdRangeTest(SimpleTestCase):
+    """
+    Check the ID ranges reserved for each sensor, reagents using a narrower one than the other tables.
+    """
+
+    def test_id_ranges(self):
+        self.assertEqual(get_id_range(Reaction, 2), (2 * SENSOR_ID_RANGE, 3 * SENSOR_ID_RANGE))
+        self.assertEqual(get_id_range(Reagent, 2), (20000000, 30000000))
+        self.assertEqual(get_id_range(Sensor), (0, None))
+
+
+class IdAllocatorTest(TestCase):
+    """
+    Check that the IDs are reserved in blocks from a counter per sensor and table, after the rows already stored.
+    """
+
+    def setUp(self):
+        for sensor_id in (1, 2):
+            Sensor.objects.create(id=sensor_id, ip_address='127.0.0.1')
+
+    def test_counter_created_on_first_use(self):
+        self.assertFalse(IdCounter.objects.exists())
+        self.assertEqual(allocate_id(Reagent, 1), 10000001)
+        self.assertEqual(IdCounter.objects.get(sensor_id=1, table='pfiona_reagent').next_id, 10000002)
+
+    def test_block_reservation(self):
+        self.assertEqual(allocate_ids(Reagent, 1, 3), range(10000001, 10000004))
+        self.assertEqual(allocate_ids(Reagent, 1, 2), range(10000004, 10000006))
+        self.assertEqual(allocate_ids(Reagent, 2, 2), range(20000001, 20000003))
+        self.assertEqual(allocate_ids(Reagent, 1, 0), range(0))
+
+    def test_continues_after_existing_rows(self):
+        Reagent.objects.create(id=10000007, name='Standard', pfiona_sensor_id=1)
+        Reagent.objects.create(id=20000009, name='Standard', pfiona_sensor_id=2)
+
+        self.assertEqual(allocate_id(Reagent, 1), 10000008)
+        self.assertEqual(allocate_id(Sensor), 3)
+
+    def test_range_overflow(self):
+        Reagent.objects.create(id=19999998, name='Standard', pfiona_sensor_id=1)
+
+        with self.assertRaises(ValueError):
+            allocate_ids(Reagent, 1, 2)
+        self.assertEqual(allocate_id(Reagent, 1), 19999999)
+        with self.assertRaises(ValueError):
+            allocate_id(Reagent, 1)
+
+    def test_imported_tables_never_allocated(self):
+        # Their IDs come from the sensor databases, without advancing any counter
+        for model in (Spectrum, Time):
+            with self.assertRaises(ValueError):
+                allocate_id(model, 1)
+
+
+class EventBroadcasterTest(TestCase):
+    """
+    Check that the new cycles of every sensor are found, whatever the ID ranges of the sensors.
+    """
+
+    def add_spectrum(self, sensor_id, local_id, cycle):
+        spectrum_id = sensor_id * SENSOR_ID_RANGE + local_id
+        time = Time.objects.create(id=spectrum_id, timestamp=1700000000 + local_id)
+        Spectrum.objects.create(id=spectrum_id, pfiona_sensor_id=sensor_id, pfiona_time=time,
+                                pfiona_spectrumtype=self.spectrum_type, cycle=cycle, deployment=1)
+
+    def setUp(self):
+        self.spectrum_type = SpectrumType.objects.create(type='NO2_Sample_Measure')
+        for sensor_id in (1, 2):
+            Sensor.objects.create(id=sensor_id, ip_address='127.0.0.1')
+        self.add_spectrum(1, 1, 1)
+        self.add_spectrum(2, 1, 1)
+
+    # The broadcaster closes the connections the way a request does, which would end the test transaction
+    @mock.patch('pFIONA_api.events.close_old_connections')
+    def test_new_cycle_of_each_sensor(self, close_old_connections):
+        broadcaster = EventBroadcaster()
+        broadcaster.snapshot({1, 2})
+
+        # The new spectrum of sensor 1 has a lower ID than the last one of sensor 2
+        self.add_spectrum(1, 2, 2)
+        events = [event for event in broadcaster.collect({1, 2}) if event[1] == 'cycle']
+        self.assertEqual(events, [(1, 'cycle', {'sensor_id': 1, 'deployment': 1, 'cycle': 2})])
+
+        self.add_spectrum(2, 2, 2)
+        events = [event for event in broadcaster.collect({1, 2}) if event[1] == 'cycle']
+        self.assertEqual(events, [(2, 'cycle', {'sensor_id': 2, 'deployment': 1, 'cycle': 2})])
+        self.assertEqual(broadcaster.collect({1, 2}), [])
+
+
+class ConcentrationStoreTest(TestCase):
+    """
+    Check that a concentration, or a marker row without reaction or wavelength, is stored only once.
+    """
+
+    def setUp(self):
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+
+    def test_write_over_concurrent_rows(self):
+        # Rows stored by a concurrent read between the delete and the insert
+        Concentration.objects.bulk_create([
+            Concentration(pfiona_sensor_id=1, deployment=1, reaction='NO2', cycle=1, wavelength=540, concentration=0),
+            Concentration(pfiona_sensor_id=1, deployment=1, cycle=2),
+        ])
+        with mock.patch('django.db.models.query.QuerySet.delete'):
+            write_concentrations(1, 1, {'NO2': {1: {540.0: 2.5}}}, [1, 2])
+
+        self.assertEqual(Concentration.objects.count(), 2)
+        self.assertEqual(read_concentrations(1, 1), ({'NO2': {1: {540.0: 2.5}}}, {1, 2}, set()))
+
+    def test_duplicate_marker_rejected(self):
+        Concentration.objects.create(pfiona_sensor_id=1, deployment=1, cycle=1)
+        with self.assertRaises(IntegrityError):
+            Concentration.objects.create(pfiona_sensor_id=1, deployment=1, cycle=1)
+
+
+class SaveReactionTest(TestCase):
+    """
+    Check that a reaction is saved with the same number of queries whatever its number of steps.
+    """
+
+    def setUp(self):
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+        Reagent.objects.create(id=10000001, name='Standard', pfiona_sensor_id=1)
+
+    def data(self, name, steps):
+        return {
+            'name': name, 'steps': [['10000001', '5'] if step % 2 == 0 else ['w', '3'] for step in range(steps)],
+            'standard_reagent_id': '10000001', 'standard_concentration': '2', 'volume_of_mixture': '10',
+            'volume_to_push_to_flow_cell': '5', 'monitored_wavelength': '540;880', 'number_of_blank': '1',
+            'number_of_sample': '1', 'number_of_standard': '1', 'multi_standard': False, 'multi_standard_time': '0',
+            'reaction_time': '30', 'crm': False, 'crm_time': '7',
+        }
+
+    def test_constant_queries(self):
+        # The first reaction of a sensor also creates its ID counters
+        q.save_reaction(self.data('First', 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            reaction = q.save_reaction(self.data('One step', 1))
+        with self.assertNumQueries(len(queries)):
+            q.save_reaction(self.data('Twenty steps', 20))
+
+        with CaptureQueriesContext(connection) as queries:
+            q.save_reaction(self.data('One step', 1), reaction_id=reaction.id)
+        with self.assertNumQueries(len(queries)):
+            q.save_reaction(self.data('One step', 20), reaction_id=reaction.id)
+
+        self.assertEqual(reaction.standard.pfiona_sensor_id, 1)
+        self.assertEqual(list(Step.objects.filter(pfiona_reaction_id=reaction.id).values_list('order', flat=True)),
+                         list(range(20)))
+
+
+class DeploymentCatalogScopeTest(TestCase):
+    """
+    Check that the deployment catalog is read once per scope, and again on every use outside of any scope.
+    """
+
+    def setUp(self):
+        self.spectrum_type = SpectrumType.objects.create(type='NO2_Sample_Measure')
+        Sensor.objects.create(id=1, ip_address='127.0.0.1')
+        self.add_deployment(1, 1000)
+
+    def add_deployment(self, deployment, timestamp):
+        spectrum_id = SENSOR_ID_RANGE + deployment
+        time = Time.objects.create(id=spectrum_id, timestamp=timestamp)
+        Spectrum.objects.create(id=spectrum_id, pfiona_sensor_id=1, pfiona_time=time,
+                                pfiona_spectrumtype=self.spectrum_type, cycle=1, deployment=deployment)
+
+    def test_scope(self):
+        with deployment_catalog_scope():
+            self.assertEqual(resolve_deployment(1, 2500), 1)
+            self.add_deployment(2, 2000)
+            with deployment_catalog_scope():
+                self.assertEqual(resolve_deployment(1, 2500), 1)
+
+        # Outside of any scope, the new deployment is found right away
+        self.assertEqual(resolve_deployment(1, 2500), 2)
+        self.assertEqual(resolve_deployment(1, 2000.5), 2)
+        self.add_deployment(3, 2200)
+        self.assertEqual(resolve_deployment(1, 2500), 3)
+
+    def test_stream_scope(self):
+        def records():
+            yield resolve_deployment(1, 2500)
+            self.add_deployment(2, 2000)
+            yield resolve_deployment(1, 2500)
+
+        # The records of a stream are generated outside of the scope of the request
+        self.assertEqual(list(ndjson_lines(records())), ['1\n', '1\n'])
+
+    def test_invalid_timestamp(self):
+        user = User.objects.create_user('operator', password='operator')
+        self.client.force_login(user)
+
+        response = self.client.get(reverse('api_get_cycle_count'), {'sensor_id': 1, 'timestamp': 'now'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()['message'], "Invalid timestamp parameter")
@@ -26,6 +26,21 @@ urlpatterns = [
     path('get_concentration_for_deployment',
          views.api_get_concentration_for_deployment,
          name='api_get_concentration_for_deployment'),
+    path('batch',
+         views.api_batch,
+         name='api_batch'),
+    path('get_analysis_cache_stats',
+         views.api_get_analysis_cache_stats,
+         name='api_get_analysis_cache_stats'),
+    path('import_sensor_database',
+         views.api_import_sensor_database,
+         name='api_import_sensor_database'),
+    path('get_import_progress',
+         views.api_get_import_progress,
+         name='api_get_import_progress'),
+    path('push_spectrums',
+         views.api_push_spectrums,
+         name='api_push_spectrums'),
     path('export_raw_spectra_csv/',
          views.export_raw_spectra_csv,
          name='export_raw_spectra_csv'),
@@ -89,6 +104,15 @@ urlpatterns = [
     path('set_sensor_general_settings',
          views.api_set_sensor_general_settings,
          name='api_set_sensor_general_settings'),
+    path('get_sensor_status',
+         views.api_get_sensor_status,
+         name='api_get_sensor_status'),
+    path('sensor_events',
+         views.api_sensor_events,
+         name='api_sensor_events'),
+    path('get_sensor_state',
+         views.api_get_sensor_state,
+         name='api_get_sensor_state'),
     path('get_last_states',
          views.api_get_last_states,
          name='api_get_last_states'),
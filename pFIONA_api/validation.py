@@ -8,7 +8,18 @@ from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
-import pFIONA_api.queries as q
+
+def validate_timestamp(timestamp):
+    """
+    Validate a timestamp parameter of a request.
+
+    :param timestamp: The timestamp, as received.
+    :return: The timestamp as an integer.
+    """
+    try:
+        return int(timestamp)
+    except (TypeError, ValueError):
+        raise ValueError("Invalid timestamp parameter")
 
 
 def validate_reaction_data(data):
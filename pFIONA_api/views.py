@@ -1,19 +1,44 @@
 import ast
 import json
+import os
+import tempfile
 
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ValidationError
-from django.http import JsonResponse, HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.utils.cache import patch_cache_control
 from django.views.decorators.http import require_http_methods
+from rest_framework.decorators import api_view, authentication_classes, permission_classes, parser_classes
+from rest_framework.exceptions import ParseError, PermissionDenied
+from rest_framework.parsers import JSONParser
+from rest_framework_simplejwt.authentication import JWTAuthentication
 
 import pFIONA_api.queries as q
+from pFIONA_api.analysis.batch import run_batch
+from pFIONA_api.analysis.binary_payload import binary_response
+from pFIONA_api.analysis.calibration_store import delete_calibrations
+from pFIONA_api.analysis.concentration_store import invalidate_concentrations
+from pFIONA_api.analysis.conditional import deployment_condition, content_conditional_response
+from pFIONA_api.analysis.deployment_catalog import touch_deployment_catalog
+from pFIONA_api.analysis.deployment_stream import ndjson_response, stream_spectrums_in_deployment, \
+    stream_monitored_wavelength_values_in_deployment, stream_concentration_in_deployment
 from pFIONA_api.analysis.export_csv import export_raw_data, export_absorbance_data, export_concentration_data
+from pFIONA_api.analysis.negotiation import requested_format, negotiated
+from pFIONA_api.analysis.result_cache import get_cache_stats
 from pFIONA_api.analysis.spectrum_finder import *
-from pFIONA_api.validation import validate_reaction_data
-from pFIONA_sensors.decorators import admin_required
+from pFIONA_api.events import stream_sensor_events, snapshot_sensor_events
+from pFIONA_api.sensor_import import start_import, get_import_progress
+from pFIONA_api.sensor_state import get_sensor_states, SENSOR_CLAIM
+from pFIONA_api.spectrum_ingest import SpectrumPayloadParser, ingest_spectrums
+from pFIONA_api.validation import validate_timestamp
+from pFIONA_sensors.decorators import admin_required, AdminRequired
 from pFIONA_sensors.models import Sensor
 
+# Seconds the status of a sensor may be reused by the browser before being revalidated
+STATUS_MAX_AGE = 2
+
 
 @login_required()
 @csrf_exempt
@@ -95,42 +120,11 @@ def api_add_reaction(request):
         data = json.loads(request.body)
         print(data)
 
-        # Validate the data
-        validate_reaction_data(data)
-
-        # Parse monitored wavelengths
-        elements = data['monitored_wavelength'].split(';')
-        wavelength_monitored = list(set([int(e) for e in elements if e]))
-
-        # Create the reaction
-        reaction = q.create_reaction(
-            data['name'],
-            int(data['standard_reagent_id']),
-            float(data['standard_concentration']),
-            float(data['volume_of_mixture']),
-            float(data['volume_to_push_to_flow_cell']),
-            int(data['number_of_blank']),
-            int(data['number_of_sample']),
-            int(data['number_of_standard']),
-            bool(data['multi_standard']),
-            int(data['multi_standard_time']),
-            int(data['reaction_time']),
-            bool(data['crm']),
-            int(data['crm_time'])
-        )
-
-        # Create the steps
-        for key, step in enumerate(data['steps']):
-            if step[0] == "w":
-                # Wait Time
-                q.create_step(None, reaction.id, step[1], key)
-            else:
-                # Reagent
-                q.create_step(step[0], reaction.id, step[1], key)
+        # Create the reaction with its steps and monitored wavelengths
+        reaction = q.save_reaction(data)
 
-        # Create monitored wavelengths
-        for wavelength in wavelength_monitored:
-            q.create_monitored_wavelength(reaction_id=reaction.id, wavelength=wavelength)
+        # Mark the deployments of the sensor as modified, their concentrations may now include the reaction
+        touch_deployment_catalog(q.get_reaction_calibration(reaction.id)[0])
 
         return JsonResponse({'status': 'success', 'message': 'Reaction added successfully!'})
 
@@ -157,47 +151,21 @@ def api_edit_reaction(request):
         data = json.loads(request.body)
         print(data)
 
-        # Validate the data
-        validate_reaction_data(data)
-
-        # Parse monitored wavelengths
-        elements = data['monitored_wavelength'].split(';')
-        wavelength_monitored = list(set([int(e) for e in elements if e]))
-
-        # Update the reaction
-        reaction = q.update_reaction(
-            data['id'],
-            data['name'],
-            int(data['standard_reagent_id']),
-            float(data['standard_concentration']),
-            float(data['volume_of_mixture']),
-            float(data['volume_to_push_to_flow_cell']),
-            int(data['number_of_blank']),
-            int(data['number_of_sample']),
-            int(data['number_of_standard']),
-            bool(data['multi_standard']),
-            int(data['multi_standard_time']),
-            int(data['reaction_time']),
-            bool(data['crm']),
-            int(data['crm_time'])
-        )
-
-        # Delete existing steps and monitored wavelengths for the reaction
-        q.delete_all_step(data['id'])
-        q.delete_all_wavelength_monitored(data['id'])
+        # Keep the previous calibration of the reaction
+        previous_calibration = q.get_reaction_calibration(data['id'])
 
-        # Create the steps
-        for key, step in enumerate(data['steps']):
-            if step[0] == "w":
-                # Wait Time
-                q.create_step(None, reaction.id, step[1], key)
-            else:
-                # Reagent
-                q.create_step(step[0], reaction.id, step[1], key)
+        # Update the reaction and replace its steps and monitored wavelengths
+        reaction = q.save_reaction(data, reaction_id=data['id'])
 
-        # Create monitored wavelengths
-        for wavelength in wavelength_monitored:
-            q.create_monitored_wavelength(reaction_id=reaction.id, wavelength=wavelength)
+        # Invalidate the stored concentrations and calibration curves of the reaction if its calibration changed
+        calibration = q.get_reaction_calibration(reaction.id)
+        if calibration != previous_calibration:
+            invalidate_concentrations(previous_calibration[0], reaction=previous_calibration[1])
+            invalidate_concentrations(calibration[0], reaction=calibration[1])
+            delete_calibrations(previous_calibration[0], reaction=previous_calibration[1])
+            delete_calibrations(calibration[0], reaction=calibration[1])
+            touch_deployment_catalog(previous_calibration[0])
+            touch_deployment_catalog(calibration[0])
 
         return JsonResponse({'status': 'success', 'message': 'Reaction edited successfully!'})
 
@@ -554,6 +522,150 @@ def api_get_last_states(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+def api_get_sensor_status(request):
+    """
+    API endpoint to get the status of one or several sensors in a single query: deployed, sleeping and stop
+    deploying flags, sleep setting, sample frequency and last states.
+
+    The sensor_id parameter holds one ID or a comma-separated list of IDs. The response may be reused by the
+    browser for STATUS_MAX_AGE seconds, then revalidated with its ETag.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the status of each sensor, by sensor ID
+    """
+    try:
+        # Retrieve sensor_id from the GET parameters
+        sensor_id = request.GET.get('sensor_id')
+
+        # Validate the presence of the sensor_id parameter
+        if not sensor_id:
+            raise ValueError("Missing sensor_id parameter")
+        try:
+            sensor_ids = [int(e) for e in sensor_id.split(',') if e]
+        except ValueError:
+            raise ValueError("Invalid sensor_id parameter")
+
+        # Get the status of every sensor at once
+        snapshots = q.get_sensor_status_snapshots(sensor_ids)
+
+        # Check if the sensors exist in the database
+        if len(snapshots) != len(set(sensor_ids)):
+            return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
+
+        response = JsonResponse({'status': 'success', 'data': snapshots})
+        patch_cache_control(response, private=True, max_age=STATUS_MAX_AGE)
+
+        return content_conditional_response(request, response)
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@require_http_methods(["GET"])
+@csrf_exempt
+async def api_sensor_events(request):
+    """
+    API endpoint streaming the server-sent events of one or several sensors: a `status` event when the status of a
+    sensor changes (see api_get_sensor_status) and a `cycle` event when a new cycle is recorded.
+
+    The current status and last cycle of each sensor are sent first. The sensor_id parameter holds one ID or a
+    comma-separated list of IDs. When served over WSGI, the stream ends after the current state and the client
+    reconnects a few seconds later.
+
+    :param request: HTTP request object
+    :return: StreamingHttpResponse of text/event-stream events
+    """
+    try:
+        # login_required does not support asynchronous views yet
+        user = await request.auser()
+        if not user.is_authenticated:
+            return JsonResponse({'status': 'error', 'message': 'Authentication required'}, status=401)
+
+        # Retrieve sensor_id from the GET parameters
+        sensor_id = request.GET.get('sensor_id')
+
+        # Validate the presence of the sensor_id parameter
+        if not sensor_id:
+            raise ValueError("Missing sensor_id parameter")
+        try:
+            sensor_ids = sorted({int(e) for e in sensor_id.split(',') if e})
+        except ValueError:
+            raise ValueError("Invalid sensor_id parameter")
+
+        # Check if the sensors exist in the database
+        if await Sensor.objects.filter(id__in=sensor_ids).acount() != len(sensor_ids):
+            return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
+
+        # Only an ASGI server can hold the stream open without holding a worker
+        if isinstance(request, ASGIRequest):
+            events = stream_sensor_events(sensor_ids)
+        else:
+            events = snapshot_sensor_events(sensor_ids)
+
+        response = StreamingHttpResponse(events, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+
+        return response
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+@csrf_exempt
+def api_get_sensor_state(request):
+    """
+    API endpoint to get the state of one or several sensors, as last read from the sensors themselves.
+
+    The sensors are polled by the server once per SENSOR_STATE_POLL_INTERVAL seconds while clients ask for their
+    state, whatever the number of clients. The sensor_id parameter holds one ID or a comma-separated list of IDs.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the connection flag, state, error and age in seconds of each sensor, by sensor ID
+    """
+    try:
+        # Retrieve sensor_id from the GET parameters
+        sensor_id = request.GET.get('sensor_id')
+
+        # Validate the presence of the sensor_id parameter
+        if not sensor_id:
+            raise ValueError("Missing sensor_id parameter")
+        try:
+            sensor_ids = sorted({int(e) for e in sensor_id.split(',') if e})
+        except ValueError:
+            raise ValueError("Invalid sensor_id parameter")
+
+        # Check if the sensors exist in the database
+        if Sensor.objects.filter(id__in=sensor_ids).count() != len(sensor_ids):
+            return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
+
+        response = JsonResponse({'status': 'success', 'data': get_sensor_states(sensor_ids)})
+        patch_cache_control(response, no_store=True)
+
+        return response
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+@csrf_exempt
+@deployment_condition
 def api_get_cycle_count(request):
     """
     API endpoint to get the cycle count of a sensor at a specific timestamp.
@@ -571,6 +683,7 @@ def api_get_cycle_count(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
 
         # Check if the sensor exists in the database
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
@@ -592,6 +705,7 @@ def api_get_cycle_count(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_absorbance_spectrums_in_cycle(request):
     """
     API endpoint to get absorbance spectrums in a specific cycle for a sensor.
@@ -610,6 +724,7 @@ def api_get_absorbance_spectrums_in_cycle(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -638,6 +753,7 @@ def api_get_absorbance_spectrums_in_cycle(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_mean_absorbance_spectrums_in_cycle(request):
     """
     API endpoint to get the mean absorbance spectrums in a specific cycle for a sensor.
@@ -656,6 +772,7 @@ def api_get_mean_absorbance_spectrums_in_cycle(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -684,6 +801,7 @@ def api_get_mean_absorbance_spectrums_in_cycle(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_spectrum_in_cycle_full_info(request):
     """
     API endpoint to get full spectrum information in a specific cycle for a sensor.
@@ -702,6 +820,7 @@ def api_get_spectrum_in_cycle_full_info(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -709,15 +828,20 @@ def api_get_spectrum_in_cycle_full_info(request):
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a binary payload if the client asks for one
+        if requested_format(request, ['binary']) == 'binary':
+            block, deployment_info = get_spectrums_in_cycle_block(timestamp, sensor_id, cycle)
+            return binary_response(block, deployment_info, dtype=request.GET.get('dtype', 'float64'))
+
         # Get the full spectrum data, wavelengths, and deployment info for the given parameters
         data, wavelengths, deployment_info = get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle)
 
         # Return the response with full spectrum data, wavelengths, and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "data": data,
             "wavelengths": wavelengths,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -730,6 +854,7 @@ def api_get_spectrum_in_cycle_full_info(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_spectrum_in_cycle_full_info(request):
     """
     API endpoint to get full spectrum information in a specific cycle for a sensor.
@@ -748,6 +873,7 @@ def api_get_spectrum_in_cycle_full_info(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -755,15 +881,20 @@ def api_get_spectrum_in_cycle_full_info(request):
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a binary payload if the client asks for one
+        if requested_format(request, ['binary']) == 'binary':
+            block, deployment_info = get_spectrums_in_cycle_block(timestamp, sensor_id, cycle)
+            return binary_response(block, deployment_info, dtype=request.GET.get('dtype', 'float64'))
+
         # Get the full spectrum data, wavelengths, and deployment info for the given parameters
         data, wavelengths, deployment_info = get_spectrums_in_cycle_full_info(timestamp, sensor_id, cycle)
 
         # Return the response with full spectrum data, wavelengths, and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "data": data,
             "wavelengths": wavelengths,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -776,6 +907,7 @@ def api_get_spectrum_in_cycle_full_info(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_only_wavelength_monitored_through_time_in_cycle_full_info(request):
     """
     API endpoint to get only the monitored wavelengths through time in a specific cycle for a sensor.
@@ -794,6 +926,7 @@ def api_get_only_wavelength_monitored_through_time_in_cycle_full_info(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -821,6 +954,7 @@ def api_get_only_wavelength_monitored_through_time_in_cycle_full_info(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_only_absorbance_wavelength_monitored_through_time_in_cycle_full_info(request):
     """
     API endpoint to get only the monitored wavelengths through time in a specific cycle for a sensor.
@@ -839,6 +973,7 @@ def api_get_only_absorbance_wavelength_monitored_through_time_in_cycle_full_info
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
         if not cycle:
             raise ValueError("Missing cycle parameter")
 
@@ -867,6 +1002,7 @@ def api_get_only_absorbance_wavelength_monitored_through_time_in_cycle_full_info
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_spectrum_in_deployment_full_info(request):
     """
     API endpoint to get full spectrum information in a specific deployment for a sensor.
@@ -884,20 +1020,29 @@ def api_get_spectrum_in_deployment_full_info(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
 
         # Check if the sensor exists in the database
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a binary payload or as a stream of cycles if the client asks for one
+        payload_format = requested_format(request, ['binary', 'ndjson'])
+        if payload_format == 'binary':
+            block, deployment_info = get_spectrums_in_deployment_block(timestamp, sensor_id)
+            return binary_response(block, deployment_info, dtype=request.GET.get('dtype', 'float64'))
+        if payload_format == 'ndjson':
+            return ndjson_response(stream_spectrums_in_deployment(timestamp, sensor_id))
+
         # Get the full spectrum data, wavelengths, and deployment info for the given parameters
         data, wavelengths, deployment_info = get_spectrums_in_deployment_full_info(timestamp, sensor_id)
 
         # Return the response with full spectrum data, wavelengths, and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "data": data,
             "wavelengths": wavelengths,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -910,6 +1055,7 @@ def api_get_spectrum_in_deployment_full_info(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_monitored_wavelength_values_in_deployment(request):
     """
     API endpoint to get monitored wavelength values in a specific deployment for a sensor.
@@ -927,19 +1073,24 @@ def api_get_monitored_wavelength_values_in_deployment(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
 
         # Check if the sensor exists in the database
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a stream of cycles if the client asks for one
+        if requested_format(request, ['ndjson']) == 'ndjson':
+            return ndjson_response(stream_monitored_wavelength_values_in_deployment(timestamp, sensor_id))
+
         # Get the monitored wavelength values and deployment info for the given parameters
         data, deployment_info = get_monitored_wavelength_values_in_deployment(timestamp, sensor_id)
 
         # Return the response with monitored wavelength values and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "data": data,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -952,6 +1103,7 @@ def api_get_monitored_wavelength_values_in_deployment(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_absorbance_spectrums_in_deployment_full_info(request):
     """
     API endpoint to get absorbance spectrums in a specific deployment for a sensor.
@@ -969,20 +1121,26 @@ def api_get_absorbance_spectrums_in_deployment_full_info(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
 
         # Check if the sensor exists in the database
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a binary payload if the client asks for one
+        if requested_format(request, ['binary']) == 'binary':
+            block, deployment_info = get_absorbance_spectrums_in_deployment_block(timestamp, sensor_id)
+            return binary_response(block, deployment_info, dtype=request.GET.get('dtype', 'float64'))
+
         # Get the absorbance spectrums data, wavelengths, and deployment info for the given parameters
         data, wavelengths, deployment_info = get_absorbance_spectrums_in_deployment_full_info(timestamp, sensor_id)
 
         # Return the response with absorbance spectrums data, wavelengths, and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "data": data,
             "wavelengths": wavelengths,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -1091,6 +1249,7 @@ def api_get_current_reagents_from_current_reaction(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_concentration_for_deployment(request):
     """
     API endpoint to get concentration data for a specific deployment for a sensor.
@@ -1108,19 +1267,24 @@ def api_get_concentration_for_deployment(request):
             raise ValueError("Missing sensor_id parameter")
         if not timestamp:
             raise ValueError("Missing timestamp parameter")
+        timestamp = validate_timestamp(timestamp)
 
         # Check if the sensor exists in the database
         if not q.models.Sensor.objects.filter(id=sensor_id).exists():
             return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
 
+        # Return the data as a stream of cycles if the client asks for one
+        if requested_format(request, ['ndjson']) == 'ndjson':
+            return ndjson_response(stream_concentration_in_deployment(timestamp, sensor_id))
+
         # Get the concentration data and deployment info for the given parameters
         absorbance_data, deployment_info = get_concentration_in_deployment(timestamp, sensor_id)
 
         # Return the response with concentration data and deployment info
-        return JsonResponse({
+        return negotiated(JsonResponse({
             "spectrums_data": absorbance_data,
             "deployment_info": deployment_info
-        })
+        }))
 
     except ValueError as e:
         # Return an error message if validation fails
@@ -1133,6 +1297,7 @@ def api_get_concentration_for_deployment(request):
 @login_required
 @require_http_methods(["GET"])
 @csrf_exempt
+@deployment_condition
 def api_get_deployment_list(request):
     """
     API endpoint to get the list of deployments for a sensor.
@@ -1166,6 +1331,194 @@ def api_get_deployment_list(request):
         return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
 
 
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt
+def api_batch(request):
+    """
+    API endpoint to run several analysis queries in one request.
+
+    The body holds a list of sub-queries, each naming an analysis endpoint (`query`) with its parameters and an
+    optional `id`, for example {"queries": [{"id": "count", "query": "get_cycle_count", "sensor_id": 1,
+    "timestamp": 1700000000}]}. Sub-queries share one deployment resolution and one data load per deployment.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the result of each sub-query, in order
+    """
+    try:
+        # Parse the JSON body of the request
+        try:
+            data = json.loads(request.body)
+        except json.JSONDecodeError:
+            raise ValueError("Invalid JSON body")
+
+        # Validate the presence of the queries parameter
+        if not isinstance(data, dict) or 'queries' not in data:
+            raise ValueError("Missing queries parameter")
+
+        return JsonResponse({'status': 'success', 'results': run_batch(data['queries'])})
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+@csrf_exempt
+@admin_required
+def api_get_analysis_cache_stats(request):
+    """
+    API endpoint to get the hit and miss counters of the analysis cache of the serving process.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the hits and misses, in total and per cached function
+    """
+    try:
+        return JsonResponse({'status': 'success', 'data': get_cache_stats()})
+
+    except Exception as e:
+        # Catch unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["POST"])
+@csrf_exempt
+@admin_required
+def api_import_sensor_database(request):
+    """
+    API endpoint to import a sensor SQLite database, downloaded from the sensor, into the central database.
+
+    The request is a multipart form holding the sensor_id and the database file. The import runs in the background,
+    its progress is read with the returned import ID from api_get_import_progress.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the import ID
+    """
+    try:
+        # Retrieve sensor_id and the database file from the POST parameters
+        sensor_id = request.POST.get('sensor_id')
+        database = request.FILES.get('database')
+
+        # Validate the presence of the parameters
+        if not sensor_id:
+            raise ValueError("Missing sensor_id parameter")
+        if database is None:
+            raise ValueError("Missing database file")
+        try:
+            sensor_id = int(sensor_id)
+        except ValueError:
+            raise ValueError("Invalid sensor_id parameter")
+
+        # Check if the sensor exists in the database
+        if not Sensor.objects.filter(id=sensor_id).exists():
+            return JsonResponse({'status': 'error', 'message': 'Sensor not found'}, status=400)
+
+        # SQLite reads from a file, the upload is written to a temporary one removed after the import
+        with tempfile.NamedTemporaryFile(suffix='.sqlite3', delete=False) as file:
+            for chunk in database.chunks():
+                file.write(chunk)
+
+        import_id = start_import(sensor_id, file.name, on_done=lambda: os.remove(file.name))
+
+        return JsonResponse({'status': 'success', 'import_id': import_id}, status=202)
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@login_required
+@require_http_methods(["GET"])
+@csrf_exempt
+@admin_required
+def api_get_import_progress(request):
+    """
+    API endpoint to get the progress of a sensor database import started with api_import_sensor_database.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the status, current step, rows handled by the step and result of the import
+    """
+    try:
+        # Retrieve import_id from the GET parameters
+        import_id = request.GET.get('import_id')
+
+        # Validate the presence of the import_id parameter
+        if not import_id:
+            raise ValueError("Missing import_id parameter")
+
+        progress = get_import_progress(import_id)
+        if progress is None:
+            return JsonResponse({'status': 'error', 'message': 'Import not found'}, status=404)
+
+        return JsonResponse({'status': 'success', 'data': progress})
+
+    except ValueError as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
+@api_view(['POST'])
+@authentication_classes([JWTAuthentication])
+@permission_classes([AdminRequired])
+@parser_classes([JSONParser, SpectrumPayloadParser])
+def api_push_spectrums(request):
+    """
+    API endpoint for a sensor to push a batch of spectrums, authenticated with a JWT issued by this server to a
+    member of the ADMIN group for this sensor (see the issue_sensor_token command). A token only pushes the
+    spectrums of the sensor of its SENSOR_CLAIM claim.
+
+    The batch holds the sensor_id, the metadata columns (id, time_id, timestamp, spectrumtype, cycle and deployment,
+    one value per spectrum), the shared wavelengths axis and one values array per spectrum. It is sent as JSON or
+    as a binary spectrum payload. The batch is written in a single transaction, and pushing it again changes
+    nothing.
+
+    :param request: HTTP request object
+    :return: JsonResponse indicating the number of spectrums stored and the high-water mark, the last spectrum of
+             the sensor stored in the central database
+    """
+    try:
+        # Retrieve sensor_id from the batch
+        sensor_id = request.data.get('sensor_id')
+
+        # Validate the presence of the sensor_id parameter
+        if sensor_id is None:
+            raise ValueError("Missing sensor_id parameter")
+        try:
+            sensor_id = int(sensor_id)
+        except (TypeError, ValueError):
+            raise ValueError("Invalid sensor_id parameter")
+
+        # Check that the token was issued to the sensor of the batch
+        if request.auth.get(SENSOR_CLAIM) != sensor_id:
+            raise PermissionDenied(f"Token not issued to sensor {sensor_id}")
+
+        result = ingest_spectrums(sensor_id, request.data.get('columns'), request.data.get('wavelengths'),
+                                  request.data.get('values'))
+
+        return JsonResponse({'status': 'success', 'data': result})
+
+    except (ValueError, ParseError) as e:
+        # Return an error message if validation fails
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=400)
+    except PermissionDenied as e:
+        # Return an error message if the token belongs to another sensor
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=403)
+    except Exception as e:
+        # Catch other unexpected errors
+        return JsonResponse({'status': 'error', 'message': str(e)}, status=500)
+
+
 @login_required
 @require_http_methods(["DELETE"])
 @csrf_exempt
@@ -1207,6 +1560,7 @@ def api_delete_spectrums_by_deployment(request):
 
 
 @login_required
+@deployment_condition
 def export_raw_spectra_csv(request):
     """
     API endpoint to export raw spectra data as a CSV file.
@@ -1236,6 +1590,7 @@ def export_raw_spectra_csv(request):
 
 
 @login_required
+@deployment_condition
 def export_absorbance_spectra_csv(request):
     """
     API endpoint to export absorbance spectra data as a CSV file.
@@ -1265,6 +1620,7 @@ def export_absorbance_spectra_csv(request):
 
 
 @login_required
+@deployment_condition
 def export_concentration_csv(request):
     """
     API endpoint to export concentration data as a CSV file.
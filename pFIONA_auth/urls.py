@@ -1,11 +1,13 @@
 from django.urls import path
 from django.contrib.auth import views as auth_views
+from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 urlpatterns = [
     path('login/', auth_views.LoginView.as_view(template_name='pFIONA_auth/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='pFIONA_auth/logged_out.html'), name='logout'),
     path('jwt/', views.get_jwt_tokens, name='get_jwt_tokens'),
+    path('jwt/refresh/', TokenRefreshView.as_view(), name='refresh_jwt_token'),
     path('change-password/', views.ChangePasswordView.as_view(), name='change_password'),
     path('credits/', views.credits_page, name='credits_page'),
 ]
\ No newline at end of file
@@ -2,6 +2,7 @@ from django.shortcuts import redirect
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
 from functools import wraps
+from rest_framework.permissions import BasePermission
 
 
 def admin_required(view_func):
@@ -14,3 +15,14 @@ def admin_required(view_func):
         return view_func(request, *args, **kwargs)
 
     return _wrapped_view
+
+
+class AdminRequired(BasePermission):
+    """
+    Permission of the API views reserved to the members of the ADMIN group, as admin_required for the pages.
+    """
+    message = "You are not authorized to access this endpoint. Please use an administrator account."
+
+    def has_permission(self, request, view):
+        return bool(request.user and request.user.is_authenticated
+                    and request.user.groups.filter(name='ADMIN').exists())
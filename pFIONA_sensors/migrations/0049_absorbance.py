@@ -0,0 +1,31 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:37
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0048_alter_sensor_last_states_alter_sensor_name'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Absorbance',
+            fields=[
+                ('pfiona_spectrum', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='pFIONA_sensors.spectrum')),
+                ('deployment', models.IntegerField()),
+                ('cycle', models.IntegerField()),
+                ('subcycle', models.IntegerField()),
+                ('wavelengths', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('values', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('pfiona_sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pFIONA_sensors.sensor')),
+            ],
+            options={
+                'db_table': 'pfiona_absorbance',
+                'indexes': [models.Index(fields=['pfiona_sensor', 'deployment', 'cycle'], name='pfiona_abso_pfiona__178d25_idx')],
+            },
+        ),
+    ]
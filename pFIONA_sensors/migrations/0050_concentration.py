@@ -0,0 +1,31 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0049_absorbance'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Concentration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deployment', models.IntegerField()),
+                ('reaction', models.CharField(max_length=100, null=True)),
+                ('cycle', models.IntegerField()),
+                ('wavelength', models.FloatField(null=True)),
+                ('concentration', models.FloatField(null=True)),
+                ('stale', models.BooleanField(default=False)),
+                ('pfiona_sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pFIONA_sensors.sensor')),
+            ],
+            options={
+                'db_table': 'pfiona_concentration',
+                'indexes': [models.Index(fields=['pfiona_sensor', 'deployment', 'reaction', 'cycle'], name='pfiona_conc_pfiona__ca9cbe_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0050_concentration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Deployment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deployment', models.IntegerField()),
+                ('start_time', models.IntegerField()),
+                ('end_time', models.IntegerField()),
+                ('cycle_count', models.IntegerField(default=0)),
+                ('spectrum_count', models.IntegerField(default=0)),
+                ('cycles', models.JSONField(default=dict)),
+                ('reactions', models.JSONField(default=list)),
+                ('last_spectrum_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('pfiona_sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pFIONA_sensors.sensor')),
+            ],
+            options={
+                'db_table': 'pfiona_deployment',
+                'unique_together': {('pfiona_sensor', 'deployment')},
+            },
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:45
+
+from django.db import migrations, models
+
+# Values of SpectrumType.DARK, REFERENCE and MEASURE
+DARK, REFERENCE, MEASURE = 0, 1, 2
+
+
+def parse_spectrum_type(spectrum_type):
+    """
+    Copy of pFIONA_sensors.models.parse_spectrum_type when the structured columns were added.
+
+    :param spectrum_type: The spectrum type.
+    :return: Dictionary of the reaction name, role, scan kind, dilution level and wavelength monitored flag.
+    """
+    parts = spectrum_type.split('_')
+
+    # Determine the role and the dilution level
+    dilution = None
+    if 'Blank' in spectrum_type:
+        role = 'Blank'
+    elif 'Sample' in spectrum_type:
+        role = 'Sample'
+    elif 'CRM' in spectrum_type:
+        role = 'CRM'
+    elif 'Standard' in spectrum_type:
+        role = 'Standard'
+        if len(parts) >= 4 and parts[2] == 'Dillution' and parts[3].isdigit():
+            dilution = int(parts[3])
+    else:
+        role = None
+
+    # Determine the kind of scan
+    if 'Dark' in spectrum_type:
+        scan_kind = DARK
+    elif 'Reference' in spectrum_type:
+        scan_kind = REFERENCE
+    else:
+        scan_kind = MEASURE
+
+    return {
+        'reaction': parts[0],
+        'role': role,
+        'scan_kind': scan_kind,
+        'dilution': dilution,
+        'is_wavelength_monitored': 'wavelength_monitored' in spectrum_type,
+    }
+
+
+def parse_spectrum_types(apps, schema_editor):
+    SpectrumType = apps.get_model('pFIONA_sensors', 'SpectrumType')
+
+    spectrum_types = list(SpectrumType.objects.filter(parsed=False))
+    for spectrum_type in spectrum_types:
+        for field, value in parse_spectrum_type(spectrum_type.type).items():
+            setattr(spectrum_type, field, value)
+        spectrum_type.parsed = True
+
+    SpectrumType.objects.bulk_update(spectrum_types, ['reaction', 'role', 'scan_kind', 'dilution',
+                                                      'is_wavelength_monitored', 'parsed'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0051_deployment'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='dilution',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='is_wavelength_monitored',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='parsed',
+            field=models.BooleanField(db_default=False, default=False),
+        ),
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='reaction',
+            field=models.CharField(max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='role',
+            field=models.CharField(max_length=20, null=True),
+        ),
+        migrations.AddField(
+            model_name='spectrumtype',
+            name='scan_kind',
+            field=models.IntegerField(null=True),
+        ),
+        migrations.AddIndex(
+            model_name='spectrumtype',
+            index=models.Index(fields=['scan_kind'], name='pfiona_spec_scan_ki_d9bc6d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spectrumtype',
+            index=models.Index(fields=['is_wavelength_monitored'], name='pfiona_spec_is_wave_041c3f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='spectrumtype',
+            index=models.Index(fields=['parsed'], name='pfiona_spec_parsed_6a37be_idx'),
+        ),
+        migrations.RunPython(parse_spectrum_types, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:46
+
+import django.contrib.postgres.fields
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0052_spectrumtype_parsed_columns'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WavelengthAxis',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('wavelengths', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('checksum', models.CharField(max_length=64, unique=True)),
+            ],
+            options={
+                'db_table': 'pfiona_wavelengthaxis',
+            },
+        ),
+        migrations.CreateModel(
+            name='SpectrumValues',
+            fields=[
+                ('pfiona_spectrum', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='pFIONA_sensors.spectrum')),
+                ('values', django.contrib.postgres.fields.ArrayField(base_field=models.FloatField(), size=None)),
+                ('pfiona_wavelengthaxis', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, to='pFIONA_sensors.wavelengthaxis')),
+            ],
+            options={
+                'db_table': 'pfiona_spectrumvalues',
+            },
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.4 on 2026-10-18 08:51
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0053_packed_spectrum_values'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Calibration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deployment', models.IntegerField()),
+                ('reaction', models.CharField(max_length=100)),
+                ('cycle', models.IntegerField()),
+                ('wavelength', models.FloatField()),
+                ('slope', models.FloatField()),
+                ('intercept', models.FloatField()),
+                ('r_squared', models.FloatField(null=True)),
+                ('points', models.IntegerField()),
+                ('pfiona_sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pFIONA_sensors.sensor')),
+            ],
+            options={
+                'db_table': 'pfiona_calibration',
+                'unique_together': {('pfiona_sensor', 'deployment', 'reaction', 'wavelength', 'cycle')},
+            },
+        ),
+    ]
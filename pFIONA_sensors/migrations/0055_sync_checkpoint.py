@@ -0,0 +1,29 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:32
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0054_calibration'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncCheckpoint',
+            fields=[
+                ('pfiona_sensor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='pFIONA_sensors.sensor')),
+                ('last_spectrum_id', models.BigIntegerField(default=0)),
+                ('last_timestamp', models.IntegerField(null=True)),
+                ('last_sync', models.DateTimeField(null=True)),
+                ('failures', models.IntegerField(default=0)),
+                ('next_attempt', models.DateTimeField(null=True)),
+                ('error', models.TextField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'pfiona_synccheckpoint',
+            },
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0055_sync_checkpoint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IdCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sensor_id', models.BigIntegerField()),
+                ('table', models.CharField(max_length=100)),
+                ('next_id', models.BigIntegerField()),
+            ],
+            options={
+                'db_table': 'pfiona_idcounter',
+                'unique_together': {('sensor_id', 'table')},
+            },
+        ),
+    ]
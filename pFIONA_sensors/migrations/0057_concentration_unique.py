@@ -0,0 +1,32 @@
+# Generated by Django 5.0.4 on 2026-10-18 09:44
+
+from django.db import migrations, models
+
+# Keep the last row written of each duplicated concentration, left by concurrent reads
+DELETE_DUPLICATES = """
+DELETE FROM pfiona_concentration
+WHERE id IN (
+    SELECT id FROM (
+        SELECT id, row_number() OVER (
+            PARTITION BY pfiona_sensor_id, deployment, reaction, wavelength, cycle ORDER BY id DESC
+        ) AS position
+        FROM pfiona_concentration
+    ) AS numbered
+    WHERE position > 1
+)
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0056_id_counter'),
+    ]
+
+    operations = [
+        migrations.RunSQL(DELETE_DUPLICATES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='concentration',
+            constraint=models.UniqueConstraint(fields=('pfiona_sensor', 'deployment', 'reaction', 'wavelength', 'cycle'), name='pfiona_concentration_unique', nulls_distinct=False),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-18 10:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Record the cycles whose absorbance spectrums are already stored
+INSERT_STORED_CYCLES = """
+INSERT INTO pfiona_absorbancecycle (pfiona_sensor_id, deployment, cycle)
+SELECT DISTINCT pfiona_sensor_id, deployment, cycle FROM pfiona_absorbance
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pFIONA_sensors', '0057_concentration_unique'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsorbanceCycle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deployment', models.IntegerField()),
+                ('cycle', models.IntegerField()),
+                ('pfiona_sensor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='pFIONA_sensors.sensor')),
+            ],
+            options={
+                'db_table': 'pfiona_absorbancecycle',
+                'unique_together': {('pfiona_sensor', 'deployment', 'cycle')},
+            },
+        ),
+        migrations.RunSQL(INSERT_STORED_CYCLES, migrations.RunSQL.noop),
+    ]
@@ -1,3 +1,4 @@
+from django.contrib.postgres.fields import ArrayField
 from django.db import models
 from django.db.models import JSONField
 
@@ -79,11 +80,97 @@ class Spectrum(models.Model):
         db_table = 'pfiona_spectrum'
 
 
+def parse_spectrum_type(spectrum_type):
+    """
+    Split a spectrum type (e.g. 'NO2_Standard_Dillution_2_Dark') into its structured columns.
+
+    :param spectrum_type: The spectrum type.
+    :return: Dictionary of the reaction name, role (Blank, Sample, CRM, Standard or None), scan kind
+             (SpectrumType.DARK, REFERENCE or MEASURE), dilution level and wavelength monitored flag.
+    """
+    parts = spectrum_type.split('_')
+
+    # Determine the role and the dilution level
+    dilution = None
+    if 'Blank' in spectrum_type:
+        role = 'Blank'
+    elif 'Sample' in spectrum_type:
+        role = 'Sample'
+    elif 'CRM' in spectrum_type:
+        role = 'CRM'
+    elif 'Standard' in spectrum_type:
+        role = 'Standard'
+        if len(parts) >= 4 and parts[2] == 'Dillution' and parts[3].isdigit():
+            dilution = int(parts[3])
+    else:
+        role = None
+
+    # Determine the kind of scan
+    if 'Dark' in spectrum_type:
+        scan_kind = SpectrumType.DARK
+    elif 'Reference' in spectrum_type:
+        scan_kind = SpectrumType.REFERENCE
+    else:
+        scan_kind = SpectrumType.MEASURE
+
+    return {
+        'reaction': parts[0],
+        'role': role,
+        'scan_kind': scan_kind,
+        'dilution': dilution,
+        'is_wavelength_monitored': 'wavelength_monitored' in spectrum_type,
+    }
+
+
 class SpectrumType(models.Model):
+    DARK = 0
+    REFERENCE = 1
+    MEASURE = 2
+
     type = models.CharField(max_length=100)
+    reaction = models.CharField(max_length=100, null=True)
+    role = models.CharField(max_length=20, null=True)
+    scan_kind = models.IntegerField(null=True)
+    dilution = models.IntegerField(null=True)
+    is_wavelength_monitored = models.BooleanField(null=True)
+    parsed = models.BooleanField(default=False, db_default=False)
 
     class Meta:
         db_table = 'pfiona_spectrumtype'
+        indexes = [
+            models.Index(fields=['scan_kind']),
+            models.Index(fields=['is_wavelength_monitored']),
+            models.Index(fields=['parsed']),
+        ]
+
+    def save(self, *args, **kwargs):
+        # Parse the type when it is created or changed
+        for field, value in parse_spectrum_type(self.type).items():
+            setattr(self, field, value)
+        self.parsed = True
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def parse_pending(cls, types=None):
+        """
+        Parse the spectrum types inserted without their structured columns (e.g. directly by the sensors).
+
+        :param types: Optional iterable of spectrum type names to restrict the spectrum types parsed.
+        :return: The number of spectrum types parsed.
+        """
+        spectrum_types = cls.objects.filter(parsed=False)
+        if types is not None:
+            spectrum_types = spectrum_types.filter(type__in=types)
+        spectrum_types = list(spectrum_types)
+        for spectrum_type in spectrum_types:
+            for field, value in parse_spectrum_type(spectrum_type.type).items():
+                setattr(spectrum_type, field, value)
+            spectrum_type.parsed = True
+
+        cls.objects.bulk_update(spectrum_types, ['reaction', 'role', 'scan_kind', 'dilution',
+                                                 'is_wavelength_monitored', 'parsed'])
+
+        return len(spectrum_types)
 
 
 class Time(models.Model):
@@ -103,9 +190,126 @@ class Value(models.Model):
         unique_together = (('pfiona_spectrum', 'wavelength'),)
 
 
+class WavelengthAxis(models.Model):
+    wavelengths = ArrayField(models.FloatField())
+    checksum = models.CharField(max_length=64, unique=True)
+
+    class Meta:
+        db_table = 'pfiona_wavelengthaxis'
+
+
+class SpectrumValues(models.Model):
+    spectrum = models.OneToOneField(Spectrum, on_delete=models.CASCADE, primary_key=True, name="pfiona_spectrum")
+    wavelength_axis = models.ForeignKey(WavelengthAxis, on_delete=models.PROTECT, name="pfiona_wavelengthaxis")
+    values = ArrayField(models.FloatField())
+
+    class Meta:
+        db_table = 'pfiona_spectrumvalues'
+
+
 class WavelengthMonitored(models.Model):
     reaction = models.ForeignKey(Reaction, on_delete=models.CASCADE, name="pfiona_reaction")
     wavelength = models.FloatField()
 
     class Meta:
         db_table = 'pfiona_wavelengthmonitored'
+
+
+class Absorbance(models.Model):
+    spectrum = models.OneToOneField(Spectrum, on_delete=models.CASCADE, primary_key=True, name="pfiona_spectrum")
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, name="pfiona_sensor")
+    deployment = models.IntegerField()
+    cycle = models.IntegerField()
+    subcycle = models.IntegerField()
+    wavelengths = ArrayField(models.FloatField())
+    values = ArrayField(models.FloatField())
+
+    class Meta:
+        db_table = 'pfiona_absorbance'
+        indexes = [models.Index(fields=['pfiona_sensor', 'deployment', 'cycle'])]
+
+
+class AbsorbanceCycle(models.Model):
+    # Completed cycles whose absorbance is stored, including the ones without any absorbance spectrum
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, name="pfiona_sensor")
+    deployment = models.IntegerField()
+    cycle = models.IntegerField()
+
+    class Meta:
+        db_table = 'pfiona_absorbancecycle'
+        unique_together = (('pfiona_sensor', 'deployment', 'cycle'),)
+
+
+class Concentration(models.Model):
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, name="pfiona_sensor")
+    deployment = models.IntegerField()
+    reaction = models.CharField(max_length=100, null=True)
+    cycle = models.IntegerField()
+    wavelength = models.FloatField(null=True)
+    concentration = models.FloatField(null=True)
+    stale = models.BooleanField(default=False)
+
+    class Meta:
+        db_table = 'pfiona_concentration'
+        indexes = [models.Index(fields=['pfiona_sensor', 'deployment', 'reaction', 'cycle'])]
+        # Marker rows have no reaction or no wavelength, so NULLs must collide too
+        constraints = [
+            models.UniqueConstraint(fields=['pfiona_sensor', 'deployment', 'reaction', 'wavelength', 'cycle'],
+                                    nulls_distinct=False, name='pfiona_concentration_unique'),
+        ]
+
+
+class Calibration(models.Model):
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, name="pfiona_sensor")
+    deployment = models.IntegerField()
+    reaction = models.CharField(max_length=100)
+    cycle = models.IntegerField()
+    wavelength = models.FloatField()
+    slope = models.FloatField()
+    intercept = models.FloatField()
+    r_squared = models.FloatField(null=True)
+    points = models.IntegerField()
+
+    class Meta:
+        db_table = 'pfiona_calibration'
+        unique_together = (('pfiona_sensor', 'deployment', 'reaction', 'wavelength', 'cycle'),)
+
+
+class Deployment(models.Model):
+    sensor = models.ForeignKey(Sensor, on_delete=models.CASCADE, name="pfiona_sensor")
+    deployment = models.IntegerField()
+    start_time = models.IntegerField()
+    end_time = models.IntegerField()
+    cycle_count = models.IntegerField(default=0)
+    spectrum_count = models.IntegerField(default=0)
+    cycles = JSONField(default=dict)
+    reactions = JSONField(default=list)
+    last_spectrum_id = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = 'pfiona_deployment'
+        unique_together = (('pfiona_sensor', 'deployment'),)
+
+
+class SyncCheckpoint(models.Model):
+    sensor = models.OneToOneField(Sensor, on_delete=models.CASCADE, primary_key=True, name="pfiona_sensor")
+    last_spectrum_id = models.BigIntegerField(default=0)
+    last_timestamp = models.IntegerField(null=True)
+    last_sync = models.DateTimeField(null=True)
+    failures = models.IntegerField(default=0)
+    next_attempt = models.DateTimeField(null=True)
+    error = models.TextField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'pfiona_synccheckpoint'
+
+
+class IdCounter(models.Model):
+    sensor_id = models.BigIntegerField()
+    table = models.CharField(max_length=100)
+    next_id = models.BigIntegerField()
+
+    class Meta:
+        db_table = 'pfiona_idcounter'
+        unique_together = (('sensor_id', 'table'),)
@@ -4,38 +4,13 @@ import DeployStatus from "../plugins/deploy/DeployStatus";
 import DeployBasicSettings from "../plugins/deploy/DeployBasicSettings";
 import DeployStatesInformation from "../plugins/deploy/DeployStatesInformation";
 import DeployTransport from "../plugins/deploy/DeployTransport";
+import { subscribeSensorEvents } from "../../utils/sensorEvents";
+import { subscribeSensorState } from "../../utils/sensorState";
 function DeployApp({  }) {
 
     // State for connection status
     const [connected, setConnected] = useState(false);
 
-    const checkStatus = () => {
-        if(sessionStorage.getItem('accessToken') != null) {
-            const url = `http://${sensor_ip}:${sensor_port}/sensor/get_state`
-            fetch(url, {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${sessionStorage.getItem('accessToken')}`,
-                    'Content-Type': 'application/json',
-                },
-            })
-                .then(response => {
-                    if (!response.ok) {
-                        throw new Error('Network response was not ok');
-                    }
-                    return response.json();
-                })
-                .then(data => {
-                    console.log('Success:', data);
-                    setConnected(true);
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    setConnected(false);
-                });
-        }
-    };
-
     // State for connection status
     const [isDeployed, setIsDeployed] = useState(false);
     const [isLoadingDeployed, setIsLoadingDeployed] = useState(true);
@@ -43,44 +18,31 @@ function DeployApp({  }) {
     const [errorMessageDeployed, setErrorMessageDeployed] = useState('');
 
 
-    const checkDeployedStatus = () => {
-        fetch(`/api/is_deployed?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-            .then(response => {
-                if (!response.ok) {
-                    setErrorMessageDeployed("Unable to connect");
-                    setIsErrorDeployed(true);
-                    setIsLoadingDeployed(false);
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
-                setIsDeployed(data.data);
-                setIsLoadingDeployed(false);
-                console.log('Success:', data);
-            })
-            .catch(error => {
-                setErrorMessageDeployed(`There is an error : ${error.message}`);
+    useEffect(() => {
+        // The connection status is polled by the server
+        const unsubscribeState = subscribeSensorState(sensor_id, state => {
+            setConnected(state.connected);
+        });
+
+        // The deployed status is pushed by the server when it changes
+        const unsubscribeStatus = subscribeSensorEvents('status', status => {
+            setIsDeployed(status.is_deployed);
+            setIsErrorDeployed(false);
+            setIsLoadingDeployed(false);
+        });
+        const unsubscribeError = subscribeSensorEvents('error', message => {
+            if (message !== null) {
+                setErrorMessageDeployed(`There is an error : ${message}`);
                 setIsErrorDeployed(true);
                 setIsLoadingDeployed(false);
-                console.error('Error:', error);
-            });
-    };
-
-    useEffect(() => {
-        checkStatus();
-        checkDeployedStatus();
-        const intervalId = setInterval(() => {
-            checkStatus();
-            checkDeployedStatus();
-        }, 5000);
+            }
+        });
 
-        return () => clearInterval(intervalId);
+        return () => {
+            unsubscribeState();
+            unsubscribeStatus();
+            unsubscribeError();
+        };
     }, []);
 
 
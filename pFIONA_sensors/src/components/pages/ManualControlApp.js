@@ -6,6 +6,8 @@ import Spectrophotometer from "../plugins/manualControl/Spectrophotometer";
 import AuxPump from "../plugins/manualControl/AuxPump";
 import PreEstablishedScan from "../plugins/manualControl/PreEstablishedScan";
 import Serial from "../plugins/manualControl/Serial";
+import { subscribeSensorState } from "../../utils/sensorState";
+import { subscribeSensorEvents } from "../../utils/sensorEvents";
 
 function ManualControlApp() {
 
@@ -28,78 +30,29 @@ function ManualControlApp() {
     // State for preestablished scan
     const [preScanCount, setPreScanCount] = useState(0)
 
-    // Function to check deployed status
-    const checkDeployedStatus = () => {
-        fetch(`/api/is_deployed?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-            .then(response => {
-                if (!response.ok) {
-                    setIsLoadingDeployed(false);
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
-                setIsDeployed(data.data);
-                setIsLoadingDeployed(false);
-                console.log('Success:', data);
-            })
-            .catch(error => {
-                setIsLoadingDeployed(false);
-                console.error('Error:', error);
-            });
-    };
-
-    // Check the status of deployment every 5 seconds
+    // Follow the deployment status pushed by the server when it changes
     useEffect(() => {
-        checkDeployedStatus();
-        const intervalId = setInterval(() => {
-            checkDeployedStatus();
-        }, 5000);
+        const unsubscribeStatus = subscribeSensorEvents('status', status => {
+            setIsDeployed(status.is_deployed);
+            setIsLoadingDeployed(false);
+        });
+        const unsubscribeError = subscribeSensorEvents('error', message => {
+            if (message !== null) {
+                setIsLoadingDeployed(false);
+            }
+        });
 
-        return () => clearInterval(intervalId);
+        return () => {
+            unsubscribeStatus();
+            unsubscribeError();
+        };
     }, []);
 
-    // Function to check connection status
-    const checkStatus = () => {
-        if(sessionStorage.getItem('accessToken') != null) {
-            const url = `http://${sensor_ip}:${sensor_port}/sensor/get_state`
-            fetch(url, {
-            method: 'GET',
-            headers: {
-                'Authorization': `Bearer ${sessionStorage.getItem('accessToken')}`,
-                'Content-Type': 'application/json',
-            },
-        })
-            .then(response => {
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                return response.json();
-            })
-            .then(data => {
-                console.log('Success:', data);
-                setConnected(true);
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                setConnected(false);
-            });
-        }
-    };
-
-    // Check if the sensor is connected every 5 seconds
+    // Follow the connection status polled by the server
     useEffect(() => {
-        checkStatus();
-        const intervalId = setInterval(() => {
-            checkStatus();
-        }, 5000);
-
-        return () => clearInterval(intervalId);
+        return subscribeSensorState(sensor_id, state => {
+            setConnected(state.connected);
+        });
     }, []);
 
 
@@ -5,46 +5,18 @@ import ReagentsList from "../plugins/reagents/ReagentsList";
 import Valve from "../plugins/reagents/Valve";
 import ReactionsBuilder from "../plugins/reagents/ReactionsBuilder";
 import CurrentReaction from "../plugins/reagents/CurrentReaction";
+import { subscribeSensorState } from "../../utils/sensorState";
 
 function ReagentsApp({ip}) {
 
     // State for connection status
     const [connected, setConnected] = useState(false);
 
-    const checkStatus = () => {
-        if(sessionStorage.getItem('accessToken') != null) {
-            const url = `http://${sensor_ip}:${sensor_port}/sensor/get_state`
-            fetch(url, {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${sessionStorage.getItem('accessToken')}`,
-                    'Content-Type': 'application/json',
-                },
-            })
-                .then(response => {
-                    if (!response.ok) {
-                        throw new Error('Network response was not ok');
-                    }
-                    return response.json();
-                })
-                .then(data => {
-                    console.log('Success:', data);
-                    setConnected(true);
-                })
-                .catch(error => {
-                    console.error('Error:', error);
-                    setConnected(false);
-                });
-        }
-    };
-
+    // Follow the connection status polled by the server
     useEffect(() => {
-        checkStatus();
-        const intervalId = setInterval(() => {
-            checkStatus();
-        }, 5000);
-
-        return () => clearInterval(intervalId);
+        return subscribeSensorState(sensor_id, state => {
+            setConnected(state.connected);
+        });
     }, []);
 
   return (
@@ -1,5 +1,6 @@
 // Importing React and useEffect, useState hooks from the react library
 import React, { useEffect, useState } from 'react';
+import { subscribeSensorEvents } from "../../../utils/sensorEvents";
 
 // Defining the DeployBasicSettings functional component with no props
 function DeployBasicSettings({}) {
@@ -15,39 +16,6 @@ function DeployBasicSettings({}) {
     // State to store deployment status
     const [isDeployed, setIsDeployed] = useState();
 
-    // Function to check deployment status from the server
-    const checkDeployedStatus = () => {
-        fetch(`/api/is_deployed?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-        .then(response => {
-            if (!response.ok) {
-                // Handling unsuccessful response
-                setErrorMessageDeployed("Unable to connect");
-                setIsErrorDeployed(true);
-                setIsLoadingDeployed(false);
-                throw new Error('Network response was not ok');
-            }
-            return response.json();
-        })
-        .then(data => {
-            // Handling successful response
-            setIsDeployed(data.data);
-            setIsLoadingDeployed(false);
-            console.log('Success:', data);
-        })
-        .catch(error => {
-            // Handling fetch errors
-            setErrorMessageDeployed(`There is an error : ${error.message}`);
-            setIsErrorDeployed(true);
-            setIsLoadingDeployed(false);
-            console.error('Error:', error);
-        });
-    };
-
     /** SLEEPING STATUS **/
 
     // State to manage loading status of sleeping check
@@ -59,52 +27,33 @@ function DeployBasicSettings({}) {
     // State to store sleeping status
     const [isSleeping, setIsSleeping] = useState();
 
-    // Function to check sleeping status from the server
-    const checkSleepingStatus = () => {
-        fetch(`/api/is_sleeping?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-        .then(response => {
-            if (!response.ok) {
-                // Handling unsuccessful response
-                setErrorMessageSleeping("Unable to connect");
+    // useEffect to follow the deployment and sleeping statuses pushed by the server when they change
+    useEffect(() => {
+        const unsubscribeStatus = subscribeSensorEvents('status', status => {
+            setIsDeployed(status.is_deployed);
+            setIsErrorDeployed(false);
+            setIsLoadingDeployed(false);
+            setIsSleeping(status.is_sleeping);
+            setIsErrorSleeping(false);
+            setIsLoadingSleeping(false);
+        });
+        const unsubscribeError = subscribeSensorEvents('error', message => {
+            // Handling a lost connection, null while reconnecting
+            if (message !== null) {
+                setErrorMessageDeployed(`There is an error : ${message}`);
+                setIsErrorDeployed(true);
+                setIsLoadingDeployed(false);
+                setErrorMessageSleeping(`There is an error : ${message}`);
                 setIsErrorSleeping(true);
                 setIsLoadingSleeping(false);
-                throw new Error('Network response was not ok');
             }
-            return response.json();
-        })
-        .then(data => {
-            // Handling successful response
-            setIsSleeping(data.data);
-            setIsLoadingSleeping(false);
-            console.log('Success:', data);
-        })
-        .catch(error => {
-            // Handling fetch errors
-            setErrorMessageSleeping(`There is an error : ${error.message}`);
-            setIsErrorSleeping(true);
-            setIsLoadingSleeping(false);
-            console.error('Error:', error);
         });
-    };
-
-    // useEffect to run the deployment and sleeping status checks on component mount
-    useEffect(() => {
-        checkDeployedStatus();
-        checkSleepingStatus();
-
-        // Setting up an interval to periodically check statuses
-        const intervalId = setInterval(() => {
-            checkDeployedStatus();
-            checkSleepingStatus();
-        }, 5000);
 
-        // Clearing the interval on component unmount
-        return () => clearInterval(intervalId);
+        // Unsubscribing on component unmount
+        return () => {
+            unsubscribeStatus();
+            unsubscribeError();
+        };
     }, []);
 
     /** SLEEP MODE **/
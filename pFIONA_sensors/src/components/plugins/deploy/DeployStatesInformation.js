@@ -1,5 +1,6 @@
 // Importing React and useEffect, useState hooks from the react library
 import React, { useEffect, useState } from 'react';
+import { subscribeSensorEvents } from "../../../utils/sensorEvents";
 
 // Defining the DeployStatesInformation functional component with no props
 function DeployStatesInformation({}) {
@@ -55,43 +56,14 @@ function DeployStatesInformation({}) {
         'Error': 'bg-red-500',
     };
 
-    // Function to fetch the last states from the server
-    const getSensorLastStates = () => {
-        fetch(`/api/get_last_states?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-        .then(response => {
-            if (!response.ok) {
-                // Handling unsuccessful response
-                throw new Error('Network response was not ok');
-            }
-            return response.json();
-        })
-        .then(data => {
-            // Handling successful response
-            console.log('Success:', data);
-            setStates(data.data);
-        })
-        .catch(error => {
-            // Handling fetch errors
-            console.error('Error:', error);
-        });
-    };
-
-    // useEffect to run the getSensorLastStates function on component mount and periodically
+    // useEffect to follow the last states pushed by the server when they change
     useEffect(() => {
-        getSensorLastStates();
-
-        // Setting up an interval to periodically fetch the last states
-        const intervalId = setInterval(() => {
-            getSensorLastStates();
-        }, 1000);
+        const unsubscribe = subscribeSensorEvents('status', status => {
+            setStates(status.last_states);
+        });
 
-        // Clearing the interval on component unmount
-        return () => clearInterval(intervalId);
+        // Unsubscribing on component unmount
+        return unsubscribe;
     }, []);
 
     // Mapping the states to a list of JSX elements
@@ -1,5 +1,6 @@
 // Importing React and useEffect, useState hooks from the react library
 import React, { useEffect, useState } from 'react';
+import { subscribeSensorEvents } from "../../../utils/sensorEvents";
 
 // Defining the DeployStatus functional component with props
 function DeployStatus({ connected, isDeployed, setIsDeployed, isLoadingDeployed, isErrorDeployed, errorMessageDeployed }) {
@@ -9,36 +10,6 @@ function DeployStatus({ connected, isDeployed, setIsDeployed, isLoadingDeployed,
     // State to manage the stop deploying status
     const [isStopDeploying, setIsStopDeploying] = useState();
 
-    // Function to check the stop deploying status from the server
-    const checkStopDeployingStatus = () => {
-        fetch(`/api/is_stop_deploying_in_progress?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-        .then(response => {
-            if (!response.ok) {
-                // Handling unsuccessful response
-                setErrorMessageDeployed("Unable to connect");
-                setIsStopDeploying(false);
-                throw new Error('Network response was not ok');
-            }
-            return response.json();
-        })
-        .then(data => {
-            // Handling successful response
-            setIsStopDeploying(data.data);
-            console.log('Success:', data);
-        })
-        .catch(error => {
-            // Handling fetch errors
-            setErrorMessageDeployed(`There is an error : ${error.message}`);
-            setIsStopDeploying(false);
-            console.error('Error:', error);
-        });
-    };
-
     /** SLEEPING STATUS **/
 
     // State to manage loading status of sleeping check
@@ -50,52 +21,29 @@ function DeployStatus({ connected, isDeployed, setIsDeployed, isLoadingDeployed,
     // State to store sleeping status
     const [isSleeping, setIsSleeping] = useState();
 
-    // Function to check sleeping status from the server
-    const checkSleepingStatus = () => {
-        fetch(`/api/is_sleeping?sensor_id=${sensor_id}`, {
-            method: 'GET',
-            headers: {
-                'Content-Type': 'application/json',
-            },
-        })
-        .then(response => {
-            if (!response.ok) {
-                // Handling unsuccessful response
-                setErrorMessageSleeping("Unable to connect");
+    // useEffect to follow the sleeping and stop deploying statuses pushed by the server when they change
+    useEffect(() => {
+        const unsubscribeStatus = subscribeSensorEvents('status', status => {
+            setIsSleeping(status.is_sleeping);
+            setIsStopDeploying(status.is_stop_deploying_in_progress);
+            setIsErrorSleeping(false);
+            setIsLoadingSleeping(false);
+        });
+        const unsubscribeError = subscribeSensorEvents('error', message => {
+            // Handling a lost connection, null while reconnecting
+            if (message !== null) {
+                setErrorMessageSleeping(`There is an error : ${message}`);
                 setIsErrorSleeping(true);
                 setIsLoadingSleeping(false);
-                throw new Error('Network response was not ok');
+                setIsStopDeploying(false);
             }
-            return response.json();
-        })
-        .then(data => {
-            // Handling successful response
-            setIsSleeping(data.data);
-            setIsLoadingSleeping(false);
-            console.log('Success:', data);
-        })
-        .catch(error => {
-            // Handling fetch errors
-            setErrorMessageSleeping(`There is an error : ${error.message}`);
-            setIsErrorSleeping(true);
-            setIsLoadingSleeping(false);
-            console.error('Error:', error);
         });
-    };
-
-    // useEffect to run the sleeping and stop deploying status checks on component mount and periodically
-    useEffect(() => {
-        checkSleepingStatus();
-        checkStopDeployingStatus();
-
-        // Setting up an interval to periodically check statuses
-        const intervalId = setInterval(() => {
-            checkSleepingStatus();
-            checkStopDeployingStatus();
-        }, 5000);
 
-        // Clearing the interval on component unmount
-        return () => clearInterval(intervalId);
+        // Unsubscribing on component unmount
+        return () => {
+            unsubscribeStatus();
+            unsubscribeError();
+        };
     }, []);
 
     /** START DEPLOY **/
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from "react";
 import Alert from "../universal/Alert";
+import { subscribeSensorState } from "../../../utils/sensorState";
 
 
 function Valve({ reagents }) { // Define Valve component with ip and reagents as props
@@ -128,43 +129,12 @@ function Valve({ reagents }) { // Define Valve component with ip and reagents as
 
     /** AUTOMATION **/
 
-    const checkStatus = () => { // Function to check status
-        if (sessionStorage.getItem('accessToken') != null) { // Check if access token is available
-            const url = `http://${sensor_ip}:${sensor_port}/sensor/get_state`; // URL to get state
-            fetch(url, {
-                method: 'GET', // HTTP method
-                headers: {
-                    'Authorization': `Bearer ${sessionStorage.getItem('accessToken')}`, // Authorization header
-                    'Content-Type': 'application/json', // Content type
-                },
-            })
-                .then(response => { // Handle response
-                    if (!response.ok) { // Check if response is not ok
-                        throw new Error('Network response was not ok'); // Throw error
-                    }
-                    return response.json(); // Parse response JSON
-                })
-                .then(data => { // Handle data
-                    console.log('Success:', data); // Log success message
-                    setConnected(true); // Set connected state to true
-                    setError(null); // Reset error state
-                })
-                .catch(error => { // Handle error
-                    console.error('Error:', error); // Log error
-                    setConnected(false); // Set connected state to false
-                    setError(-1); // Set error state
-                });
-        }
-    };
-
-    useEffect(() => { // Effect to check status on mount
-        checkStatus(); // Check status
-
-        const intervalId = setInterval(() => { // Set interval to check status
-            checkStatus(); // Check status
-        }, 5000); // Every 5 seconds
-
-        return () => clearInterval(intervalId); // Clear interval on unmount
+    // Effect to follow the connection status polled by the server
+    useEffect(() => {
+        return subscribeSensorState(sensor_id, state => {
+            setConnected(state.connected); // Set connected state
+            setError(state.connected ? null : -1); // Set error state
+        });
     }, []);
 
     useEffect(() => { // Effect to get number of ports when connected changes
@@ -1,5 +1,6 @@
 import React, { useEffect, useState } from 'react';
 import { createRoot } from "react-dom/client";
+import { subscribeSensorState } from "../../../utils/sensorState";
 
 const LogAndDatabase = ({  }) => {
     // State to track if the sensor is connected
@@ -17,50 +18,11 @@ const LogAndDatabase = ({  }) => {
     // State to control the visibility of the Database text
     const [showDatabaseText, setShowDatabaseText] = useState(false);
 
-    // Function to check the status of the sensor
-    const checkStatus = () => {
-        // Check if the access token exists in session storage
-        if (sessionStorage.getItem('accessToken') != null) {
-            // Fetch the sensor state from the server
-            const url = `http://${sensor_ip}:${sensor_port}/sensor/get_state`
-            fetch(url, {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${sessionStorage.getItem('accessToken')}`,
-                    'Content-Type': 'application/json',
-                },
-            })
-            .then(response => {
-                // Check if the response is ok
-                if (!response.ok) {
-                    throw new Error('Network response was not ok');
-                }
-                // Parse the response JSON
-                return response.json();
-            })
-            .then(data => {
-                console.log('Success:', data);
-                // Set the connected state to true
-                setConnected(true);
-            })
-            .catch(error => {
-                console.error('Error:', error);
-                // Set the connected state to false
-                setConnected(false);
-            });
-        }
-    };
-
-    // useEffect to check the status initially and set an interval to check the status every 5 seconds
+    // useEffect to follow the connection status polled by the server
     useEffect(() => {
-        checkStatus();
-
-        const intervalId = setInterval(() => {
-            checkStatus();
-        }, 5000);
-
-        // Cleanup the interval on component unmount
-        return () => clearInterval(intervalId);
+        return subscribeSensorState(sensor_id, state => {
+            setConnected(state.connected);
+        });
     }, []);
 
     // Function to handle the Get Log button click
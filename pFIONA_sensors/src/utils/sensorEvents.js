@@ -0,0 +1,63 @@
+// Single EventSource of the page, shared by every component listening to the events of the sensor
+let source = null;
+
+// Callbacks of each event name ('status', 'cycle' or 'error')
+const listeners = {};
+
+// Last data received for each event name, given to the callbacks subscribing afterwards
+const lastEvents = {};
+
+// Function to call the callbacks of an event
+const dispatch = (name, data) => {
+    lastEvents[name] = data;
+    (listeners[name] || []).forEach(callback => callback(data));
+};
+
+// Function to open the event stream of the sensor of the page, the browser reconnects by itself
+const openSource = () => {
+    source = new EventSource(`/api/sensor_events?sensor_id=${sensor_id}`);
+
+    ['status', 'cycle'].forEach(name => {
+        source.addEventListener(name, event => {
+            delete lastEvents.error;
+            dispatch(name, JSON.parse(event.data));
+        });
+    });
+
+    source.onerror = () => {
+        // The stream is closed for good on errors such as an expired session
+        dispatch('error', source.readyState === EventSource.CLOSED ? 'Unable to connect' : null);
+    };
+};
+
+// Function to close the event stream once no component listens to it anymore
+const closeSource = () => {
+    if (Object.values(listeners).every(callbacks => callbacks.length === 0)) {
+        source.close();
+        source = null;
+        Object.keys(lastEvents).forEach(name => delete lastEvents[name]);
+    }
+};
+
+/**
+ * Subscribe to the events of the sensor of the page, instead of polling its status.
+ *
+ * @param name Name of the event: 'status' (status of the sensor, see /api/get_sensor_status), 'cycle' (new cycle
+ *             of a deployment) or 'error' (connection lost, or null while reconnecting).
+ * @param callback Function called with the data of each event.
+ * @returns Function to unsubscribe, to call when the component unmounts.
+ */
+export function subscribeSensorEvents(name, callback) {
+    listeners[name] = [...(listeners[name] || []), callback];
+
+    if (source === null) {
+        openSource();
+    } else if (name in lastEvents) {
+        callback(lastEvents[name]);
+    }
+
+    return () => {
+        listeners[name] = listeners[name].filter(listener => listener !== callback);
+        closeSource();
+    };
+}
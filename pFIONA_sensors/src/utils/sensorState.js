@@ -0,0 +1,80 @@
+// Interval of the page poll of the server, which polls the sensors themselves once for every client
+const STATE_POLL_INTERVAL = 5000;
+
+// Callbacks of each sensor ID
+const listeners = {};
+
+// Last state received for each sensor ID, given to the callbacks subscribing afterwards
+const lastStates = {};
+
+// Single interval of the page, shared by every component listening to the state of a sensor
+let intervalId = null;
+
+// Function to fetch the state of every sensor of the page in a single request
+const fetchStates = () => {
+    const sensorIds = Object.keys(listeners).filter(id => listeners[id].length > 0);
+    if (sensorIds.length === 0) {
+        return;
+    }
+
+    fetch(`/api/get_sensor_state?sensor_id=${sensorIds.join(',')}`, {
+        method: 'GET',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+    })
+        .then(response => {
+            if (!response.ok) {
+                throw new Error('Network response was not ok');
+            }
+            return response.json();
+        })
+        .then(data => {
+            Object.entries(data.data).forEach(([id, state]) => {
+                // The sensor is not polled yet, ask again shortly
+                if (state.age === null) {
+                    setTimeout(fetchStates, 1000);
+                    return;
+                }
+                lastStates[id] = state;
+                (listeners[id] || []).forEach(callback => callback(state));
+            });
+        })
+        .catch(error => {
+            console.error('Error:', error);
+            sensorIds.forEach(id => {
+                const state = {connected: false, state: null, error: error.message, age: null};
+                lastStates[id] = state;
+                (listeners[id] || []).forEach(callback => callback(state));
+            });
+        });
+};
+
+/**
+ * Subscribe to the state of a sensor, as last read by the server from the sensor itself.
+ *
+ * @param sensorId ID of the sensor.
+ * @param callback Function called with the state of the sensor: {connected, state, error, age}.
+ * @returns Function to unsubscribe, to call when the component unmounts.
+ */
+export function subscribeSensorState(sensorId, callback) {
+    listeners[sensorId] = [...(listeners[sensorId] || []), callback];
+
+    if (sensorId in lastStates) {
+        callback(lastStates[sensorId]);
+    }
+
+    // Gather the subscriptions of the components mounting together in the first request
+    if (intervalId === null) {
+        intervalId = setInterval(fetchStates, STATE_POLL_INTERVAL);
+        setTimeout(fetchStates, 0);
+    }
+
+    return () => {
+        listeners[sensorId] = listeners[sensorId].filter(listener => listener !== callback);
+        if (Object.values(listeners).every(callbacks => callbacks.length === 0)) {
+            clearInterval(intervalId);
+            intervalId = null;
+        }
+    };
+}
@@ -16,6 +16,7 @@ from django.views.decorators.csrf import csrf_exempt
 from pFIONA_sensors.models import Sensor, Reagent, Step, Reaction, Spectrum
 from pFIONA_api.analysis.formula import absorbance
 from pFIONA_api.analysis.spectrum_finder import *
+from pFIONA_api.id_allocator import allocate_id
 from .decorators import admin_required
 from .forms import SensorForm, SensorNameAndNotesForm, ReagentEditForm, SensorLatLongForm, SensorSettingsForm
 from django.contrib.auth.forms import PasswordChangeForm
@@ -288,18 +289,12 @@ def sensors_reagent_add(request, sensor_id):
     if request.method == 'POST':
         reagent_form = ReagentEditForm(request.POST, prefix='reagent')  # Create the reagent form with POST data
         if reagent_form.is_valid():
-            max_id = \
-                Reagent.objects.filter(id__gte=sensor_id * 10000000,
-                                       id__lte=(sensor_id + 1) * 10000000).aggregate(Max('id'))[
-                    'id__max']  # Get the maximum ID for the sensor's reagents
-
-            if max_id is None:
-                max_id = sensor_id * 10000000  # Set the initial ID if none exists
             new_reagent = reagent_form.save(commit=False)  # Create the new reagent without saving to the database
             new_reagent.pfiona_sensor_id = sensor_id  # Set the sensor ID
             new_reagent.volume = 0  # Set the initial volume
-            new_reagent.id = max_id + 1  # Set the new ID
-            new_reagent.save()  # Save the new reagent
+            with transaction.atomic():
+                new_reagent.id = allocate_id(Reagent, sensor_id)  # Reserve the ID in the sensor's reagent range
+                new_reagent.save()  # Save the new reagent
             return redirect('sensors_reagents', sensor_id=sensor_id)  # Redirect to the reagents page
     else:
         reagent_form = ReagentEditForm(prefix='reagent')  # Create an empty reagent form
@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_sensors.models import Sensor, Spectrum
+from pFIONA_api.analysis.spectrum_finder import store_deployment_absorbance
+
+
+class Command(BaseCommand):
+    help = 'Computes and stores the absorbance spectrums of completed cycles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', type=int, help='ID of the sensor (all sensors by default)')
+        parser.add_argument('--deployment', type=int, help='ID of the deployment (all deployments by default)')
+        parser.add_argument('--rebuild', action='store_true',
+                            help='Delete and recompute the absorbance spectrums already stored')
+
+    def handle(self, *args, **options):
+        sensor_id = options['sensor']
+        deployment_id = options['deployment']
+
+        if deployment_id is not None and sensor_id is None:
+            raise CommandError('--deployment requires --sensor.')
+
+        # Check if the sensor exists
+        if sensor_id is not None and not Sensor.objects.filter(id=sensor_id).exists():
+            raise CommandError(f'Sensor with ID {sensor_id} does not exist.')
+
+        # Find every deployment to process
+        deployments = Spectrum.objects.filter(cycle__gte=1, deployment__isnull=False)
+        if sensor_id is not None:
+            deployments = deployments.filter(pfiona_sensor_id=sensor_id)
+        if deployment_id is not None:
+            deployments = deployments.filter(deployment=deployment_id)
+        deployments = deployments.values_list('pfiona_sensor_id', 'deployment').distinct().order_by(
+            'pfiona_sensor_id', 'deployment')
+
+        total = 0
+        for deployment_sensor_id, deployment in deployments:
+            stored = store_deployment_absorbance(deployment, deployment_sensor_id, rebuild=options['rebuild'])
+            total += stored
+            self.stdout.write(f'Sensor {deployment_sensor_id}, deployment {deployment}: '
+                              f'{stored} absorbance spectrums stored')
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully stored {total} absorbance spectrums'))
@@ -1,6 +1,7 @@
 from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
 from pFIONA_sensors.models import Sensor
-from django.db.models import Max
+from pFIONA_api.id_allocator import allocate_id
 
 class Command(BaseCommand):
     help = 'Creates a sensor with the IP address 192.168.0.1'
@@ -13,12 +14,10 @@ class Command(BaseCommand):
             self.stdout.write(self.style.ERROR(f'Sensor with IP {ip} already exists.'))
             return
 
-        # Find the next available unique id
-        max_id = Sensor.objects.aggregate(Max('id'))['id__max']
-        new_id = (max_id or 0) + 1
-
-        # Create the sensor with the unique id and the specified IP
-        sensor = Sensor(id=new_id, ip_address=ip)
-        sensor.save()
+        # Reserve the next unique id and create the sensor with the specified IP
+        with transaction.atomic():
+            new_id = allocate_id(Sensor)
+            sensor = Sensor(id=new_id, ip_address=ip)
+            sensor.save()
 
         self.stdout.write(self.style.SUCCESS(f'Successfully created sensor with IP {ip} and ID {new_id}'))
@@ -0,0 +1,44 @@
+import os
+import sqlite3
+
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_sensors.models import Sensor
+from pFIONA_api.sensor_import import import_sensor_database
+
+
+class Command(BaseCommand):
+    help = 'Imports the spectrums of a sensor SQLite database (from /sensor/get_sqlite_db) into the central database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sensor', type=int, help='ID of the sensor the database comes from')
+        parser.add_argument('database', help='Path of the SQLite database')
+
+    def handle(self, *args, **options):
+        sensor_id = options['sensor']
+        path = options['database']
+
+        # Check if the sensor and the database exist
+        if not Sensor.objects.filter(id=sensor_id).exists():
+            raise CommandError(f'Sensor with ID {sensor_id} does not exist.')
+        if not os.path.isfile(path):
+            raise CommandError(f'Database {path} does not exist.')
+
+        # Report the rows copied to the staging tables, then the merge
+        steps = {
+            'time': 'Times copied',
+            'spectrum': 'Spectrums copied',
+            'values': 'Spectrum values copied',
+            'catalog': 'Deployments to update',
+        }
+
+        def progress(step, rows):
+            self.stdout.write(f'{steps[step]}: {rows}' if step in steps else 'Merging into the central tables')
+
+        try:
+            result = import_sensor_database(sensor_id, path, progress)
+        except (sqlite3.Error, ValueError) as e:
+            raise CommandError(f'Import failed: {e}')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Successfully imported {result["spectrums_merged"]} spectrums and {result["values_inserted"]} spectrum '
+            f'values ({result["spectrums"]} spectrums read), deployments updated: {result["deployments"]}'))
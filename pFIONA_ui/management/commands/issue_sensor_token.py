@@ -0,0 +1,31 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_sensors.models import Sensor
+from pFIONA_api.sensor_state import get_sensor_push_token
+
+
+class Command(BaseCommand):
+    help = 'Issues the JWT a sensor pushes its spectrums with, only valid for this sensor'
+
+    def add_arguments(self, parser):
+        parser.add_argument('sensor_id', type=int, help='ID of the sensor')
+        parser.add_argument('username', help='Member of the ADMIN group the token is issued for')
+
+    def handle(self, *args, **options):
+        sensor_id = options['sensor_id']
+
+        # Check if the sensor exists
+        if not Sensor.objects.filter(id=sensor_id).exists():
+            raise CommandError(f'Sensor with ID {sensor_id} does not exist.')
+
+        # Check that the user may push spectrums
+        user = User.objects.filter(username=options['username'], is_active=True).first()
+        if user is None or not user.groups.filter(name='ADMIN').exists():
+            raise CommandError(f'User {options["username"]} is not an active member of the ADMIN group.')
+
+        token = get_sensor_push_token(user, sensor_id)
+
+        self.stdout.write(f'Access token: {token.access_token}')
+        self.stdout.write(f'Refresh token: {token}')
+        self.stdout.write(self.style.SUCCESS(f'Successfully issued a token for sensor {sensor_id}, renew the access '
+                                             f'token from the refresh token at /jwt/refresh/'))
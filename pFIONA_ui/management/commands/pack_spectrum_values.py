@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_sensors.models import Sensor, Spectrum
+from pFIONA_api.analysis.spectrum_values import pack_spectrums
+
+
+class Command(BaseCommand):
+    help = 'Packs the values of spectrums stored one row per wavelength into arrays'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', type=int, help='ID of the sensor (all sensors by default)')
+        parser.add_argument('--deployment', type=int, help='ID of the deployment (all deployments by default)')
+        parser.add_argument('--delete-values', action='store_true',
+                            help='Delete the one row per wavelength values of the packed spectrums')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Number of spectrums packed per transaction')
+
+    def handle(self, *args, **options):
+        sensor_id = options['sensor']
+        deployment_id = options['deployment']
+
+        if deployment_id is not None and sensor_id is None:
+            raise CommandError('--deployment requires --sensor.')
+
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be positive.')
+
+        # Check if the sensor exists
+        if sensor_id is not None and not Sensor.objects.filter(id=sensor_id).exists():
+            raise CommandError(f'Sensor with ID {sensor_id} does not exist.')
+
+        # Find every spectrum to pack
+        spectrums = Spectrum.objects.all()
+        if sensor_id is not None:
+            spectrums = spectrums.filter(pfiona_sensor_id=sensor_id)
+        if deployment_id is not None:
+            spectrums = spectrums.filter(deployment=deployment_id)
+
+        packed = pack_spectrums(spectrums, delete_values=options['delete_values'], batch_size=options['batch_size'])
+
+        self.stdout.write(self.style.SUCCESS(f'Successfully packed {packed} spectrums'))
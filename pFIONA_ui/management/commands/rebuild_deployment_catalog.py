@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_sensors.models import Sensor
+from pFIONA_api.analysis.deployment_catalog import rebuild_deployment_catalog
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the deployment catalog from the spectrums'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', type=int, help='ID of the sensor (all sensors by default)')
+
+    def handle(self, *args, **options):
+        sensor_id = options['sensor']
+
+        # Check if the sensor exists
+        if sensor_id is not None and not Sensor.objects.filter(id=sensor_id).exists():
+            raise CommandError(f'Sensor with ID {sensor_id} does not exist.')
+
+        sensor_ids = [sensor_id] if sensor_id is not None else Sensor.objects.order_by('id').values_list('id', flat=True)
+
+        for catalog_sensor_id in sensor_ids:
+            count = rebuild_deployment_catalog(catalog_sensor_id)
+            self.stdout.write(f'Sensor {catalog_sensor_id}: {count} deployments')
+
+        self.stdout.write(self.style.SUCCESS('Successfully rebuilt the deployment catalog'))
@@ -0,0 +1,37 @@
+import asyncio
+
+from django.core.management.base import BaseCommand, CommandError
+from pFIONA_api.sensor_sync import SensorSyncWorker, SYNC_CONCURRENCY, SYNC_INTERVAL, SENSOR_SPECTRUMS_PATH
+
+
+class Command(BaseCommand):
+    help = f'Pulls the new spectrums of the sensors (from {SENSOR_SPECTRUMS_PATH}) into the central database, ' \
+           f'until interrupted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sensor', type=int, action='append',
+                            help='ID of a sensor to sync, may be repeated. Every sensor by default')
+        parser.add_argument('--concurrency', type=int, default=SYNC_CONCURRENCY,
+                            help='Most sensors synced at the same time')
+        parser.add_argument('--interval', type=float, default=SYNC_INTERVAL,
+                            help='Seconds between the starts of two rounds over the sensors')
+        parser.add_argument('--once', action='store_true', help='Sync the sensors once, then exit')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1:
+            raise CommandError('Concurrency must be at least 1.')
+        if options['interval'] < 0:
+            raise CommandError('Interval must not be negative.')
+
+        worker = SensorSyncWorker(options['sensor'], options['concurrency'], options['interval'], self.stdout.write)
+
+        try:
+            synced, failed = asyncio.run(worker.run(once=options['once']))
+        except KeyboardInterrupt:
+            self.stdout.write('Sync stopped, the sensors resume from their last checkpoint.')
+            return
+
+        if failed:
+            self.stdout.write(self.style.WARNING(f'Synced {synced} sensors, {failed} failed'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Successfully synced {synced} sensors'))
@@ -57,7 +57,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'corsheaders.middleware.CorsMiddleware'
+    'corsheaders.middleware.CorsMiddleware',
+    'pFIONA_api.middleware.DeploymentCatalogMiddleware',
 ]
 
 ROOT_URLCONF = 'pFIONA_ui.urls'
@@ -99,6 +100,34 @@ DATABASES = {
     }
 }
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# The analysis cache keeps the results of the heaviest analysis functions, keyed by data version.
+# Least recently used results are evicted beyond ANALYSIS_CACHE_MAX_ENTRIES.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'analysis': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'pfiona-analysis',
+        'TIMEOUT': None,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('ANALYSIS_CACHE_MAX_ENTRIES', default=256, cast=int),
+        },
+    },
+}
+
+# Sensor state poller
+# The state of every sensor watched by a client is read from the sensor once per SENSOR_STATE_POLL_INTERVAL
+# seconds, with the JWT of SENSOR_STATE_USER (first active superuser by default), and served from memory.
+
+SENSOR_PORT = config('SENSOR_PORT', default=5000, cast=int)
+SENSOR_STATE_POLL_INTERVAL = config('SENSOR_STATE_POLL_INTERVAL', default=5, cast=float)
+SENSOR_STATE_TIMEOUT = config('SENSOR_STATE_TIMEOUT', default=3, cast=float)
+SENSOR_STATE_USER = config('SENSOR_STATE_USER', default=None)
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 